@@ -4,7 +4,7 @@ Main API router for v1 endpoints
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import inventory, plants, materials, ai, analytics, auth
+from app.api.v1.endpoints import inventory, plants, materials, ai, analytics, auth, metrics
 
 api_router = APIRouter()
 
@@ -14,4 +14,5 @@ api_router.include_router(inventory.router, prefix="/inventory", tags=["inventor
 api_router.include_router(plants.router, prefix="/plants", tags=["plants"])
 api_router.include_router(materials.router, prefix="/materials", tags=["materials"])
 api_router.include_router(ai.router, prefix="/ai", tags=["artificial intelligence"])
-api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"]) 
\ No newline at end of file
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"]) 
\ No newline at end of file
@@ -2,80 +2,131 @@
 AI and machine learning endpoints
 """
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime, timedelta
+import json
 
-from app.core.database import get_db
-from app.core.security import get_current_user
+from app.core.cache import request_cache_key, response_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_db_async
+from app.core.security import get_admin_user, get_current_user
 from app.models.inventory import InventoryForecast
 from app.services.ai_forecasting import ForecastingService
 from app.services.ai_optimization import OptimizationService
+from app.services.anomaly_detection import AnomalyService
 
 router = APIRouter()
 
 @router.get("/forecast")
 async def get_demand_forecast(
+    request: Request,
     material_id: Optional[str] = Query(None, description="Material ID for forecasting"),
     plant_id: Optional[str] = Query(None, description="Plant ID for forecasting"),
     horizon_days: int = Query(30, description="Forecast horizon in days"),
-    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get AI-powered demand forecast"""
     
     forecasting_service = ForecastingService()
     
-    if material_id and plant_id:
-        # Get specific material forecast
-        forecast = await forecasting_service.get_material_forecast(
-            material_id, plant_id, horizon_days
-        )
-    else:
+    async def compute():
+        if material_id and plant_id:
+            # Get specific material forecast
+            async with AsyncSessionLocal() as db:
+                return await forecasting_service.get_material_forecast(
+                    material_id, plant_id, horizon_days, db
+                )
         # Get general forecast
-        forecast = await forecasting_service.get_general_forecast(horizon_days)
+        return await forecasting_service.get_general_forecast(horizon_days)
     
-    return forecast
+    return await response_cache.get_or_compute(
+        "ai", request_cache_key(request), compute
+    )
+
+@router.post("/models/train")
+async def train_forecast_models(
+    plant_id: Optional[str] = Query(None, description="Plant ID to retrain, all plants if omitted"),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Retrain forecast models, streaming progress as NDJSON"""
+    
+    async def progress():
+        async with AsyncSessionLocal() as db:
+            async for event in ForecastingService().train_models(db, plant_id):
+                if event["event"] == "completed":
+                    # Serve forecasts from the new model version right away
+                    await response_cache.invalidate("ai")
+                yield json.dumps(jsonable_encoder(event)) + "\n"
+    
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
 
 @router.get("/optimization")
 async def get_inventory_optimization(
+    request: Request,
     plant_id: Optional[str] = Query(None, description="Plant ID for optimization"),
-    db: Session = Depends(get_db),
+    material_id: Optional[str] = Query(None, description="Material ID for its reorder point; requires plant_id"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get AI-powered inventory optimization recommendations"""
+    """Get inventory optimization recommendations from the latest optimizer run"""
     
     optimization_service = OptimizationService()
     
-    if plant_id:
-        recommendations = await optimization_service.get_plant_optimization(plant_id)
-    else:
-        recommendations = await optimization_service.get_global_optimization()
+    async def compute():
+        if material_id and plant_id:
+            reorder_point = await optimization_service.calculate_optimal_reorder_points(material_id, plant_id)
+            if reorder_point is None:
+                raise HTTPException(
+                    status_code=404, detail=f"No reorder point for {material_id} at {plant_id} in the latest run"
+                )
+            return reorder_point
+        if plant_id:
+            return await optimization_service.get_plant_optimization(plant_id)
+        return await optimization_service.get_global_optimization()
     
-    return recommendations
+    return await response_cache.get_or_compute(
+        "ai", request_cache_key(request), compute
+    )
+
+@router.post("/optimization/run")
+async def run_inventory_optimization(
+    db: AsyncSession = Depends(get_db_async),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Recompute reorder points and safety stock for every material and plant"""
+    
+    result = await OptimizationService().run_optimization(db)
+    # Serve the new run right away
+    await response_cache.invalidate("ai")
+    return result
 
 @router.get("/anomaly-detection")
 async def get_anomaly_detection(
+    request: Request,
     plant_id: Optional[str] = Query(None, description="Plant ID for anomaly detection"),
-    db: Session = Depends(get_db),
+    anomaly_type: Optional[str] = Query(
+        None, description="quantity_spike, unusual_movement or negative_stock_drift"
+    ),
+    days: int = Query(30, ge=1, le=settings.ANOMALY_WINDOW_DAYS, description="Days of transactions to cover"),
+    limit: int = Query(100, ge=1, le=1000, description="Most recent anomalies to return"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get AI-powered anomaly detection results"""
+    """Get anomalies detected in inventory transactions"""
     
-    # This would integrate with the anomaly detection service
-    anomalies = {
-        "anomalies": [],
-        "total_detected": 0,
-        "last_updated": datetime.now()
-    }
+    async def compute():
+        async with AsyncSessionLocal() as db:
+            return await AnomalyService(db).get_anomalies(plant_id, anomaly_type, days, limit)
     
-    return anomalies
+    return await response_cache.get_or_compute(
+        "ai", request_cache_key(request), compute
+    )
 
 @router.get("/insights")
 async def get_ai_insights(
     plant_id: Optional[str] = Query(None, description="Plant ID for insights"),
-    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get AI-powered business insights"""
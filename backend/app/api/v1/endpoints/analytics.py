@@ -2,86 +2,85 @@
 Analytics and reporting endpoints
 """
 
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request
 from typing import List, Optional
 from datetime import datetime, timedelta
 
-from app.core.database import get_db
+from app.core.cache import request_cache_key, response_cache
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.core.security import get_current_user
+from app.services.inventory_aggregation import InventoryAggregationService
+from app.services.kpi_rollup import KPIRollupService
 
 router = APIRouter()
 
 @router.get("/kpis")
 async def get_executive_kpis(
+    request: Request,
     plant_id: Optional[str] = Query(None, description="Plant ID for KPIs"),
-    db: Session = Depends(get_db),
+    days: int = Query(30, ge=1, le=settings.KPI_ROLLUP_DAYS, description="Number of days the KPIs cover"),
     current_user: dict = Depends(get_current_user)
 ):
     """Get executive-level KPIs"""
     
-    kpis = {
-        "inventory_turnover": 4.2,
-        "days_of_inventory": 87,
-        "stock_out_rate": 0.023,
-        "overstock_rate": 0.156,
-        "inventory_accuracy": 0.987,
-        "cost_of_inventory": 1250000.00,
-        "last_updated": datetime.now()
-    }
+    async def compute():
+        # Refreshes may run after the response is sent, so compute opens its own session
+        async with AsyncSessionLocal() as db:
+            kpis = await KPIRollupService(db).get_kpis(plant_id, days)
+            levels = await InventoryAggregationService(db).get_kpis(plant_id)
+        total_materials = levels["total_materials"]
+        return {
+            "inventory_turnover": kpis["inventory_turnover"],
+            "days_of_inventory": kpis["days_of_inventory"],
+            "stock_out_rate": kpis["stock_out_rate"],
+            "overstock_rate": levels["overstock_count"] / total_materials if total_materials else 0.0,
+            "inventory_accuracy": None,  # No cycle count data is recorded yet
+            "cost_of_inventory": kpis["inventory_value"],
+            "period_days": days,
+            "last_updated": datetime.now()
+        }
     
-    return kpis
+    return await response_cache.get_or_compute(
+        "analytics", request_cache_key(request), compute
+    )
 
 @router.get("/trends")
 async def get_inventory_trends(
+    request: Request,
     plant_id: Optional[str] = Query(None, description="Plant ID for trends"),
-    days: int = Query(30, description="Number of days for trend analysis"),
-    db: Session = Depends(get_db),
+    days: int = Query(30, ge=1, le=settings.KPI_ROLLUP_DAYS, description="Number of days for trend analysis"),
     current_user: dict = Depends(get_current_user)
 ):
     """Get inventory trends over time"""
     
-    trends = {
-        "total_inventory": [
-            {"date": "2024-01-01", "value": 1200000},
-            {"date": "2024-01-15", "value": 1180000},
-            {"date": "2024-02-01", "value": 1250000}
-        ],
-        "stock_outs": [
-            {"date": "2024-01-01", "count": 5},
-            {"date": "2024-01-15", "count": 3},
-            {"date": "2024-02-01", "count": 7}
-        ],
-        "last_updated": datetime.now()
-    }
+    async def compute():
+        async with AsyncSessionLocal() as db:
+            trends = await KPIRollupService(db).get_trends(plant_id, days)
+        trends["last_updated"] = datetime.now()
+        return trends
     
-    return trends
+    return await response_cache.get_or_compute(
+        "analytics", request_cache_key(request), compute
+    )
 
 @router.get("/comparison")
 async def get_plant_comparison(
-    db: Session = Depends(get_db),
+    request: Request,
+    days: int = Query(30, ge=1, le=settings.KPI_ROLLUP_DAYS, description="Number of days to compare over"),
     current_user: dict = Depends(get_current_user)
 ):
     """Get comparison data across plants"""
     
-    comparison = {
-        "plants": [
-            {
-                "plant_id": "PLANT001",
-                "plant_name": "North Manufacturing",
-                "inventory_value": 450000,
-                "turnover_rate": 4.5,
-                "stock_out_rate": 0.018
-            },
-            {
-                "plant_id": "PLANT002", 
-                "plant_name": "South Distribution",
-                "inventory_value": 320000,
-                "turnover_rate": 5.2,
-                "stock_out_rate": 0.025
-            }
-        ],
-        "last_updated": datetime.now()
-    }
+    async def compute():
+        async with AsyncSessionLocal() as db:
+            plants = await KPIRollupService(db).get_plant_comparison(days)
+        return {
+            "plants": plants,
+            "period_days": days,
+            "last_updated": datetime.now()
+        }
     
-    return comparison 
\ No newline at end of file
+    return await response_cache.get_or_compute(
+        "analytics", request_cache_key(request), compute
+    )
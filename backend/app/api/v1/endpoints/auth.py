@@ -3,26 +3,77 @@ Authentication endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from fastapi.security import HTTPAuthorizationCredentials, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+import structlog
 
-from app.core.database import get_db
-from app.core.security import create_access_token, verify_password
+from app.core.database import get_db_async
+from app.core.password_hashing import HashingQueueFull
+from app.core.security import (
+    DEMO_ROLE, DEMO_USERNAME, create_access_token, get_current_user, password_hasher, security, token_cache
+)
 from app.models.users import User
 
+logger = structlog.get_logger()
+
 router = APIRouter()
 
+async def find_user(db: AsyncSession, username: str):
+    """User with this username, or None when unknown or the users table is unavailable"""
+    try:
+        result = await db.execute(select(User).where(User.username == username))
+        return result.scalar_one_or_none()
+    except SQLAlchemyError as e:
+        logger.error("User lookup failed", username=username, error=str(e))
+        await db.rollback()
+        return None
+
+async def check_password(db: AsyncSession, user, password: str) -> bool:
+    """Verify off the event loop, storing a new hash when the cost factor changed"""
+    if user is None or not user.is_active:
+        await password_hasher.dummy_verify(password)
+        return False
+    verified, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if verified and new_hash is not None:
+        user.hashed_password = new_hash
+        await db.commit()
+        logger.info("Password rehashed", username=user.username)
+    return verified
+
 @router.post("/login")
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db_async)
 ):
     """User login endpoint"""
     
-    # For demo purposes, create a mock user
-    # In production, you would query the database
-    if form_data.username == "admin" and form_data.password == "admin123":
+    user = await find_user(db, form_data.username)
+    try:
+        verified = await check_password(db, user, form_data.password)
+    except HashingQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, please retry",
+            headers={"Retry-After": "1"},
+        )
+    
+    if verified:
+        access_token = create_access_token(data={"sub": user.username})
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "user": {
+                "username": user.username,
+                "role": user.role,
+                "full_name": user.full_name
+            }
+        }
+    
+    # Demo user for deployments without a users table
+    if user is None and form_data.username == DEMO_USERNAME and form_data.password == "admin123":
         access_token = create_access_token(
             data={"sub": form_data.username}
         )
@@ -31,7 +82,7 @@ async def login(
             "token_type": "bearer",
             "user": {
                 "username": form_data.username,
-                "role": "executive",
+                "role": DEMO_ROLE,
                 "full_name": "Executive User"
             }
         }
@@ -51,5 +102,15 @@ async def get_current_user_info(
     return {
         "user_id": current_user["user_id"],
         "username": current_user["token_data"].get("sub"),
-        "role": "executive"
-    } 
\ No newline at end of file
+        "role": current_user["role"] or "executive"
+    }
+
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
+):
+    """Revoke the token used for this request"""
+    
+    await token_cache.revoke(credentials.credentials, current_user["token_data"])
+    return {"detail": "Token revoked"}
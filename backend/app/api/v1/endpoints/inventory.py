@@ -2,65 +2,158 @@
 Inventory management endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
 from datetime import datetime, timedelta
 
-from app.core.database import get_db
+from app.core.cache import request_cache_key, response_cache
+from app.core.database import AsyncSessionLocal, get_db_async
+from app.core.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    apply_keyset,
+    next_cursor,
+    stream_ndjson
+)
 from app.core.security import get_current_user
+from app.core.serialization import FastJSONResponse, RowSerializer
 from app.models.inventory import InventoryLevel, InventoryTransaction, InventoryAlert, StockType
+from app.services.columnar_export import columnar_response
+from app.services.inventory_aggregation import InventoryAggregationService
 from app.schemas.inventory import (
     InventoryLevelResponse,
     InventoryLevelList,
     InventoryTransactionResponse,
     InventoryAlertResponse,
+    InventoryAlertList,
     InventoryKPIs
 )
 
 router = APIRouter()
 
-@router.get("/levels", response_model=List[InventoryLevelResponse])
+# Keyset columns used for cursor pagination
+LEVEL_KEYSET = (InventoryLevel.plant_id, InventoryLevel.material_id, InventoryLevel.id)
+ALERT_KEYSET = (InventoryAlert.created_at, InventoryAlert.id)
+
+# List responses are built from result tuples in the response schema's field order
+LEVEL_ROWS = RowSerializer(InventoryLevelResponse, InventoryLevel.__table__)
+TRANSACTION_ROWS = RowSerializer(InventoryTransactionResponse, InventoryTransaction.__table__)
+ALERT_ROWS = RowSerializer(InventoryAlertResponse, InventoryAlert.__table__)
+
+def build_levels_query(
+    plant_id: Optional[str] = None,
+    material_id: Optional[str] = None,
+    stock_type: Optional[StockType] = None,
+    erp_system: Optional[str] = None
+):
+    """Inventory levels matching the filters"""
+    query = select(InventoryLevel)
+    
+    if plant_id:
+        query = query.where(InventoryLevel.plant_id == plant_id)
+    if material_id:
+        query = query.where(InventoryLevel.material_id == material_id)
+    if stock_type:
+        query = query.where(InventoryLevel.stock_type == stock_type)
+    if erp_system:
+        query = query.where(InventoryLevel.erp_system == erp_system)
+    
+    return query
+
+async def _paginate_levels(db: AsyncSession, query, cursor: Optional[str], page_size: int, stream: bool):
+    """Return one keyset page of inventory levels, or stream all of them"""
+    query = apply_keyset(query, LEVEL_KEYSET, cursor)
+    if stream:
+        return stream_ndjson(query, InventoryLevelResponse)
+    
+    result = await db.execute(LEVEL_ROWS.select(query).limit(page_size))
+    rows = result.all()
+    return FastJSONResponse({
+        "items": LEVEL_ROWS.rows(rows),
+        "page_size": page_size,
+        "next_cursor": next_cursor(rows, LEVEL_KEYSET, page_size)
+    })
+
+@router.get("/levels", response_model=InventoryLevelList)
 async def get_inventory_levels(
     plant_id: Optional[str] = Query(None, description="Filter by plant ID"),
     material_id: Optional[str] = Query(None, description="Filter by material ID"),
     stock_type: Optional[StockType] = Query(None, description="Filter by stock type"),
     erp_system: Optional[str] = Query(None, description="Filter by ERP system"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Number of records per page"),
+    stream: bool = Query(False, description="Stream all matching records as NDJSON"),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get current inventory levels with optional filtering"""
     
-    query = db.query(InventoryLevel)
-    
-    if plant_id:
-        query = query.filter(InventoryLevel.plant_id == plant_id)
-    if material_id:
-        query = query.filter(InventoryLevel.material_id == material_id)
-    if stock_type:
-        query = query.filter(InventoryLevel.stock_type == stock_type)
-    if erp_system:
-        query = query.filter(InventoryLevel.erp_system == erp_system)
+    query = build_levels_query(plant_id, material_id, stock_type, erp_system)
+    return await _paginate_levels(db, query, cursor, page_size, stream)
+
+@router.get("/levels/export")
+async def export_inventory_levels(
+    plant_id: Optional[str] = Query(None, description="Filter by plant ID"),
+    material_id: Optional[str] = Query(None, description="Filter by material ID"),
+    stock_type: Optional[StockType] = Query(None, description="Filter by stock type"),
+    erp_system: Optional[str] = Query(None, description="Filter by ERP system"),
+    export_format: Literal["arrow", "parquet"] = Query("arrow", alias="format", description="Arrow IPC stream or Parquet"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Export all matching inventory levels as typed columns"""
     
-    inventory_levels = query.all()
-    return inventory_levels
+    query = build_levels_query(plant_id, material_id, stock_type, erp_system).order_by(*LEVEL_KEYSET)
+    return columnar_response(query, LEVEL_ROWS, export_format, "inventory_levels")
 
-@router.get("/levels/{plant_id}", response_model=List[InventoryLevelResponse])
+@router.get("/levels/{plant_id}", response_model=InventoryLevelList)
 async def get_inventory_by_plant(
     plant_id: str,
     stock_type: Optional[StockType] = Query(None, description="Filter by stock type"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Number of records per page"),
+    stream: bool = Query(False, description="Stream all matching records as NDJSON"),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get inventory levels for a specific plant"""
     
-    query = db.query(InventoryLevel).filter(InventoryLevel.plant_id == plant_id)
+    query = select(InventoryLevel).where(InventoryLevel.plant_id == plant_id)
     
     if stock_type:
-        query = query.filter(InventoryLevel.stock_type == stock_type)
+        query = query.where(InventoryLevel.stock_type == stock_type)
     
-    inventory_levels = query.all()
-    return inventory_levels
+    return await _paginate_levels(db, query, cursor, page_size, stream)
+
+def build_transactions_query(
+    plant_id: Optional[str] = None,
+    material_id: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: Optional[int] = 100
+):
+    """Newest transactions matching the filters
+    
+    The date bounds prune monthly partitions, and each filter combination
+    has an index ending in transaction_date (see transaction_partitions).
+    """
+    query = select(InventoryTransaction)
+    
+    if plant_id:
+        query = query.where(InventoryTransaction.plant_id == plant_id)
+    if material_id:
+        query = query.where(InventoryTransaction.material_id == material_id)
+    if transaction_type:
+        query = query.where(InventoryTransaction.transaction_type == transaction_type)
+    if start_date:
+        query = query.where(InventoryTransaction.transaction_date >= start_date)
+    if end_date:
+        query = query.where(InventoryTransaction.transaction_date <= end_date)
+    
+    query = query.order_by(InventoryTransaction.transaction_date.desc())
+    return query.limit(limit) if limit is not None else query
 
 @router.get("/transactions", response_model=List[InventoryTransactionResponse])
 async def get_inventory_transactions(
@@ -70,118 +163,106 @@ async def get_inventory_transactions(
     start_date: Optional[datetime] = Query(None, description="Start date for filtering"),
     end_date: Optional[datetime] = Query(None, description="End date for filtering"),
     limit: int = Query(100, description="Number of records to return"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get inventory transaction history"""
     
-    query = db.query(InventoryTransaction)
-    
-    if plant_id:
-        query = query.filter(InventoryTransaction.plant_id == plant_id)
-    if material_id:
-        query = query.filter(InventoryTransaction.material_id == material_id)
-    if transaction_type:
-        query = query.filter(InventoryTransaction.transaction_type == transaction_type)
-    if start_date:
-        query = query.filter(InventoryTransaction.transaction_date >= start_date)
-    if end_date:
-        query = query.filter(InventoryTransaction.transaction_date <= end_date)
+    query = build_transactions_query(plant_id, material_id, transaction_type, start_date, end_date, limit)
+    result = await db.execute(TRANSACTION_ROWS.select(query))
+    return FastJSONResponse(TRANSACTION_ROWS.rows(result))
+
+@router.get("/transactions/export")
+async def export_inventory_transactions(
+    plant_id: Optional[str] = Query(None, description="Filter by plant ID"),
+    material_id: Optional[str] = Query(None, description="Filter by material ID"),
+    transaction_type: Optional[str] = Query(None, description="Filter by transaction type"),
+    start_date: Optional[datetime] = Query(None, description="Start date for filtering"),
+    end_date: Optional[datetime] = Query(None, description="End date for filtering"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of records, newest first"),
+    export_format: Literal["arrow", "parquet"] = Query("arrow", alias="format", description="Arrow IPC stream or Parquet"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Export transaction history as typed columns"""
     
-    transactions = query.order_by(InventoryTransaction.transaction_date.desc()).limit(limit).all()
-    return transactions
+    query = build_transactions_query(plant_id, material_id, transaction_type, start_date, end_date, limit)
+    return columnar_response(query, TRANSACTION_ROWS, export_format, "inventory_transactions")
 
-@router.get("/alerts", response_model=List[InventoryAlertResponse])
+@router.get("/alerts", response_model=InventoryAlertList)
 async def get_inventory_alerts(
     plant_id: Optional[str] = Query(None, description="Filter by plant ID"),
     material_id: Optional[str] = Query(None, description="Filter by material ID"),
     alert_type: Optional[str] = Query(None, description="Filter by alert type"),
     severity: Optional[str] = Query(None, description="Filter by severity"),
     is_active: Optional[bool] = Query(True, description="Filter by active status"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    page_size: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Number of records per page"),
+    stream: bool = Query(False, description="Stream all matching records as NDJSON"),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get active inventory alerts"""
     
-    query = db.query(InventoryAlert)
+    query = select(InventoryAlert)
     
     if plant_id:
-        query = query.filter(InventoryAlert.plant_id == plant_id)
+        query = query.where(InventoryAlert.plant_id == plant_id)
     if material_id:
-        query = query.filter(InventoryAlert.material_id == material_id)
+        query = query.where(InventoryAlert.material_id == material_id)
     if alert_type:
-        query = query.filter(InventoryAlert.alert_type == alert_type)
+        query = query.where(InventoryAlert.alert_type == alert_type)
     if severity:
-        query = query.filter(InventoryAlert.severity == severity)
+        query = query.where(InventoryAlert.severity == severity)
     if is_active is not None:
-        query = query.filter(InventoryAlert.is_active == is_active)
+        query = query.where(InventoryAlert.is_active == is_active)
+    
+    # Newest alerts first
+    query = apply_keyset(query, ALERT_KEYSET, cursor, descending=True)
+    if stream:
+        return stream_ndjson(query, InventoryAlertResponse)
     
-    alerts = query.order_by(InventoryAlert.created_at.desc()).all()
-    return alerts
+    result = await db.execute(ALERT_ROWS.select(query).limit(page_size))
+    rows = result.all()
+    return FastJSONResponse({
+        "items": ALERT_ROWS.rows(rows),
+        "page_size": page_size,
+        "next_cursor": next_cursor(rows, ALERT_KEYSET, page_size)
+    })
 
 @router.get("/kpis", response_model=InventoryKPIs)
 async def get_inventory_kpis(
+    request: Request,
     plant_id: Optional[str] = Query(None, description="Filter by plant ID"),
-    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get inventory KPIs for executive dashboard"""
     
-    query = db.query(InventoryLevel)
-    if plant_id:
-        query = query.filter(InventoryLevel.plant_id == plant_id)
-    
-    inventory_levels = query.all()
-    
-    # Calculate KPIs
-    total_materials = len(inventory_levels)
-    total_value = sum(level.total_quantity for level in inventory_levels)
-    low_stock_count = len([level for level in inventory_levels if level.available_quantity < 10])
-    overstock_count = len([level for level in inventory_levels if level.total_quantity > 1000])
-    
-    # Calculate stock-out risk
-    stock_out_risk = len([level for level in inventory_levels if level.available_quantity == 0])
-    
-    return InventoryKPIs(
-        total_materials=total_materials,
-        total_value=total_value,
-        low_stock_count=low_stock_count,
-        overstock_count=overstock_count,
-        stock_out_risk=stock_out_risk,
-        last_updated=datetime.now()
+    async def compute():
+        # Counts and sums are computed in SQL, no ORM rows are loaded
+        async with AsyncSessionLocal() as db:
+            kpis = await InventoryAggregationService(db).get_kpis(plant_id)
+        return InventoryKPIs(
+            **kpis,
+            last_updated=datetime.now()
+        )
+    
+    return await response_cache.get_or_compute(
+        "inventory", request_cache_key(request), compute
     )
 
 @router.get("/summary")
 async def get_inventory_summary(
     plant_id: Optional[str] = Query(None, description="Filter by plant ID"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get inventory summary for executive dashboard"""
     
-    query = db.query(InventoryLevel)
-    if plant_id:
-        query = query.filter(InventoryLevel.plant_id == plant_id)
-    
-    inventory_levels = query.all()
-    
-    # Group by stock type
-    summary_by_type = {}
-    for level in inventory_levels:
-        stock_type = level.stock_type.value
-        if stock_type not in summary_by_type:
-            summary_by_type[stock_type] = {
-                "count": 0,
-                "total_quantity": 0,
-                "total_value": 0
-            }
-        
-        summary_by_type[stock_type]["count"] += 1
-        summary_by_type[stock_type]["total_quantity"] += level.total_quantity
-        summary_by_type[stock_type]["total_value"] += level.total_quantity  # Simplified value calculation
+    # Group by stock type in a single SQL query
+    summary = await InventoryAggregationService(db).get_summary_by_type(plant_id)
     
     return {
-        "summary_by_type": summary_by_type,
-        "total_materials": len(inventory_levels),
+        "summary_by_type": summary["summary_by_type"],
+        "total_materials": summary["total_materials"],
         "last_updated": datetime.now()
-    } 
\ No newline at end of file
+    }
\ No newline at end of file
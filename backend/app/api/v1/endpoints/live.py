@@ -0,0 +1,95 @@
+"""
+Live update WebSocket endpoint
+"""
+
+import asyncio
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+import orjson
+import structlog
+
+from app.core.config import settings
+from app.core.security import authenticate
+from app.services.live_updates import Subscriber, encode_event, live_updates
+
+logger = structlog.get_logger()
+
+router = APIRouter()
+
+
+def _keys(message: dict, name: str) -> List[str]:
+    values = message.get(name) or []
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise ValueError(f"'{name}' must be a list of strings")
+    return values
+
+
+def _reply(event: str, **data) -> bytes:
+    return encode_event(event, data)
+
+
+async def _authenticate(token: str) -> bool:
+    try:
+        await authenticate(token)
+    except HTTPException:
+        return False
+    return True
+
+
+@router.websocket("/ws")
+async def live_updates_socket(
+    websocket: WebSocket,
+    token: str = Query(..., description="Access token from /api/v1/auth/login")
+):
+    """Stream inventory_update and alert_created events for subscribed plants and materials"""
+    if not await _authenticate(token):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await live_updates.start()
+    subscriber = Subscriber(websocket.send_text, lambda code: websocket.close(code=code))
+    hub = live_updates.hub
+    hub.add(subscriber)
+    sender = asyncio.create_task(subscriber.run_sender())
+    try:
+        while True:
+            try:
+                message = orjson.loads(await websocket.receive_text())
+                if not isinstance(message, dict):
+                    raise ValueError("Messages must be JSON objects")
+                plants, materials = _keys(message, "plants"), _keys(message, "materials")
+            except ValueError as e:
+                subscriber.offer(_reply("error", message=str(e)))
+                continue
+            action = message.get("action")
+            everything = bool(message.get("all"))
+
+            if action == "subscribe":
+                if subscriber.subscriptions + len(plants) + len(materials) > settings.LIVE_UPDATES_MAX_SUBSCRIPTIONS:
+                    subscriber.offer(_reply(
+                        "error", message=f"At most {settings.LIVE_UPDATES_MAX_SUBSCRIPTIONS} subscriptions per connection"
+                    ))
+                    continue
+                hub.subscribe(subscriber, plants, materials, everything)
+            elif action == "unsubscribe":
+                hub.unsubscribe(subscriber, plants, materials, everything)
+            else:
+                subscriber.offer(_reply("error", message="action must be 'subscribe' or 'unsubscribe'"))
+                continue
+            subscriber.offer(_reply(
+                "subscribed", plants=sorted(subscriber.plants), materials=sorted(subscriber.materials),
+                all=subscriber.everything
+            ))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        # The sender closes the socket under a client that cannot keep up
+        if not subscriber.closing:
+            logger.warning("Live update connection failed", error=str(e))
+    finally:
+        hub.remove(subscriber)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
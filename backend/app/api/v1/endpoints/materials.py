@@ -3,10 +3,11 @@ Material management endpoints
 """
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_db_async
 from app.core.security import get_current_user
 from app.models.materials import Material, MaterialCategory
 
@@ -18,34 +19,35 @@ async def get_materials(
     material_group: Optional[str] = Query(None, description="Filter by material group"),
     is_active: Optional[bool] = Query(True, description="Filter by active status"),
     erp_system: Optional[str] = Query(None, description="Filter by ERP system"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all materials with optional filtering"""
     
-    query = db.query(Material)
+    query = select(Material)
     
     if category:
-        query = query.filter(Material.category == category)
+        query = query.where(Material.category == category)
     if material_group:
-        query = query.filter(Material.material_group == material_group)
+        query = query.where(Material.material_group == material_group)
     if is_active is not None:
-        query = query.filter(Material.is_active == is_active)
+        query = query.where(Material.is_active == is_active)
     if erp_system:
-        query = query.filter(Material.erp_system == erp_system)
+        query = query.where(Material.erp_system == erp_system)
     
-    materials = query.all()
-    return materials
+    result = await db.execute(query)
+    return result.scalars().all()
 
 @router.get("/{material_id}")
 async def get_material(
     material_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get specific material details"""
     
-    material = db.query(Material).filter(Material.material_id == material_id).first()
+    result = await db.execute(select(Material).where(Material.material_id == material_id))
+    material = result.scalars().first()
     if not material:
         return {"error": "Material not found"}
     
@@ -53,7 +55,7 @@ async def get_material(
 
 @router.get("/categories")
 async def get_material_categories(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all material categories"""
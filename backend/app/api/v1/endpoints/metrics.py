@@ -0,0 +1,133 @@
+"""
+Operational metrics endpoints
+"""
+
+from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+import os
+
+from app.core.config import settings
+from app.core import logging as app_logging
+from app.core.database import engine, async_engine, replicas
+from app.core.pool import get_pool_status, worker_pool_size
+from app.core.query_profiler import query_profiler
+from app.core.security import get_admin_user, get_current_user, password_hasher
+from app.services.erp_sync import get_sync_status
+from app.services.live_updates import live_updates
+
+router = APIRouter()
+
+@router.get("/database-pool")
+async def get_database_pool_metrics(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get connection pool usage for this worker process"""
+    
+    return {
+        "worker_pid": os.getpid(),
+        "workers": settings.WEB_CONCURRENCY,
+        "configured": {
+            "total_pool_size": settings.DATABASE_POOL_SIZE,
+            "total_max_overflow": settings.DATABASE_MAX_OVERFLOW,
+            "per_worker": worker_pool_size(),
+            "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+            "pool_recycle": settings.DATABASE_POOL_RECYCLE
+        },
+        "async_pool": get_pool_status(async_engine.sync_engine),
+        "sync_pool": get_pool_status(engine),
+        "replica_pools": {
+            name: get_pool_status(replica.sync_engine) for name, replica in replicas.engines().items()
+        },
+        "last_updated": datetime.now()
+    }
+
+
+@router.get("/database-replicas")
+async def get_database_replica_metrics(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the health, replay lag and share of reads of each read replica on this worker"""
+    
+    return {
+        "worker_pid": os.getpid(),
+        "routes": settings.DATABASE_REPLICA_ROUTES,
+        **replicas.stats(),
+        "last_updated": datetime.now()
+    }
+
+
+@router.get("/erp-sync")
+async def get_erp_sync_metrics(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the watermark, lag and throughput of every ERP delta sync source"""
+    
+    async with async_engine.connect() as connection:
+        sources = await get_sync_status(connection)
+    
+    return {
+        "interval_seconds": settings.ERP_SYNC_INTERVAL,
+        "overlap_seconds": settings.ERP_SYNC_OVERLAP,
+        "sources": sources,
+        "last_updated": datetime.now()
+    }
+
+
+@router.get("/password-hashing")
+async def get_password_hashing_metrics(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the queue depth and timings of login password checks on this worker"""
+    
+    return {
+        "worker_pid": os.getpid(),
+        **password_hasher.stats(),
+        "last_updated": datetime.now()
+    }
+
+
+@router.get("/live-updates")
+async def get_live_update_metrics(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the WebSocket subscribers, fan-out and change feed state of this worker"""
+    
+    return {
+        "worker_pid": os.getpid(),
+        **live_updates.stats(),
+        "last_updated": datetime.now()
+    }
+
+
+@router.get("/logging")
+async def get_logging_metrics(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the log queue depth and dropped and sampled-out records of this worker"""
+    
+    pipeline = app_logging.log_pipeline
+    return {
+        "worker_pid": os.getpid(),
+        "level": settings.LOG_LEVEL,
+        **(pipeline.stats() if pipeline is not None else {"running": False}),
+        "last_updated": datetime.now()
+    }
+
+
+@router.get("/queries")
+async def get_query_profile(
+    limit: int = Query(50, ge=1, le=1000, description="Routes, N+1 findings and slow queries returned"),
+    reset: bool = Query(False, description="Clear the totals and findings after reading them"),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Get per-route query totals, N+1 findings and slow query plans of this worker"""
+    
+    report = query_profiler.report(limit)
+    if reset:
+        query_profiler.reset()
+    return {
+        "worker_pid": os.getpid(),
+        "enabled": settings.QUERY_PROFILER_ENABLED,
+        **report,
+        "last_updated": datetime.now()
+    }
@@ -3,10 +3,11 @@ Plant management endpoints
 """
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.database import get_db_async
 from app.core.security import get_current_user
 from app.models.plants import Plant, StorageLocation
 
@@ -17,32 +18,33 @@ async def get_plants(
     country: Optional[str] = Query(None, description="Filter by country"),
     plant_type: Optional[str] = Query(None, description="Filter by plant type"),
     is_active: Optional[bool] = Query(True, description="Filter by active status"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all plants with optional filtering"""
     
-    query = db.query(Plant)
+    query = select(Plant)
     
     if country:
-        query = query.filter(Plant.country == country)
+        query = query.where(Plant.country == country)
     if plant_type:
-        query = query.filter(Plant.plant_type == plant_type)
+        query = query.where(Plant.plant_type == plant_type)
     if is_active is not None:
-        query = query.filter(Plant.is_active == is_active)
+        query = query.where(Plant.is_active == is_active)
     
-    plants = query.all()
-    return plants
+    result = await db.execute(query)
+    return result.scalars().all()
 
 @router.get("/{plant_id}")
 async def get_plant(
     plant_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get specific plant details"""
     
-    plant = db.query(Plant).filter(Plant.plant_code == plant_id).first()
+    result = await db.execute(select(Plant).where(Plant.plant_code == plant_id))
+    plant = result.scalars().first()
     if not plant:
         return {"error": "Plant not found"}
     
@@ -51,10 +53,10 @@ async def get_plant(
 @router.get("/{plant_id}/storage-locations")
 async def get_storage_locations(
     plant_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db_async),
     current_user: dict = Depends(get_current_user)
 ):
     """Get storage locations for a specific plant"""
     
-    locations = db.query(StorageLocation).filter(StorageLocation.plant_id == plant_id).all()
-    return locations 
\ No newline at end of file
+    result = await db.execute(select(StorageLocation).where(StorageLocation.plant_id == plant_id))
+    return result.scalars().all() 
\ No newline at end of file
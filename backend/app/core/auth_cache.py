@@ -0,0 +1,230 @@
+"""
+Caches for request authentication
+
+VerifiedTokenCache keeps the claims of bearer tokens whose signature has
+been checked, so the parallel requests of a dashboard page verify a token
+once. An entry lives until the token's exp or TOKEN_CACHE_TTL, whichever
+comes first. Revocations go to the shared cache backend: a revoked token
+stays listed until it would have expired, and a revocation counter tells
+every worker to drop its verified tokens. Workers read the counter at
+most every TOKEN_REVOCATION_CHECK_INTERVAL seconds.
+
+UserCache keeps the role and active flag of users for USER_CACHE_TTL, so
+a deactivation or role change made in the users table takes effect within
+that many seconds.
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import structlog
+
+from app.core.cache import CacheBackend, response_cache
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+REVOCATION_COUNTER_KEY = "auth:revocations"
+REVOKED_TOKEN_KEY = "auth:revoked:{}"
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries expire at a wall-clock deadline"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return _MISSING
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class VerifiedTokenCache:
+    """Claims of verified tokens, honouring exp and revocations"""
+
+    def __init__(
+        self,
+        decode: Callable[[str], Optional[dict]],
+        backend: Optional[CacheBackend] = None,
+        max_entries: int = settings.TOKEN_CACHE_MAX_ENTRIES,
+        ttl: int = settings.TOKEN_CACHE_TTL,
+        check_interval: float = settings.TOKEN_REVOCATION_CHECK_INTERVAL
+    ):
+        self._decode = decode
+        self._backend = backend
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._entries = TTLCache(max_entries)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._revocations: Optional[bytes] = None
+        self._next_check = 0.0
+        self._listeners = []
+
+    @property
+    def backend(self) -> CacheBackend:
+        # Shares the response cache's Redis connection by default
+        return self._backend or response_cache.backend
+
+    def on_revocation(self, callback: Callable[[], None]) -> None:
+        """Run callback whenever verified tokens are dropped after a revocation"""
+        self._listeners.append(callback)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        for callback in self._listeners:
+            callback()
+
+    async def _check_revocations(self) -> None:
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        counter = await self.backend.get(REVOCATION_COUNTER_KEY) or b"0"
+        if counter != self._revocations:
+            if self._revocations is not None:
+                self.clear()
+            self._revocations = counter
+
+    async def _is_revoked(self, digest: str) -> bool:
+        return await self.backend.get(REVOKED_TOKEN_KEY.format(digest)) is not None
+
+    async def _verify(self, token: str, digest: str) -> Optional[dict]:
+        payload = self._decode(token)
+        if payload is None or await self._is_revoked(digest):
+            return None
+        expires_at = time.time() + self.ttl
+        if "exp" in payload:
+            expires_at = min(expires_at, float(payload["exp"]))
+        self._entries.set(digest, payload, expires_at)
+        return payload
+
+    async def claims(self, token: str) -> Optional[dict]:
+        """Verified claims of token, or None when it is invalid, expired or revoked"""
+        await self._check_revocations()
+        digest = token_digest(token)
+        payload = self._entries.get(digest)
+        if payload is not _MISSING:
+            return payload
+
+        # Parallel requests with the same new token verify it once
+        inflight = self._inflight.get(digest)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[digest] = future
+        try:
+            payload = await self._verify(token, digest)
+            future.set_result(payload)
+            return payload
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(digest, None)
+
+    async def _announce(self) -> None:
+        self.clear()
+        try:
+            counter = await self.backend.incr(REVOCATION_COUNTER_KEY)
+        except Exception as e:
+            logger.error("Announcing token revocation failed", error=str(e))
+            return
+        if counter is None:
+            logger.error("Announcing token revocation failed", error="cache backend unavailable")
+            return
+        self._revocations = str(counter).encode()
+
+    async def revoke(self, token: str, payload: dict) -> None:
+        """Reject token from now on, in every worker"""
+        remaining = float(payload.get("exp", time.time() + self.ttl)) - time.time()
+        if remaining > 0:
+            await self.backend.set(REVOKED_TOKEN_KEY.format(token_digest(token)), b"1", int(remaining) + 1)
+        await self._announce()
+        logger.info("Token revoked", sub=payload.get("sub"))
+
+    def stats(self) -> Dict[str, int]:
+        return self._entries.stats()
+
+
+class UserCache:
+    """Role and active flag per username, loaded on a miss"""
+
+    def __init__(
+        self,
+        loader: Callable[[str], Awaitable[Optional[dict]]],
+        max_entries: int = settings.TOKEN_CACHE_MAX_ENTRIES,
+        ttl: int = settings.USER_CACHE_TTL
+    ):
+        self._loader = loader
+        self.ttl = ttl
+        self._entries = TTLCache(max_entries)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get(self, username: str) -> Optional[dict]:
+        user = self._entries.get(username)
+        if user is not _MISSING:
+            return user
+
+        # Parallel requests of a user missing from the cache load it once
+        inflight = self._inflight.get(username)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[username] = future
+        try:
+            user = await self._loader(username)
+            # Unknown users are cached too, so they cost one lookup per TTL
+            self._entries.set(username, user, time.time() + self.ttl)
+            future.set_result(user)
+            return user
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(username, None)
+
+    def invalidate(self, username: Optional[str] = None) -> None:
+        if username is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(username)
+
+    def stats(self) -> Dict[str, int]:
+        return self._entries.stats()
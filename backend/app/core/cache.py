@@ -0,0 +1,319 @@
+"""
+Response caching for dashboard endpoints
+
+Entries are stored in Redis (or an in-process LRU for tests and single
+workers) and keyed on the route and normalized query parameters; they are
+shared by every user. Stale entries are served while one caller refreshes them
+in the background, and a per-key lock keeps an expired key from being
+recomputed by every concurrent request.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from urllib.parse import urlencode
+
+import structlog
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Namespaces whose cached responses depend on ERP inventory data
+ERP_DATA_NAMESPACES = ("inventory", "analytics", "ai")
+
+
+class CacheBackend:
+    """Minimal key/value interface used by ResponseCache"""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        """Set key only if it does not exist; return True when set"""
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> Optional[int]:
+        """Increment a counter; None when the backend could not be reached"""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process LRU backend with per-key expiry"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Counters are kept apart so eviction never resets a generation
+        self._counters: Dict[str, int] = {}
+
+    def _live(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: Any, ttl: Optional[int]):
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        if key in self._counters:
+            return str(self._counters[key]).encode()
+        return self._live(key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._store(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        if self._live(key) is not None:
+            return False
+        self._store(key, value, ttl)
+        return True
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._counters.pop(key, None)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Redis backend; connection errors degrade to cache misses"""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self._client = redis.from_url(url)
+        self._errors = RedisError
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self._client.get(key)
+        except self._errors as e:
+            logger.warning("Cache read failed", key=key, error=str(e))
+            return None
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        try:
+            await self._client.set(key, value, ex=ttl)
+        except self._errors as e:
+            logger.warning("Cache write failed", key=key, error=str(e))
+
+    async def add(self, key: str, value: bytes, ttl: int) -> bool:
+        try:
+            return bool(await self._client.set(key, value, ex=ttl, nx=True))
+        except self._errors as e:
+            logger.warning("Cache lock failed", key=key, error=str(e))
+            return True
+
+    async def incr(self, key: str) -> Optional[int]:
+        try:
+            return await self._client.incr(key)
+        except self._errors as e:
+            logger.warning("Cache counter increment failed", key=key, error=str(e))
+            return None
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self._client.delete(key)
+        except self._errors as e:
+            logger.warning("Cache delete failed", key=key, error=str(e))
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_cache_backend() -> CacheBackend:
+    """Create the backend selected by settings.CACHE_BACKEND"""
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.REDIS_URL)
+    if settings.CACHE_BACKEND == "memory":
+        return LRUCacheBackend(settings.CACHE_MAX_ENTRIES)
+    raise ValueError(f"Unknown cache backend '{settings.CACHE_BACKEND}'")
+
+
+def request_cache_key(request: Request) -> str:
+    """Build a cache key from the route and sorted query parameters
+
+    Every authenticated caller shares the entry: the cached endpoints
+    return the same data to all users, and no token carries a data scope.
+    """
+    params = sorted(
+        (name, value) for name, value in request.query_params.multi_items() if value != ""
+    )
+    raw = f"{request.url.path}?{urlencode(params)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Stale-while-revalidate cache with single-flight recomputation"""
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        ttl: int = settings.CACHE_TTL,
+        stale_ttl: int = settings.CACHE_STALE_TTL,
+        lock_timeout: float = 10.0
+    ):
+        self._backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_timeout = lock_timeout
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+
+    @property
+    def backend(self) -> CacheBackend:
+        if self._backend is None:
+            self._backend = create_cache_backend()
+        return self._backend
+
+    def set_backend(self, backend: CacheBackend) -> None:
+        """Swap the storage backend, e.g. for an LRUCacheBackend in tests"""
+        self._backend = backend
+        self._inflight.clear()
+
+    async def _entry_key(self, namespace: str, key: str) -> str:
+        generation = await self.backend.get(f"cache:gen:{namespace}")
+        return f"cache:{namespace}:{int(generation or 0)}:{key}"
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached value for key, computing it if needed
+
+        compute must not depend on request-scoped resources such as the
+        request's database session, because it may run after the
+        response has been sent to refresh a stale entry.
+        """
+        entry_key = await self._entry_key(namespace, key)
+        raw = await self.backend.get(entry_key)
+        if raw is not None:
+            entry = json.loads(raw)
+            if time.time() >= entry["fresh_until"]:
+                self._refresh_in_background(entry_key, compute)
+            return entry["value"]
+
+        return await self._single_flight(entry_key, compute)
+
+    async def _store(self, entry_key: str, value: Any) -> Any:
+        value = jsonable_encoder(value)
+        entry = {"value": value, "fresh_until": time.time() + self.ttl}
+        await self.backend.set(entry_key, json.dumps(entry).encode(), self.ttl + self.stale_ttl)
+        return value
+
+    async def _compute_locked(self, entry_key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        lock_key = f"{entry_key}:lock"
+        token = uuid.uuid4().hex.encode()
+
+        if not await self.backend.add(lock_key, token, int(self.lock_timeout) + 1):
+            # Another worker is computing this key; wait for its result
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                raw = await self.backend.get(entry_key)
+                if raw is not None:
+                    return json.loads(raw)["value"]
+
+        try:
+            return await self._store(entry_key, await compute())
+        finally:
+            if await self.backend.get(lock_key) == token:
+                await self.backend.delete(lock_key)
+
+    async def _single_flight(self, entry_key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        inflight = self._inflight.get(entry_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[entry_key] = future
+        try:
+            value = await self._compute_locked(entry_key, compute)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(entry_key, None)
+
+    def _refresh_in_background(self, entry_key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+        if entry_key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._single_flight(entry_key, compute)
+            except Exception as e:
+                logger.warning("Background cache refresh failed", key=entry_key, error=str(e))
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def invalidate(self, *namespaces: str) -> bool:
+        """Invalidate every entry in the given namespaces
+
+        Never raises; returns False when a namespace could not be
+        invalidated, whose entries then expire with their TTL.
+        """
+        invalidated = True
+        for namespace in namespaces:
+            try:
+                generation = await self.backend.incr(f"cache:gen:{namespace}")
+            except Exception as e:
+                logger.warning("Cache namespace invalidation failed", namespace=namespace, error=str(e))
+                generation = None
+            if generation is None:
+                invalidated = False
+                continue
+            logger.info("Cache namespace invalidated", namespace=namespace)
+        return invalidated
+
+    async def close(self) -> None:
+        for task in list(self._background):
+            task.cancel()
+        if self._backend is not None:
+            await self._backend.close()
+
+
+# Shared response cache
+response_cache = ResponseCache()
+
+
+async def invalidate_erp_data() -> bool:
+    """Invalidate cached responses after new ERP data has been loaded"""
+    return await response_cache.invalidate(*ERP_DATA_NAMESPACES)
@@ -3,30 +3,101 @@ Database configuration and connection management
 """
 
 from sqlalchemy import create_engine, MetaData
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import Session, sessionmaker
 import structlog
 from typing import AsyncGenerator
 import asyncio
 
 from app.core.config import settings
+from app.core.pool import get_pool_options
+from app.core.replicas import ReplicaSet, reads_from_replica
 
 logger = structlog.get_logger()
 
 # Database engine
 engine = create_engine(
     settings.DATABASE_URL,
-    poolclass=StaticPool,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_pre_ping=True,
+    **get_pool_options(make_url(settings.DATABASE_URL)),
     echo=settings.DEBUG
 )
 
 # Session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async drivers used for each database backend
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+def get_async_database_url(database_url: str) -> URL:
+    """Translate a sync database URL to its async driver equivalent"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend '{backend}'")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+# Async database engine
+async_database_url = get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(
+    async_database_url,
+    **get_pool_options(async_database_url, is_async=True),
+    echo=settings.DEBUG
+)
+
+# Read replicas, used by async sessions on the read routes
+replicas = ReplicaSet(async_engine, {
+    f"replica{number}": create_async_engine(
+        url,
+        **get_pool_options(url, is_async=True),
+        echo=settings.DEBUG
+    )
+    for number, url in enumerate(map(get_async_database_url, settings.DATABASE_REPLICA_URLS), 1)
+})
+
+class RoutingSession(Session):
+    """Session sending its reads to a replica when opened on a read route
+    
+    The replica is picked at the first read and kept for the session, so
+    its reads see one replica's state. Writes, locking reads and textual
+    statements go to the primary, and so does everything after them, so
+    the session reads its own writes.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._use_replica = bool(replicas.replicas) and reads_from_replica()
+        self._replica_bind = None
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._use_replica:
+            if (
+                not self._flushing
+                and getattr(clause, "is_select", False)
+                and getattr(clause, "_for_update_arg", None) is None
+            ):
+                if self._replica_bind is None:
+                    replica = replicas.choose()
+                    if replica is not None:
+                        self._replica_bind = replica.engine.sync_engine
+                if self._replica_bind is not None:
+                    return self._replica_bind
+            self._use_replica = False
+        return super().get_bind(mapper, clause=clause, **kw)
+
+# Async session factory
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -34,19 +105,24 @@ Base = declarative_base()
 metadata = MetaData()
 
 async def init_db():
-    """Initialize database tables"""
+    """Check the schema version, creating missing tables only when it changed"""
     try:
         # Import all models to ensure they are registered
         from app.models import inventory, plants, materials, users
+        from app.core.schema import ensure_schema
         
-        # Create all tables
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
+        await ensure_schema()
         
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
         raise
 
+async def close_db():
+    """Stop the replica health checks and dispose database connection pools"""
+    await replicas.close()
+    await async_engine.dispose()
+    engine.dispose()
+
 def get_db():
     """Get database session"""
     db = SessionLocal()
@@ -55,12 +131,7 @@ def get_db():
     finally:
         db.close()
 
-async def get_db_async() -> AsyncGenerator:
+async def get_db_async() -> AsyncGenerator[AsyncSession, None]:
     """Get async database session"""
-    # For now, using sync session in async context
-    # In production, consider using async SQLAlchemy
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close() 
\ No newline at end of file
+    async with AsyncSessionLocal() as db:
+        yield db 
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Deferred imports of heavy numerical and ML libraries
+
+Importing NumPy and pandas takes a large share of a worker's boot time, and
+the planned forecasting stack (statsmodels, prophet, tensorflow) takes
+seconds more, yet most requests never touch them. lazy_import() returns a
+stand-in module that imports the real one on first attribute access, so
+services keep their module-level aliases:
+
+    np = lazy_import("numpy")
+
+Modules using it start with "from __future__ import annotations", so that
+annotations such as np.ndarray are not evaluated at import time.
+Dependencies needed by a single function stay imported inside it, as
+pyarrow is in columnar_export.
+
+The stand-in never enters sys.modules, and the real import goes through
+importlib, whose per-module lock makes threads that arrive during the
+import wait for it to finish. importlib.util.LazyLoader is not safe that
+way before Python 3.12.
+"""
+
+import importlib
+import importlib.util
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Imports its module on first attribute access, then mirrors it"""
+
+    def __getattr__(self, attr: str):
+        # Only reached for names not yet copied from the real module
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """The module if already imported, otherwise a stand-in importing it on first use"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    return LazyModule(name)
+
+
+def is_loaded(name: str) -> bool:
+    """Whether a module has actually been imported"""
+    return name in sys.modules
@@ -1,37 +1,208 @@
 """
 Logging configuration for structured logging
+
+Log calls only build an event dict on the calling thread. The record is
+handed to a bounded queue and a writer thread renders it to JSON and
+writes it to stdout, so neither rendering nor stdout I/O run on the event
+loop. When the writer falls behind and the queue is full, new records are
+dropped and counted rather than blocking the caller; the writer reports
+the count once it catches up. Loggers below LOG_LEVEL are no-op methods,
+and high-volume events can be sampled with LOG_DEBUG_SAMPLE_RATE and
+LOG_SAMPLE_RATES.
 """
 
-import structlog
+import atexit
 import logging
+import queue
+import random
 import sys
-from typing import Any, Dict
+import threading
+from logging.handlers import QueueListener
+from typing import Any, Dict, Optional
+
+import structlog
+
+from app.core.config import settings
+
+
+class EventSampler:
+    """Processor keeping a fraction of high-volume events
+
+    Rates come from LOG_SAMPLE_RATES by event name, then from
+    LOG_DEBUG_SAMPLE_RATE for debug events. Kept events carry their
+    sample_rate so counts can be scaled back up.
+    """
+
+    def __init__(self, debug_rate: float = 1.0, rates: Optional[Dict[str, float]] = None):
+        self.debug_rate = debug_rate
+        self.rates = rates or {}
+        self.sampled_out = 0
+        self._random = random.random
+
+    def __call__(self, logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+        rate = self.rates.get(event_dict.get("event"), self.debug_rate if method_name == "debug" else 1.0)
+        if rate >= 1.0:
+            return event_dict
+        if self._random() >= rate:
+            self.sampled_out += 1
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = rate
+        return event_dict
+
+
+def capture_exc_info(logger, method_name: str, event_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Resolve exc_info=True while still on the thread handling the exception"""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+class NonBlockingQueueHandler(logging.Handler):
+    """Hands records to the writer thread without ever waiting for it
+
+    Unlike logging.handlers.QueueHandler, records are not formatted here;
+    structlog events are rendered by the writer. Messages of other
+    libraries' records are merged with their arguments up front, since
+    the arguments may change before the writer gets to them.
+    """
+
+    def __init__(self, records: queue.Queue):
+        super().__init__()
+        self.records = records
+        self.dropped = 0
+        self._drop_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord):
+        if record.args and not isinstance(record.msg, dict):
+            record.msg = record.getMessage()
+            record.args = None
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            with self._drop_lock:
+                self.dropped += 1
+
+
+class LogWriter(QueueListener):
+    """Writer thread draining the queue into the output handler"""
+
+    def __init__(self, records: queue.Queue, handler: logging.Handler, source: NonBlockingQueueHandler):
+        super().__init__(records, handler)
+        self.source = source
+        self.written = 0
+        self.reported_dropped = 0
+
+    def handle(self, record: logging.LogRecord):
+        super().handle(record)
+        self.written += 1
+        dropped = self.source.dropped
+        if dropped != self.reported_dropped and self.queue.empty():
+            super().handle(logging.makeLogRecord({
+                "name": __name__,
+                "levelno": logging.WARNING,
+                "levelname": "WARNING",
+                "msg": f"Log records dropped: {dropped - self.reported_dropped} while the queue was full",
+            }))
+            self.reported_dropped = dropped
+
+    def enqueue_sentinel(self):
+        # Wait for room, the base class would raise on a full queue
+        self.queue.put(self._sentinel)
+
+
+class LogPipeline:
+    """Bounded queue, its handler and the writer thread"""
+
+    def __init__(self, output: logging.Handler, queue_size: int, sampler: EventSampler):
+        self.records: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = NonBlockingQueueHandler(self.records)
+        self.writer = LogWriter(self.records, output, self.handler)
+        self.sampler = sampler
+        self.running = False
+
+    def start(self):
+        if not self.running:
+            self.writer.start()
+            self.running = True
+
+    def stop(self):
+        """Write out the queued records and stop the writer thread"""
+        if self.running:
+            self.running = False
+            self.writer.stop()
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "queue_size": self.records.maxsize,
+            "queued": self.records.qsize(),
+            "written": self.writer.written,
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampler.sampled_out,
+        }
+
+
+log_pipeline: Optional[LogPipeline] = None
+
 
 def setup_logging():
     """Setup structured logging configuration"""
-    
-    # Configure standard library logging
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=logging.INFO,
+    global log_pipeline
+
+    level = logging.getLevelName(settings.LOG_LEVEL.upper())
+    if not isinstance(level, int):
+        level = logging.INFO
+
+    # Rendered on the writer thread, for structlog events and other libraries' records alike
+    renderer = (
+        structlog.dev.ConsoleRenderer(colors=False)
+        if settings.LOG_FORMAT == "console"
+        else structlog.processors.JSONRenderer()
     )
-    
-    # Configure structlog
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(structlog.stdlib.ProcessorFormatter(
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+        ],
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            renderer,
+        ],
+    ))
+
+    if log_pipeline is not None:
+        log_pipeline.stop()
+    sampler = EventSampler(settings.LOG_DEBUG_SAMPLE_RATE, settings.LOG_SAMPLE_RATES)
+    log_pipeline = LogPipeline(output, settings.LOG_QUEUE_SIZE, sampler)
+
+    # Configure standard library logging
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(log_pipeline.handler)
+    root.setLevel(level)
+    log_pipeline.start()
+    # Stopped at interpreter exit, after the last records of the shutdown
+    atexit.register(log_pipeline.stop)
+
+    # Configure structlog; calls below the level return before any processor runs
     structlog.configure(
         processors=[
-            structlog.stdlib.filter_by_level,
+            sampler,
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
             structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
+            capture_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
+        wrapper_class=structlog.make_filtering_bound_logger(level),
         cache_logger_on_first_use=True,
-    ) 
\ No newline at end of file
+    )
+
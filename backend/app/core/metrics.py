@@ -0,0 +1,341 @@
+"""
+Prometheus metrics for requests, database queries, connection pools and jobs
+
+MetricsMiddleware times every HTTP request by method, route template and
+status, and counts the database queries and database time each request
+spends, attributed through a context variable that the engine event
+listeners add to. Connection pool usage is sampled every
+METRICS_POOL_SAMPLE_INTERVAL seconds, and job_timer() times forecast and
+optimizer runs.
+
+Metrics are served on METRICS_PORT by a small HTTP server thread, apart
+from the API. With several uvicorn workers every worker writes its samples
+to files in a directory shared by the workers (prometheus_client's
+multiprocess mode) and whichever worker bound METRICS_PORT serves the
+aggregate of all of them.
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+def multiprocess_dir() -> Optional[str]:
+    """Directory the workers of this deployment share their samples through
+
+    uvicorn and gunicorn workers are children of one supervisor, so its
+    pid keys a directory that is fresh on every restart.
+    """
+    if not settings.ENABLE_METRICS:
+        return None
+    if settings.METRICS_MULTIPROC_DIR:
+        return settings.METRICS_MULTIPROC_DIR
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    if settings.WEB_CONCURRENCY > 1:
+        return os.path.join(tempfile.gettempdir(), "inventory-health-metrics", str(os.getppid()))
+    return None
+
+
+# prometheus_client picks in-memory or file-backed values when it is first
+# imported, so the directory has to be in the environment before that
+MULTIPROC_DIR = multiprocess_dir()
+if MULTIPROC_DIR:
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = MULTIPROC_DIR
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, multiprocess, start_http_server  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+from sqlalchemy.pool import QueuePool  # noqa: E402
+
+# Label of requests that matched no route, so unknown paths add no series
+UNMATCHED_ROUTE = "unmatched"
+METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"})
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being handled",
+    multiprocess_mode="livesum"
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries issued while handling a request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time a request spent in database queries",
+    ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database query latency",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Pooled database connections by state",
+    ["engine", "state"],
+    multiprocess_mode="livesum"
+)
+POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts",
+    "Connections checked out of the pool",
+    ["engine"]
+)
+POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts",
+    "Checkouts that timed out waiting for a connection",
+    ["engine"]
+)
+POOL_CHECKOUT_WAIT = Counter(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for pooled connections",
+    ["engine"]
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Forecast and optimizer job duration",
+    ["job", "status"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+)
+JOBS_IN_PROGRESS = Gauge(
+    "jobs_in_progress",
+    "Forecast and optimizer jobs running",
+    ["job"],
+    multiprocess_mode="livesum"
+)
+
+# [queries, seconds] of the request being handled
+_request_queries: ContextVar[Optional[List]] = ContextVar("request_queries", default=None)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and database use of HTTP requests
+
+    Written against raw ASGI rather than BaseHTTPMiddleware, whose extra
+    task per request would cost more than everything recorded here. The
+    labelled histogram children are looked up once per route and status.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._children: Dict[Tuple[str, str, int], Tuple] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        REQUESTS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            REQUESTS_IN_PROGRESS.dec()
+            _request_queries.reset(token)
+            duration, query_count, db_seconds = self._labelled(scope, status)
+            duration.observe(elapsed)
+            query_count.observe(queries[0])
+            db_seconds.observe(queries[1])
+
+    def _labelled(self, scope, status: int) -> Tuple:
+        # FastAPI leaves the matched route in the scope
+        route = scope.get("route")
+        path = getattr(route, "path", None) or UNMATCHED_ROUTE
+        method = scope["method"] if scope["method"] in METHODS else "OTHER"
+        key = (method, path, status)
+        children = self._children.get(key)
+        if children is None:
+            children = self._children[key] = (
+                REQUEST_DURATION.labels(method, path, str(status)),
+                REQUEST_QUERIES.labels(method, path),
+                REQUEST_DB_SECONDS.labels(method, path)
+            )
+        return children
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Time every query run on an engine and add it to the current request"""
+    histogram = QUERY_DURATION.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._metrics_started
+        histogram.observe(elapsed)
+        queries = _request_queries.get()
+        if queries is not None:
+            queries[0] += 1
+            queries[1] += elapsed
+
+
+class PoolSampler:
+    """Copy connection pool usage and checkout statistics into the metrics"""
+
+    def __init__(self, engines: Dict[str, Engine], interval: float):
+        self.engines = engines
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reported: Dict[str, Tuple[int, int, float]] = {}
+
+    def sample(self):
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                POOL_CONNECTIONS.labels(name, "checked_out").set(pool.checkedout())
+                POOL_CONNECTIONS.labels(name, "checked_in").set(pool.checkedin())
+                POOL_CONNECTIONS.labels(name, "overflow").set(max(0, pool.overflow()))
+            stats = getattr(pool, "stats", None)
+            if stats is None:
+                continue
+            # PoolStats totals are cumulative, counters only move forward
+            current = (stats.checkouts, stats.timeouts, stats.total_wait_seconds)
+            checkouts, timeouts, wait_seconds = self._reported.get(name, (0, 0, 0.0))
+            POOL_CHECKOUTS.labels(name).inc(current[0] - checkouts)
+            POOL_CHECKOUT_TIMEOUTS.labels(name).inc(current[1] - timeouts)
+            POOL_CHECKOUT_WAIT.labels(name).inc(current[2] - wait_seconds)
+            self._reported[name] = current
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning("Pool metrics sample failed", error=str(e))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pool-metrics", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+        self.sample()
+
+
+@contextmanager
+def job_timer(job: str):
+    """Record how long a forecast or optimizer job takes and how it ended"""
+    in_progress = JOBS_IN_PROGRESS.labels(job)
+    in_progress.inc()
+    started = time.perf_counter()
+    status = "failed"
+    try:
+        yield
+        status = "completed"
+    except (GeneratorExit, asyncio.CancelledError):
+        # An abandoned streaming job, e.g. the client disconnected
+        status = "cancelled"
+        raise
+    finally:
+        in_progress.dec()
+        JOB_DURATION.labels(job, status).observe(time.perf_counter() - started)
+
+
+def timed_job(job: str):
+    """Decorate an async function or async generator to run under job_timer"""
+
+    def decorate(function):
+        if inspect.isasyncgenfunction(function):
+            @functools.wraps(function)
+            async def generator(*args, **kwargs):
+                with job_timer(job):
+                    async for item in function(*args, **kwargs):
+                        yield item
+            return generator
+
+        @functools.wraps(function)
+        async def coroutine(*args, **kwargs):
+            with job_timer(job):
+                return await function(*args, **kwargs)
+        return coroutine
+
+    return decorate
+
+
+class MetricsExporter:
+    """Serves the metrics of this worker, or of all workers, on METRICS_PORT"""
+
+    def __init__(self):
+        self.server = None
+        self.pool_sampler: Optional[PoolSampler] = None
+
+    def registry(self):
+        if MULTIPROC_DIR is None:
+            return REGISTRY
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    def start(self, engines: Dict[str, Engine]):
+        """Instrument the named engines and serve METRICS_PORT if it is free"""
+        for name, instrumented in engines.items():
+            instrument_engine(instrumented, name)
+        self.pool_sampler = PoolSampler(engines, settings.METRICS_POOL_SAMPLE_INTERVAL)
+        self.pool_sampler.start()
+
+        try:
+            self.server, _ = start_http_server(settings.METRICS_PORT, registry=self.registry())
+        except OSError:
+            # Another worker of this deployment already serves the port
+            logger.info("Metrics port in use, served by another worker", port=settings.METRICS_PORT)
+            return
+        logger.info(
+            "Serving metrics",
+            port=settings.METRICS_PORT,
+            multiprocess_dir=MULTIPROC_DIR
+        )
+
+    def close(self):
+        if self.pool_sampler is not None:
+            self.pool_sampler.stop()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if MULTIPROC_DIR is not None:
+            # Drop this worker's live gauges from the aggregate
+            multiprocess.mark_process_dead(os.getpid())
+
+
+metrics_exporter = MetricsExporter()
@@ -0,0 +1,109 @@
+"""
+Keyset pagination and NDJSON streaming helpers
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence, Type
+
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select, func, tuple_
+
+from app.core.database import AsyncSessionLocal
+
+# Page size limits for list endpoints
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+# Rows fetched per round trip from a server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+# NULLs in a nullable keyset column of these types sort and compare as
+# this value, so those rows are paged exactly once
+NULL_KEYS = {datetime: datetime(1970, 1, 1)}
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row into an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    """Decode a cursor back into sort key values of the given types"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("cursor has the wrong number of keys")
+        return [
+            datetime.fromisoformat(value) if key_type is datetime else key_type(value)
+            for value, key_type in zip(values, types)
+        ]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid cursor: {e}"
+        )
+
+
+def _null_key(column) -> Any:
+    """Value standing in for NULL in a keyset column, or None if it is never NULL"""
+    if not getattr(column, "nullable", False):
+        return None
+    return NULL_KEYS.get(column.type.python_type)
+
+
+def _key_expression(column):
+    null_key = _null_key(column)
+    return column if null_key is None else func.coalesce(column, null_key)
+
+
+def apply_keyset(
+    query: Select,
+    columns: Sequence,
+    cursor: Optional[str],
+    descending: bool = False
+) -> Select:
+    """Order a query by the keyset columns and resume after the cursor"""
+    keys = [_key_expression(column) for column in columns]
+    if cursor:
+        values = decode_cursor(cursor, [column.type.python_type for column in columns])
+        key = tuple_(*keys)
+        query = query.where(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    return query.order_by(*(key.desc() if descending else key.asc() for key in keys))
+
+
+def next_cursor(rows: Sequence[Any], columns: Sequence, page_size: int) -> Optional[str]:
+    """Build the cursor for the page after rows, or None on the last page"""
+    if len(rows) < page_size:
+        return None
+    last = rows[-1]
+    values = [getattr(last, column.key) for column in columns]
+    return encode_cursor([
+        _null_key(column) if value is None else value
+        for column, value in zip(columns, values)
+    ])
+
+
+async def _ndjson_rows(query: Select, schema: Type[BaseModel]) -> AsyncIterator[bytes]:
+    # The stream owns its session so it outlives the request dependencies;
+    # the identity map holds loaded rows weakly, so each batch can be freed
+    async with AsyncSessionLocal() as session:
+        result = await session.stream_scalars(
+            query.execution_options(yield_per=STREAM_BATCH_SIZE)
+        )
+        async for partition in result.partitions():
+            yield b"".join(
+                schema.model_validate(row).model_dump_json().encode() + b"\n"
+                for row in partition
+            )
+
+
+def stream_ndjson(query: Select, schema: Type[BaseModel]) -> StreamingResponse:
+    """Stream query results as newline-delimited JSON from a server-side cursor"""
+    return StreamingResponse(_ndjson_rows(query, schema), media_type="application/x-ndjson")
@@ -0,0 +1,138 @@
+"""
+Password hashing off the event loop
+
+bcrypt is deliberately slow, around 200 ms per check at cost 12, so
+PasswordHasher runs it on a small dedicated thread pool (bcrypt releases
+the GIL while hashing). At most PASSWORD_HASH_WORKERS hashes run at once.
+Further logins wait in an asyncio queue of at most PASSWORD_HASH_MAX_QUEUE,
+and beyond that they are turned away, so a login storm cannot build an
+unbounded backlog. Queue wait and hash time are recorded for the metrics
+endpoint.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import structlog
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+logger = structlog.get_logger()
+
+
+class HashingQueueFull(Exception):
+    """Raised when too many password checks are already waiting"""
+
+
+class PasswordHasher:
+    """Bounded executor for password hashing with queueing metrics"""
+
+    def __init__(
+        self,
+        context: CryptContext,
+        max_workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_queue: int = settings.PASSWORD_HASH_MAX_QUEUE,
+        window: int = 1000
+    ):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dummy_hash: Optional[str] = None
+        self.running = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._wait_seconds = deque(maxlen=window)
+        self._hash_seconds = deque(maxlen=window)
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def _run(self, function: Callable, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HashingQueueFull()
+
+        queued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        try:
+            started = time.perf_counter()
+            self._wait_seconds.append(started - queued_at)
+            self.running += 1
+            result = await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+            self._hash_seconds.append(time.perf_counter() - started)
+            self.completed += 1
+            return result
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Check password; also returns a new hash when the stored one uses outdated settings"""
+        verified, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash is not None:
+            self.rehashed += 1
+        return verified, new_hash
+
+    async def dummy_verify(self, password: str) -> None:
+        """Spend the time of a real check, so unknown usernames are not revealed by timing"""
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash("dummy-password")
+        await self._run(self.context.verify, password, self._dummy_hash)
+
+    def stats(self) -> Dict:
+        def percentiles(samples) -> Dict[str, float]:
+            if not samples:
+                return {"p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+            values = np.fromiter(samples, dtype=float) * 1000
+            return {
+                "p50_ms": round(float(np.percentile(values, 50)), 2),
+                "p95_ms": round(float(np.percentile(values, 95)), 2),
+                "max_ms": round(float(values.max()), 2),
+            }
+
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "queue_wait": percentiles(self._wait_seconds),
+            "hash_time": percentiles(self._hash_seconds),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
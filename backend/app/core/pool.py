@@ -0,0 +1,121 @@
+"""
+Database connection pooling and pool statistics
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import exc
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool, StaticPool
+
+from app.core.config import settings
+
+
+class PoolStats:
+    """Checkout counters and wait times for a connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_seconds / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+class _WaitTimingMixin:
+    """Measure how long each checkout waits for a pooled connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def recreate(self):
+        # Keep counters across engine.dispose() so metrics stay monotonic
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        return connection
+
+
+class InstrumentedQueuePool(_WaitTimingMixin, QueuePool):
+    """QueuePool that records checkout wait statistics"""
+
+
+class InstrumentedAsyncQueuePool(_WaitTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait statistics"""
+
+
+def worker_pool_size() -> Dict[str, int]:
+    """Split the configured connection budget across uvicorn workers"""
+    workers = max(1, settings.WEB_CONCURRENCY)
+    return {
+        "pool_size": max(1, settings.DATABASE_POOL_SIZE // workers),
+        "max_overflow": max(0, settings.DATABASE_MAX_OVERFLOW // workers),
+    }
+
+
+def get_pool_options(url: URL, is_async: bool = False) -> Dict[str, Any]:
+    """Build create_engine pool arguments for a database URL"""
+
+    # In-memory SQLite only exists on a single connection
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {"poolclass": StaticPool}
+
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        **worker_pool_size(),
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def get_pool_status(engine: Engine) -> Dict[str, Any]:
+    """Get current usage and checkout statistics for an engine's pool"""
+    pool: Pool = engine.pool
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        status.update({
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            # QueuePool counts overflow from -pool_size until the pool is full
+            "overflow": max(0, pool.overflow()),
+            "timeout_seconds": pool.timeout(),
+        })
+    if isinstance(pool, _WaitTimingMixin):
+        status.update(pool.stats.as_dict())
+
+    return status
@@ -0,0 +1,298 @@
+"""
+Per-request SQL profiling with N+1 detection and slow query capture
+
+Engine event listeners add every query to the profile of the request being
+handled, kept in a context variable that ProfilerMiddleware sets, keyed by
+the statement with its literals and bind parameters replaced by "?". When
+the request ends, a statement run QUERY_N_PLUS_ONE_THRESHOLD times or more
+is flagged as an N+1: a query issued per row of an earlier result instead
+of once for all of them.
+
+Queries slower than QUERY_SLOW_MS, inside a request or not, are kept with
+their EXPLAIN plan. The plan is fetched afterwards on a separate
+connection of the same engine, so the slow request does not also wait
+for it.
+
+With DEBUG on, responses carry the request's query count, database time
+and repeated statements in headers. In production the per-route totals,
+N+1 findings and slow queries of each worker are served by the admin
+endpoint /api/v1/metrics/queries.
+"""
+
+import asyncio
+import contextvars
+import re
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Statements that EXPLAIN can describe without running them
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+EXPLAIN_PREFIX = {"postgresql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN "}
+# Plans being fetched at once; further slow queries are kept without one
+MAX_PENDING_EXPLAINS = 4
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PARAMETER = re.compile(r"\$\d+|%\(\w+\)s|(?<!:):\w+\b|\?")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    """The statement with literals, bind parameters and IN lists collapsed"""
+    normalized = _STRING.sub("?", statement)
+    normalized = _PARAMETER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+class RequestProfile:
+    """Queries issued while handling one request"""
+
+    __slots__ = ("queries", "seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        # normalized statement -> [executions, seconds]
+        self.statements: Dict[str, List] = {}
+
+    def record(self, statement: str, seconds: float):
+        self.queries += 1
+        self.seconds += seconds
+        normalized = normalize_statement(statement)
+        totals = self.statements.get(normalized)
+        if totals is None:
+            self.statements[normalized] = [1, seconds]
+        else:
+            totals[0] += 1
+            totals[1] += seconds
+
+    def repeated(self, threshold: int) -> List[Dict[str, Any]]:
+        """Statements run threshold times or more, most frequent first"""
+        return sorted(
+            (
+                {"statement": statement, "executions": count, "total_ms": round(seconds * 1000, 3)}
+                for statement, (count, seconds) in self.statements.items()
+                if count >= threshold
+            ),
+            key=lambda finding: finding["executions"],
+            reverse=True
+        )
+
+
+_current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "query_profile", default=None
+)
+
+
+class QueryProfiler:
+    """Engine listeners, per-route totals and the findings of this worker"""
+
+    def __init__(
+        self,
+        slow_seconds: float = settings.QUERY_SLOW_MS / 1000,
+        n_plus_one_threshold: int = settings.QUERY_N_PLUS_ONE_THRESHOLD,
+        history: int = settings.QUERY_PROFILE_HISTORY
+    ):
+        self.slow_seconds = slow_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.routes: Dict[str, Dict[str, Any]] = {}
+        self.slow_queries: deque = deque(maxlen=history)
+        self.n_plus_one: deque = deque(maxlen=history)
+        self.engines: Dict[str, Any] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending_explains = 0
+
+    def instrument(self, name: str, engine):
+        """Profile the queries of a sync or async engine"""
+        self.engines[name] = engine
+        sync_engine: Engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._profile_started = time.perf_counter()
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - context._profile_started
+            profile = _current_profile.get()
+            if profile is not None:
+                profile.record(statement, elapsed)
+            if elapsed >= self.slow_seconds:
+                self._slow_query(name, statement, None if executemany else parameters, elapsed)
+
+    def start(self, engines: Dict[str, Any]):
+        """Instrument the named engines; plans are fetched on the running loop"""
+        self._loop = asyncio.get_running_loop()
+        for name, engine in engines.items():
+            self.instrument(name, engine)
+
+    def _slow_query(self, engine_name: str, statement: str, parameters, seconds: float):
+        if statement.lstrip()[:7].upper().startswith("EXPLAIN"):
+            return
+        profile = _current_profile.get()
+        entry = {
+            "engine": engine_name,
+            "statement": normalize_statement(statement),
+            "duration_ms": round(seconds * 1000, 3),
+            "in_request": profile is not None,
+            "plan": None,
+            "captured_at": datetime.now()
+        }
+        self.slow_queries.append(entry)
+        logger.warning("Slow query", engine=engine_name, duration_ms=entry["duration_ms"], statement=entry["statement"])
+
+        explainable = statement.lstrip()[:6].upper().startswith(EXPLAINABLE)
+        if explainable and parameters is not None and self._loop is not None and not self._loop.is_closed():
+            # An empty context keeps the EXPLAIN out of the request's profile
+            self._loop.call_soon_threadsafe(
+                self._schedule_explain, entry, engine_name, statement, parameters,
+                context=contextvars.Context()
+            )
+
+    def _schedule_explain(self, entry: Dict, engine_name: str, statement: str, parameters):
+        if self._pending_explains >= MAX_PENDING_EXPLAINS:
+            return
+        self._pending_explains += 1
+        asyncio.ensure_future(self._explain(entry, engine_name, statement, parameters))
+
+    async def _explain(self, entry: Dict, engine_name: str, statement: str, parameters):
+        engine = self.engines[engine_name]
+        try:
+            prefix = EXPLAIN_PREFIX.get(engine.dialect.name, "EXPLAIN ")
+            # Same engine, so the statement's parameter style matches its driver
+            if isinstance(engine, AsyncEngine):
+                async with engine.connect() as connection:
+                    result = await connection.exec_driver_sql(prefix + statement, parameters)
+                    rows = result.fetchall()
+            else:
+                def explain():
+                    with engine.connect() as connection:
+                        return connection.exec_driver_sql(prefix + statement, parameters).fetchall()
+                rows = await asyncio.to_thread(explain)
+            entry["plan"] = [" ".join(str(value) for value in row) for row in rows]
+        except Exception as e:
+            entry["plan_error"] = str(e)
+        finally:
+            self._pending_explains -= 1
+
+    def finish(self, route: str, profile: RequestProfile) -> List[Dict[str, Any]]:
+        """Add a finished request to its route's totals; returns its N+1 findings"""
+        totals = self.routes.get(route)
+        if totals is None:
+            totals = self.routes[route] = {
+                "requests": 0, "queries": 0, "db_seconds": 0.0, "max_queries": 0, "n_plus_one_requests": 0
+            }
+        totals["requests"] += 1
+        totals["queries"] += profile.queries
+        totals["db_seconds"] += profile.seconds
+        totals["max_queries"] = max(totals["max_queries"], profile.queries)
+
+        repeated = profile.repeated(self.n_plus_one_threshold) if profile.queries >= self.n_plus_one_threshold else []
+        if repeated:
+            totals["n_plus_one_requests"] += 1
+            self.n_plus_one.append({
+                "route": route,
+                "queries": profile.queries,
+                "repeated": repeated,
+                "detected_at": datetime.now()
+            })
+        return repeated
+
+    def report(self, limit: int = 50) -> Dict[str, Any]:
+        routes = sorted(self.routes.items(), key=lambda item: item[1]["db_seconds"], reverse=True)
+        return {
+            "slow_query_ms": round(self.slow_seconds * 1000, 3),
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "routes": [
+                {
+                    "route": route,
+                    "requests": totals["requests"],
+                    "avg_queries": round(totals["queries"] / totals["requests"], 2),
+                    "max_queries": totals["max_queries"],
+                    "avg_db_ms": round(totals["db_seconds"] / totals["requests"] * 1000, 3),
+                    "total_db_ms": round(totals["db_seconds"] * 1000, 3),
+                    "n_plus_one_requests": totals["n_plus_one_requests"]
+                }
+                for route, totals in routes[:limit]
+            ],
+            "n_plus_one": list(self.n_plus_one)[-limit:][::-1],
+            "slow_queries": list(self.slow_queries)[-limit:][::-1]
+        }
+
+    def reset(self):
+        self.routes.clear()
+        self.slow_queries.clear()
+        self.n_plus_one.clear()
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling the queries of each HTTP request
+
+    With expose_headers (DEBUG), the response start carries X-DB-Query-Count,
+    X-DB-Time-Ms, X-DB-Repeated-Statements and a Server-Timing entry for
+    the queries issued until then.
+    """
+
+    def __init__(self, app, profiler: Optional[QueryProfiler] = None, expose_headers: bool = settings.DEBUG):
+        self.app = app
+        self.profiler = profiler or query_profiler
+        self.expose_headers = expose_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        send_response = send
+        if self.expose_headers:
+            threshold = self.profiler.n_plus_one_threshold
+
+            async def send_response(message):
+                if message["type"] == "http.response.start":
+                    repeated = sum(1 for count, _ in profile.statements.values() if count >= threshold)
+                    db_ms = f"{profile.seconds * 1000:.3f}"
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-query-count", str(profile.queries).encode()),
+                        (b"x-db-time-ms", db_ms.encode()),
+                        (b"x-db-repeated-statements", str(repeated).encode()),
+                        (b"server-timing", f"db;dur={db_ms}".encode()),
+                    ]
+                await send(message)
+
+        try:
+            await self.app(scope, receive, send_response)
+        finally:
+            _current_profile.reset(token)
+            route = getattr(scope.get("route"), "path", None)
+            if route is not None:
+                repeated = self.profiler.finish(f"{scope['method']} {route}", profile)
+                if repeated:
+                    logger.warning(
+                        "Repeated queries in request",
+                        route=route,
+                        queries=profile.queries,
+                        statement=repeated[0]["statement"],
+                        executions=repeated[0]["executions"]
+                    )
+
+
+query_profiler = QueryProfiler()
@@ -0,0 +1,260 @@
+"""
+Read replicas: health checks, load balancing and request routing
+
+GET requests under DATABASE_REPLICA_ROUTES, the dashboard reads, run their
+SELECTs on one of DATABASE_REPLICA_URLS, picked round-robin among the
+healthy ones. A background task checks every replica each
+DATABASE_REPLICA_CHECK_INTERVAL seconds and takes it out of rotation while
+it is unreachable or replays more than DATABASE_REPLICA_MAX_LAG seconds
+behind the primary; with none healthy, reads stay on the primary.
+
+Everything else uses the primary. A session that writes moves to the
+primary for the rest of its life, so it reads its own writes, and
+use_primary() keeps the sessions opened inside it there. Loaders writing
+outside a request (ERP ingestion and sync) call wait_for_replay() before
+invalidating cached responses, so dashboards recomputed afterwards on a
+replica see the new data.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import structlog
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+# Seconds a health check may take before the replica counts as down
+CHECK_TIMEOUT = 3.0
+# Seconds between polls while waiting for replicas to replay a write
+REPLAY_POLL_INTERVAL = 0.1
+
+# Replay lag in seconds, zero once the replica has applied all it received
+# or when the URL points at a server that is not in recovery
+PG_REPLICA_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+PG_PRIMARY_LSN = text("SELECT pg_current_wal_lsn()::text")
+# NULL on a server that is not in recovery, which has nothing to replay
+PG_REPLAYED = text("SELECT pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)")
+
+# "replica" while handling a read route, "primary" inside use_primary()
+_read_routing: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("read_routing", default=None)
+
+
+def reads_from_replica() -> bool:
+    """Whether sessions opened now may send their reads to a replica"""
+    return _read_routing.get() == "replica"
+
+
+@contextmanager
+def use_primary():
+    """Keep the sessions opened inside on the primary, e.g. to read a write just made"""
+    token = _read_routing.set("primary")
+    try:
+        yield
+    finally:
+        _read_routing.reset(token)
+
+
+class Replica:
+    """A replica's engine and the outcome of its last health check"""
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+        self.lag_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[datetime] = None
+        self.sessions = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_seconds": None if self.lag_seconds is None else round(self.lag_seconds, 3),
+            "error": self.error,
+            "checked_at": self.checked_at,
+            "sessions": self.sessions
+        }
+
+
+class ReplicaSet:
+    """The read replicas of a primary, with their health checks"""
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        engines: Dict[str, AsyncEngine],
+        max_lag: float = settings.DATABASE_REPLICA_MAX_LAG,
+        check_interval: float = settings.DATABASE_REPLICA_CHECK_INTERVAL
+    ):
+        self.primary = primary
+        self.replicas: List[Replica] = [Replica(name, engine) for name, engine in engines.items()]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.primary_fallbacks = 0
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        for replica in self.replicas:
+            self._watch_disconnects(replica)
+
+    def engines(self) -> Dict[str, AsyncEngine]:
+        return {replica.name: replica.engine for replica in self.replicas}
+
+    def choose(self) -> Optional[Replica]:
+        """The next healthy replica, or None when reads must use the primary"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            self.primary_fallbacks += 1
+            return None
+        replica = healthy[next(self._next) % len(healthy)]
+        replica.sessions += 1
+        return replica
+
+    def read_engine(self) -> AsyncEngine:
+        """Engine for Core reads: a healthy replica on read routes, the primary otherwise"""
+        if self.replicas and reads_from_replica():
+            replica = self.choose()
+            if replica is not None:
+                return replica.engine
+        return self.primary
+
+    def _watch_disconnects(self, replica: Replica):
+        # Leave the rotation at the first dropped connection, not the next check
+        @event.listens_for(replica.engine.sync_engine, "handle_error")
+        def handle_error(context):
+            if context.is_disconnect and replica.healthy:
+                replica.healthy = False
+                replica.error = str(context.original_exception)
+                logger.warning("Read replica disconnected", replica=replica.name, error=replica.error)
+
+    async def _lag(self, replica: Replica) -> float:
+        async with replica.engine.connect() as connection:
+            if connection.dialect.name == "postgresql":
+                return float(await connection.scalar(PG_REPLICA_LAG))
+            await connection.execute(text("SELECT 1"))
+            return 0.0
+
+    async def check(self, replica: Replica):
+        """Measure a replica's lag and move it in or out of the rotation"""
+        try:
+            lag = await asyncio.wait_for(self._lag(replica), CHECK_TIMEOUT)
+            error = None if lag <= self.max_lag else f"replay lag of {lag:.1f}s over {self.max_lag:g}s"
+        except Exception as e:
+            lag, error = None, str(e) or type(e).__name__
+
+        healthy = error is None
+        if healthy and not replica.healthy:
+            logger.info("Read replica back in rotation", replica=replica.name, lag_seconds=lag)
+        elif not healthy and replica.healthy:
+            logger.warning("Read replica out of rotation", replica=replica.name, error=error)
+        replica.healthy = healthy
+        replica.lag_seconds = lag
+        replica.error = error
+        replica.checked_at = datetime.now()
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def start(self):
+        """Check every replica now, then every check_interval seconds"""
+        if not self.replicas or self._task is not None:
+            return
+        await self.check_all()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_all()
+
+    async def wait_for_replay(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the healthy replicas have replayed every write committed so far
+
+        Returns False when some were still behind after timeout seconds
+        (max_lag by default) or could not be asked; the health checks take
+        lagging replicas out of rotation. Replicas of other databases than
+        PostgreSQL are not replicated and never wait.
+        """
+        pending = [replica for replica in self.replicas if replica.healthy]
+        if not pending or self.primary.dialect.name != "postgresql":
+            return True
+        deadline = time.monotonic() + (self.max_lag if timeout is None else timeout)
+        try:
+            async with self.primary.connect() as connection:
+                lsn = await connection.scalar(PG_PRIMARY_LSN)
+            while True:
+                behind = []
+                for replica in pending:
+                    async with replica.engine.connect() as connection:
+                        if await connection.scalar(PG_REPLAYED, {"lsn": lsn}) is False:
+                            behind.append(replica)
+                pending = behind
+                if not pending:
+                    return True
+                if time.monotonic() >= deadline:
+                    logger.warning("Read replicas behind the primary", replicas=[r.name for r in pending], lsn=lsn)
+                    return False
+                await asyncio.sleep(REPLAY_POLL_INTERVAL)
+        except Exception as e:
+            logger.warning("Waiting for read replicas failed", error=str(e))
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_lag_seconds": self.max_lag,
+            "check_interval_seconds": self.check_interval,
+            "primary_fallbacks": self.primary_fallbacks,
+            "replicas": [replica.as_dict() for replica in self.replicas]
+        }
+
+    async def close(self):
+        """Stop the health checks and dispose the replica pools"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+def _matches(path: str, prefix: str) -> bool:
+    return path == prefix or path.startswith(prefix + "/")
+
+
+class ReplicaRoutingMiddleware:
+    """ASGI middleware letting GET and HEAD requests to the read routes use a replica"""
+
+    def __init__(self, app, routes: Sequence[str] = settings.DATABASE_REPLICA_ROUTES):
+        self.app = app
+        self.routes = tuple(route.rstrip("/") for route in routes)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not any(_matches(scope["path"], route) for route in self.routes)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        token = _read_routing.set("replica")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _read_routing.reset(token)
@@ -0,0 +1,122 @@
+"""
+Schema version check at startup
+
+Running Base.metadata.create_all on every start costs a catalog query per
+table. Instead the tables are fingerprinted (names, columns, indexes and
+constraints of every registered model and service table) and compared with
+the fingerprint stored in schema_version, a single lookup when nothing
+changed. Only a new fingerprint runs create_all, under an advisory lock so
+workers starting together migrate once.
+
+create_all adds missing tables and indexes only; column changes to
+existing tables still need a migration script. With SCHEMA_AUTO_MIGRATE
+off an outdated schema fails startup, for deployments that migrate in a
+release step.
+
+Usage:
+    cd backend && python -m app.core.schema
+"""
+
+import asyncio
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+import structlog
+from sqlalchemy import Column, DateTime, MetaData, String, Table, delete, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.config import settings
+from app.core.database import Base, async_engine
+
+logger = structlog.get_logger()
+
+# Kept apart from Base.metadata so it is not part of its own fingerprint
+schema_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Serializes migrations of workers starting at once
+SCHEMA_LOCK_KEY = 7_240_003
+
+
+class SchemaOutdated(Exception):
+    """Raised at startup when the schema differs and auto-migration is off"""
+
+
+def schema_fingerprint() -> str:
+    """Hash of every registered table; changes with any model or service table"""
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        digest.update(table.name.encode())
+        for column in table.columns:
+            digest.update(f"{column.name}:{column.type!r}:{column.nullable}:{column.primary_key}".encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ""):
+            digest.update(f"{index.name}:{[column.name for column in index.columns]}".encode())
+        for constraint in sorted(table.constraints, key=lambda constraint: constraint.name or ""):
+            digest.update(f"{type(constraint).__name__}:{constraint.name}".encode())
+    return digest.hexdigest()
+
+
+async def applied_version(connection: AsyncConnection) -> Optional[str]:
+    """The fingerprint the database was last migrated to, if any"""
+    has_table = await connection.run_sync(
+        lambda sync_connection: sync_connection.dialect.has_table(sync_connection, schema_version.name)
+    )
+    if not has_table:
+        return None
+    return await connection.scalar(select(schema_version.c.version))
+
+
+async def migrate(version: str, engine: AsyncEngine = async_engine) -> bool:
+    """Create missing tables and record the version; False if already current"""
+    async with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            await connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        # Another worker may have migrated while this one waited
+        if await applied_version(connection) == version:
+            return False
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(schema_metadata.create_all)
+        await connection.execute(delete(schema_version))
+        await connection.execute(insert(schema_version).values(version=version, applied_at=datetime.utcnow()))
+    return True
+
+
+async def ensure_schema(engine: AsyncEngine = async_engine) -> None:
+    """Migrate if the registered tables changed since the last migration"""
+    version = schema_fingerprint()
+    async with engine.connect() as connection:
+        applied = await applied_version(connection)
+    if applied == version:
+        logger.info("Database schema up to date", version=version[:12])
+        return
+    if not settings.SCHEMA_AUTO_MIGRATE:
+        raise SchemaOutdated(
+            f"Database schema {applied[:12] if applied else 'missing'} differs from {version[:12]}; "
+            "run python -m app.core.schema"
+        )
+    if await migrate(version, engine):
+        logger.info("Database schema migrated", version=version[:12], previous=applied[:12] if applied else None)
+
+
+def main():
+    async def run():
+        # Register every table exactly as the API does
+        import main as application  # noqa: F401
+
+        version = schema_fingerprint()
+        migrated = await migrate(version)
+        await async_engine.dispose()
+        print(f"Schema {version[:12]} {'migrated' if migrated else 'already current'}")
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
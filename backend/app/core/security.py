@@ -8,11 +8,29 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+import structlog
 
+from app.core.auth_cache import UserCache, VerifiedTokenCache
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.replicas import use_primary
+from app.core.password_hashing import PasswordHasher
+from app.models.users import User
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = structlog.get_logger()
+
+# Password hashing; hashes with any other cost factor are flagged for rehashing
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+# Hashing for request handlers, off the event loop
+password_hasher = PasswordHasher(pwd_context)
 
 # JWT token scheme
 security = HTTPBearer()
@@ -45,26 +63,88 @@ def verify_token(token: str) -> Optional[dict]:
     except JWTError:
         return None
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user from JWT token"""
-    token = credentials.credentials
-    payload = verify_token(token)
-    
+async def load_user(username: str) -> Optional[dict]:
+    """Role and active flag of a user, or None when the user is unknown"""
+    # A deactivation must not wait for the replicas to replay it
+    with use_primary():
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(User.role, User.is_active, User.full_name).where(User.username == username)
+            )
+            row = result.first()
+    if row is None:
+        return None
+    return {"role": row.role, "is_active": bool(row.is_active), "full_name": row.full_name}
+
+# Verified tokens and user lookups, shared by every request of this worker
+token_cache = VerifiedTokenCache(verify_token)
+user_cache = UserCache(load_user)
+token_cache.on_revocation(user_cache.invalidate)
+
+# Login of deployments without a users table; its tokens have no user row
+DEMO_USERNAME = "admin"
+DEMO_ROLE = "executive"
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def authenticate(token: str) -> dict:
+    """User of a bearer token, checked against the users table
+
+    Raises 401 for invalid or revoked tokens and for users that are
+    inactive or missing from the database, and 503 when the user cannot
+    be looked up. Only the demo login has no user row; it gets DEMO_ROLE
+    whatever the lookup says, never a role carried by the token.
+    """
+    payload = await token_cache.claims(token)
     if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _credentials_exception()
     
     user_id: str = payload.get("sub")
     if user_id is None:
+        raise _credentials_exception()
+    
+    try:
+        user = await user_cache.get(user_id)
+    except Exception as e:
+        logger.error("User lookup failed", user_id=user_id, error=str(e))
+        if user_id != DEMO_USERNAME:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Could not look up the user, please retry",
+                headers={"Retry-After": "1"},
+            )
+        user = None
+    
+    if user is None:
+        if user_id != DEMO_USERNAME:
+            raise _credentials_exception()
+        role = DEMO_ROLE
+    elif not user["is_active"]:
+        raise _credentials_exception()
+    else:
+        role = user["role"]
+    
+    return {
+        "user_id": user_id,
+        "token_data": payload,
+        "role": role
+    }
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Get current authenticated user from JWT token"""
+    return await authenticate(credentials.credentials)
+
+
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    """Get the current user, who must hold one of settings.ADMIN_ROLES"""
+    if current_user["role"] not in settings.ADMIN_ROLES:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin role required"
         )
-    
-    # Here you would typically fetch the user from database
-    # For now, return the user_id from token
-    return {"user_id": user_id, "token_data": payload} 
\ No newline at end of file
+    return current_user
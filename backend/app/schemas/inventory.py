@@ -43,11 +43,10 @@ class InventoryLevelResponse(BaseModel):
         from_attributes = True
 
 class InventoryLevelList(BaseModel):
-    """Response schema for inventory level list"""
+    """Response schema for a keyset-paginated inventory level list"""
     items: List[InventoryLevelResponse]
-    total_count: int
-    page: int
     page_size: int
+    next_cursor: Optional[str] = None
 
 class InventoryTransactionResponse(BaseModel):
     """Response schema for inventory transactions"""
@@ -102,6 +101,12 @@ class InventoryAlertResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class InventoryAlertList(BaseModel):
+    """Response schema for a keyset-paginated inventory alert list"""
+    items: List[InventoryAlertResponse]
+    page_size: int
+    next_cursor: Optional[str] = None
+
 class InventoryKPIs(BaseModel):
     """Response schema for inventory KPIs"""
     total_materials: int
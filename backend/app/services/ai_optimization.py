@@ -1,108 +1,506 @@
 """
 AI-powered inventory optimization service
+
+run_optimization() computes the reorder policy of every material and plant
+series in one vectorized pass (see batch_optimization) from daily demand
+over OPTIMIZATION_LOOKBACK_DAYS, current stock and the lead times recorded
+in material_lead_times, falling back to OPTIMIZATION_LEAD_TIME_DAYS. Each
+plant's policies are stored as a memory-mapped version under
+settings.AI_MODEL_PATH/optimization, with the plant's summary and
+recommendations in its metadata; the "all" partition holds the summary of
+the whole run. The read methods only open the latest run. Quantities stand
+in for value, as in InventoryAggregationService.
+
+Usage:
+    cd backend && python -m app.services.ai_optimization
 """
 
-from datetime import datetime
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional
 
+import structlog
+from sqlalchemy import Column, Float, String, Table, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, Base, async_engine
+from app.core.lazy_imports import lazy_import
+from app.core.metrics import timed_job
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.services.ai_forecasting import DEMAND_TRANSACTION_TYPES
+from app.services.batch_optimization import (
+    ABC_CLASSES,
+    abc_classes,
+    demand_moments,
+    optimize_reorder_points,
+    stock_position
+)
+from app.services.model_store import GLOBAL_PARTITION, ModelArtifact, ModelStore, partition_name
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = structlog.get_logger()
+
+# Materials listed per plant for reordering and for excess stock
+TOP_MATERIALS = 10
+
+# Recorded replenishment parameters; series without a row use the settings defaults
+material_lead_times = Table(
+    "material_lead_times",
+    Base.metadata,
+    Column("plant_id", String(50), primary_key=True),
+    Column("material_id", String(50), primary_key=True),
+    Column("lead_time_days", Float, nullable=False),
+    Column("lead_time_std_days", Float),
+    Column("service_level", Float),
+)
+
+
+def _rounded(value: float) -> Optional[float]:
+    value = float(value)
+    return round(value, 2) if np.isfinite(value) else None
+
+
+def plant_summary(arrays: Dict[str, np.ndarray]) -> Dict:
+    """Totals of a plant's policies; every count and quantity adds up across plants"""
+    demand = arrays["demand_mean"]
+    stock = arrays["stock"]
+    shortfall = arrays["shortfall"]
+    excess = arrays["excess"]
+    dead = (demand <= 0) & (stock > 0)
+    return {
+        "materials_analyzed": int(demand.size),
+        "healthy_materials": int(((shortfall <= 0) & (excess <= 0)).sum()),
+        "below_reorder_point": int((shortfall > 0).sum()),
+        "shortfall_quantity": float(shortfall.sum()),
+        "stock_outs": int(((demand > 0) & (stock <= 0)).sum()),
+        "excess_materials": int((excess > 0).sum()),
+        "excess_quantity": float(excess.sum()),
+        "dead_stock_materials": int(dead.sum()),
+        "dead_stock_quantity": float(stock[dead].sum()),
+        "safety_stock_quantity": float(arrays["safety_stock"].sum()),
+    }
+
+
+def optimization_score(summary: Dict) -> Optional[float]:
+    """Share of series holding stock between their reorder point and the excess line"""
+    if not summary["materials_analyzed"]:
+        return None
+    return round(summary["healthy_materials"] / summary["materials_analyzed"], 4)
+
+
+def plant_recommendations(summary: Dict) -> List[Dict]:
+    recommendations = []
+    if summary["below_reorder_point"]:
+        recommendations.append({
+            "type": "reorder_point_optimization",
+            "materials_affected": summary["below_reorder_point"],
+            "potential_impact": (
+                f"Reorder {summary['shortfall_quantity']:,.0f} units to reach reorder points; "
+                f"{summary['stock_outs']} materials are out of stock"
+            ),
+            "priority": "high" if summary["stock_outs"] else "medium"
+        })
+    if summary["excess_materials"]:
+        recommendations.append({
+            "type": "safety_stock_reduction",
+            "materials_affected": summary["excess_materials"],
+            "potential_impact": (
+                f"Release {summary['excess_quantity']:,.0f} units held above reorder point plus "
+                f"{settings.OPTIMIZATION_REVIEW_DAYS} days of demand"
+            ),
+            "priority": "medium"
+        })
+    if summary["dead_stock_materials"]:
+        recommendations.append({
+            "type": "dead_stock_review",
+            "materials_affected": summary["dead_stock_materials"],
+            "potential_impact": (
+                f"{summary['dead_stock_quantity']:,.0f} units without demand in "
+                f"{settings.OPTIMIZATION_LOOKBACK_DAYS} days"
+            ),
+            "priority": "low"
+        })
+    return recommendations
+
+
+def global_recommendations(summary: Dict) -> List[Dict]:
+    recommendations = []
+    if summary["below_reorder_point"]:
+        recommendations.append({
+            "category": "stock_out_prevention",
+            "description": f"Reorder {summary['below_reorder_point']} materials below their reorder point",
+            "materials_affected": summary["below_reorder_point"],
+            "potential_savings": 0.0
+        })
+    if summary["excess_materials"]:
+        recommendations.append({
+            "category": "inventory_reduction",
+            "description": f"Reduce stock of {summary['excess_materials']} materials held above their policy",
+            "materials_affected": summary["excess_materials"],
+            "potential_savings": summary["excess_quantity"]
+        })
+    if summary["dead_stock_materials"]:
+        recommendations.append({
+            "category": "dead_stock",
+            "description": f"Review {summary['dead_stock_materials']} materials without recent demand",
+            "materials_affected": summary["dead_stock_materials"],
+            "potential_savings": summary["dead_stock_quantity"]
+        })
+    return recommendations
+
+
+def top_materials(
+    material_ids: np.ndarray,
+    arrays: Dict[str, np.ndarray],
+    by: str,
+    limit: int = TOP_MATERIALS
+) -> List[Dict]:
+    """The series with the largest positive value of arrays[by]"""
+    values = arrays[by]
+    candidates = np.flatnonzero(values > 0)
+    chosen = candidates[np.argsort(-values[candidates], kind="stable")[:limit]]
+    return [
+        {
+            "material_id": str(material_ids[row]),
+            "stock": _rounded(arrays["stock"][row]),
+            "reorder_point": _rounded(arrays["reorder_point"][row]),
+            "safety_stock": _rounded(arrays["safety_stock"][row]),
+            by: _rounded(values[row]),
+            "days_of_cover": _rounded(arrays["days_of_cover"][row]),
+        }
+        for row in chosen.tolist()
+    ]
+
+
 class OptimizationService:
     """Service for AI-powered inventory optimization"""
-    
-    def __init__(self):
-        pass
-    
+
+    def __init__(self, store: Optional[ModelStore] = None):
+        self.store = store or get_optimization_store()
+
+    async def load_inputs(
+        self,
+        db: AsyncSession,
+        lookback_days: Optional[int] = None,
+        end_date: Optional[date] = None
+    ) -> pd.DataFrame:
+        """Demand sums, stock and lead times of every material/plant series
+
+        Daily demand is summed in the database, so one row per series is
+        read however long the lookback.
+        """
+
+        lookback_days = lookback_days or settings.OPTIMIZATION_LOOKBACK_DAYS
+        end_date = end_date or date.today()
+        start_date = end_date - timedelta(days=lookback_days)
+
+        day = func.date(InventoryTransaction.transaction_date)
+        daily = (
+            select(
+                InventoryTransaction.plant_id,
+                InventoryTransaction.material_id,
+                func.sum(func.abs(InventoryTransaction.quantity)).label("demand")
+            )
+            .where(
+                InventoryTransaction.transaction_type.in_(DEMAND_TRANSACTION_TYPES),
+                InventoryTransaction.transaction_date >= start_date,
+                InventoryTransaction.transaction_date < end_date,
+                InventoryTransaction.plant_id.is_not(None),
+                InventoryTransaction.material_id.is_not(None)
+            )
+            .group_by(InventoryTransaction.plant_id, InventoryTransaction.material_id, day)
+            .subquery()
+        )
+        demand = await db.execute(
+            select(
+                daily.c.plant_id,
+                daily.c.material_id,
+                func.sum(daily.c.demand),
+                func.sum(daily.c.demand * daily.c.demand)
+            ).group_by(daily.c.plant_id, daily.c.material_id)
+        )
+        stock = await db.execute(
+            select(
+                InventoryLevel.plant_id,
+                InventoryLevel.material_id,
+                func.coalesce(func.sum(InventoryLevel.total_quantity), 0.0)
+            )
+            .where(InventoryLevel.plant_id.is_not(None), InventoryLevel.material_id.is_not(None))
+            .group_by(InventoryLevel.plant_id, InventoryLevel.material_id)
+        )
+        lead_times = await db.execute(select(material_lead_times))
+
+        keys = ["plant_id", "material_id"]
+        frame = pd.DataFrame(demand.all(), columns=keys + ["demand_total", "demand_squares"]).merge(
+            pd.DataFrame(stock.all(), columns=keys + ["stock"]), how="outer", on=keys
+        ).merge(
+            pd.DataFrame(
+                lead_times.all(), columns=keys + ["lead_time_days", "lead_time_std_days", "service_level"]
+            ),
+            how="left",
+            on=keys
+        )
+        frame = frame.astype({
+            "demand_total": float, "demand_squares": float, "stock": float,
+            "lead_time_days": float, "lead_time_std_days": float, "service_level": float
+        })
+        sums = ["demand_total", "demand_squares", "stock"]
+        frame[sums] = frame[sums].fillna(0.0)
+        return frame
+
+    def optimize(self, frame: pd.DataFrame, lookback_days: int) -> Dict[str, np.ndarray]:
+        """Policy arrays of every series in a load_inputs frame"""
+
+        demand_mean, demand_std = demand_moments(frame["demand_total"], frame["demand_squares"], lookback_days)
+        plant_codes, _ = pd.factorize(frame["plant_id"])
+        abc = abc_classes(plant_codes, demand_mean)
+        class_levels = np.array([
+            settings.OPTIMIZATION_SERVICE_LEVEL_A,
+            settings.OPTIMIZATION_SERVICE_LEVEL_B,
+            settings.OPTIMIZATION_SERVICE_LEVEL_C
+        ])
+
+        def recorded(column: str, default) -> np.ndarray:
+            values = frame[column].to_numpy(dtype=np.float64)
+            return np.where(np.isnan(values), default, values)
+
+        lead_time = recorded("lead_time_days", settings.OPTIMIZATION_LEAD_TIME_DAYS)
+        lead_time_std = recorded("lead_time_std_days", settings.OPTIMIZATION_LEAD_TIME_STD_DAYS)
+        service_level = recorded("service_level", class_levels[abc])
+        stock = frame["stock"].to_numpy(dtype=np.float64)
+
+        policy = optimize_reorder_points(demand_mean, demand_std, lead_time, lead_time_std, service_level)
+        position = stock_position(stock, demand_mean, policy["reorder_point"], settings.OPTIMIZATION_REVIEW_DAYS)
+        return {
+            "demand_mean": demand_mean,
+            "demand_std": demand_std,
+            "lead_time_days": lead_time,
+            "lead_time_std_days": lead_time_std,
+            "service_level": service_level,
+            "abc_class": abc.astype(np.float64),
+            "safety_stock": policy["safety_stock"],
+            "reorder_point": policy["reorder_point"],
+            "stock": stock,
+            **position
+        }
+
+    def save_run(self, frame: pd.DataFrame, arrays: Dict[str, np.ndarray], run: Dict) -> Dict:
+        """Write one version per plant, then the run summary to the global partition"""
+
+        plant_codes, plant_ids = pd.factorize(frame["plant_id"], sort=True)
+        material_ids = frame["material_id"].to_numpy()
+        order = np.argsort(plant_codes, kind="stable")
+        bounds = np.searchsorted(plant_codes[order], np.arange(len(plant_ids) + 1))
+
+        plants: Dict[str, Dict] = {}
+        for code, plant_id in enumerate(plant_ids):
+            rows = order[bounds[code]:bounds[code + 1]]
+            plant_id = str(plant_id)
+            plant_arrays = {name: values[rows] for name, values in arrays.items()}
+            summary = plant_summary(plant_arrays)
+            self.store.save_version(
+                partition_name(plant_id),
+                list(zip(material_ids[rows].tolist(), [plant_id] * len(rows))),
+                plant_arrays,
+                {
+                    **run,
+                    "plant_id": plant_id,
+                    "summary": summary,
+                    "recommendations": plant_recommendations(summary),
+                    "reorder_now": top_materials(material_ids[rows], plant_arrays, "shortfall"),
+                    "excess_stock": top_materials(material_ids[rows], plant_arrays, "excess"),
+                }
+            )
+            plants[plant_id] = summary
+
+        totals = plant_summary({name: values[:0] for name, values in arrays.items()})
+        for summary in plants.values():
+            for name in totals:
+                totals[name] += summary[name]
+        self.store.save_version(GLOBAL_PARTITION, [], {}, {
+            **run,
+            "summary": totals,
+            "recommendations": global_recommendations(totals),
+            "plants": plants
+        })
+        return totals
+
+    @timed_job("optimization")
+    async def run_optimization(self, db: AsyncSession, lookback_days: Optional[int] = None) -> Dict:
+        """Recompute and store the reorder policy of every material/plant series"""
+
+        started = time.perf_counter()
+        lookback_days = lookback_days or settings.OPTIMIZATION_LOOKBACK_DAYS
+        end_date = date.today()
+        connection = await db.connection()
+        await connection.run_sync(material_lead_times.create, checkfirst=True)
+        await db.commit()
+        frame = await self.load_inputs(db, lookback_days, end_date)
+        loaded = time.perf_counter()
+
+        run = {
+            "run_id": datetime.utcnow().strftime("%Y%m%dT%H%M%S%f"),
+            "computed_at": datetime.now(),
+            "history_end_date": end_date,
+            "lookback_days": lookback_days
+        }
+
+        def compute_and_save():
+            arrays = self.optimize(frame, lookback_days)
+            computed = time.perf_counter()
+            return self.save_run(frame, arrays, run), computed
+
+        totals, computed = await asyncio.to_thread(compute_and_save)
+        result = {
+            "run_id": run["run_id"],
+            "series": int(len(frame)),
+            "plants": int(frame["plant_id"].nunique()),
+            "optimization_score": optimization_score(totals),
+            "load_seconds": round(loaded - started, 3),
+            "compute_seconds": round(computed - loaded, 3),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info("Inventory optimization completed", **result)
+        return result
+
+    def _latest_run(self) -> Optional[ModelArtifact]:
+        return self.store.artifact(GLOBAL_PARTITION)
+
+    def _plant_artifact(self, plant_id: str) -> Optional[ModelArtifact]:
+        """A plant's latest version, if the plant was part of the latest run"""
+        run = self._latest_run()
+        if run is None or plant_id not in run.metadata["plants"]:
+            return None
+        return self.store.artifact(partition_name(plant_id))
+
     async def get_plant_optimization(self, plant_id: str) -> Dict:
         """Get optimization recommendations for a specific plant"""
-        
-        try:
-            # Mock optimization recommendations
-            recommendations = {
+
+        artifact = self._plant_artifact(plant_id)
+        if artifact is None:
+            return {
                 "plant_id": plant_id,
-                "optimization_score": 0.78,
-                "potential_savings": 125000,
-                "recommendations": [
-                    {
-                        "type": "reorder_point_optimization",
-                        "materials_affected": 23,
-                        "potential_impact": "Reduce stock-outs by 15%",
-                        "priority": "high"
-                    },
-                    {
-                        "type": "safety_stock_reduction",
-                        "materials_affected": 45,
-                        "potential_impact": "Reduce inventory costs by 8%",
-                        "priority": "medium"
-                    },
-                    {
-                        "type": "supplier_consolidation",
-                        "materials_affected": 12,
-                        "potential_impact": "Reduce lead times by 20%",
-                        "priority": "low"
-                    }
-                ],
-                "last_updated": datetime.now()
+                "optimization_score": None,
+                "potential_savings": 0.0,
+                "materials_analyzed": 0,
+                "recommendations": [],
+                "reorder_now": [],
+                "excess_stock": [],
+                "run_id": None,
+                "last_updated": None
             }
-            
-            return recommendations
-            
-        except Exception as e:
-            raise
-    
+
+        metadata = artifact.metadata
+        summary = metadata["summary"]
+        return {
+            "plant_id": plant_id,
+            "optimization_score": optimization_score(summary),
+            "potential_savings": summary["excess_quantity"],
+            "materials_analyzed": summary["materials_analyzed"],
+            "recommendations": metadata["recommendations"],
+            "reorder_now": metadata["reorder_now"],
+            "excess_stock": metadata["excess_stock"],
+            "run_id": metadata["run_id"],
+            "last_updated": metadata["computed_at"]
+        }
+
     async def get_global_optimization(self) -> Dict:
         """Get global optimization recommendations across all plants"""
-        
-        try:
-            global_recommendations = {
-                "total_optimization_score": 0.82,
-                "total_potential_savings": 450000,
-                "plants_analyzed": 5,
-                "materials_analyzed": 1250,
-                "key_recommendations": [
-                    {
-                        "category": "inventory_reduction",
-                        "description": "Reduce safety stock levels for 67 materials",
-                        "potential_savings": 180000,
-                        "implementation_time": "3 months"
-                    },
-                    {
-                        "category": "demand_forecasting",
-                        "description": "Implement ML-based demand forecasting",
-                        "potential_savings": 120000,
-                        "implementation_time": "6 months"
-                    },
-                    {
-                        "category": "supplier_management",
-                        "description": "Optimize supplier lead times and costs",
-                        "potential_savings": 150000,
-                        "implementation_time": "4 months"
-                    }
-                ],
-                "last_updated": datetime.now()
+
+        run = self._latest_run()
+        if run is None:
+            return {
+                "total_optimization_score": None,
+                "total_potential_savings": 0.0,
+                "plants_analyzed": 0,
+                "materials_analyzed": 0,
+                "key_recommendations": [],
+                "plants": [],
+                "run_id": None,
+                "last_updated": None
             }
-            
-            return global_recommendations
-            
-        except Exception as e:
-            raise
-    
-    async def calculate_optimal_reorder_points(self, material_id: str, plant_id: str) -> Dict:
-        """Calculate optimal reorder points for a specific material"""
-        
+
+        metadata = run.metadata
+        summary = metadata["summary"]
+        return {
+            "total_optimization_score": optimization_score(summary),
+            "total_potential_savings": summary["excess_quantity"],
+            "plants_analyzed": len(metadata["plants"]),
+            "materials_analyzed": summary["materials_analyzed"],
+            "key_recommendations": metadata["recommendations"],
+            "plants": [
+                {
+                    "plant_id": plant_id,
+                    "optimization_score": optimization_score(plant),
+                    "below_reorder_point": plant["below_reorder_point"],
+                    "excess_quantity": plant["excess_quantity"]
+                }
+                for plant_id, plant in metadata["plants"].items()
+            ],
+            "run_id": metadata["run_id"],
+            "last_updated": metadata["computed_at"]
+        }
+
+    async def calculate_optimal_reorder_points(self, material_id: str, plant_id: str) -> Optional[Dict]:
+        """Reorder point and safety stock of a material from the latest run"""
+
+        artifact = self._plant_artifact(plant_id)
+        row = artifact.row(material_id, plant_id) if artifact is not None else None
+        if row is None:
+            return None
+
+        parameters = artifact.parameters(row)
+        demand_mean = float(parameters["demand_mean"])
+        return {
+            "material_id": material_id,
+            "plant_id": plant_id,
+            "current_stock": _rounded(parameters["stock"]),
+            "optimal_reorder_point": _rounded(parameters["reorder_point"]),
+            "safety_stock": _rounded(parameters["safety_stock"]),
+            "lead_time_days": _rounded(parameters["lead_time_days"]),
+            "lead_time_std_days": _rounded(parameters["lead_time_std_days"]),
+            "daily_demand_mean": _rounded(parameters["demand_mean"]),
+            "daily_demand_std": _rounded(parameters["demand_std"]),
+            "demand_variability": (
+                round(float(parameters["demand_std"]) / demand_mean, 4) if demand_mean > 0 else None
+            ),
+            "confidence_level": float(parameters["service_level"]),
+            "abc_class": ABC_CLASSES[int(parameters["abc_class"])],
+            "shortfall": _rounded(parameters["shortfall"]),
+            "excess": _rounded(parameters["excess"]),
+            "days_of_cover": _rounded(parameters["days_of_cover"]),
+            "run_id": artifact.metadata["run_id"],
+            "last_updated": artifact.metadata["computed_at"]
+        }
+
+
+_optimization_store: Optional[ModelStore] = None
+
+
+def get_optimization_store() -> ModelStore:
+    """Process-wide store of optimizer runs; versions are mapped lazily"""
+    global _optimization_store
+    if _optimization_store is None:
+        _optimization_store = ModelStore(kind="optimization")
+    return _optimization_store
+
+
+def main():
+    async def run():
         try:
-            # Mock reorder point calculation
-            reorder_point_data = {
-                "material_id": material_id,
-                "plant_id": plant_id,
-                "current_reorder_point": 100,
-                "optimal_reorder_point": 85,
-                "safety_stock": 25,
-                "lead_time_days": 7,
-                "demand_variability": 0.15,
-                "confidence_level": 0.95,
-                "last_updated": datetime.now()
-            }
-            
-            return reorder_point_data
-            
-        except Exception as e:
-            raise 
\ No newline at end of file
+            async with AsyncSessionLocal() as db:
+                return await OptimizationService().run_optimization(db)
+        finally:
+            await async_engine.dispose()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,639 @@
+"""
+Streaming anomaly detection over inventory transactions
+
+Every plant and material series keeps rolling statistics in one column of
+a NumPy array (SeriesStats): the event count, an exponentially weighted
+mean and variance of movement size and of the log time between movements,
+and the projected stock. A transaction is scored against its series'
+statistics before they are updated, in constant time:
+
+- quantity_spike: the movement is more than ANOMALY_Z_THRESHOLD standard
+  deviations larger than the series' usual movement
+- unusual_movement: the time since the previous movement is that far from
+  the series' usual rhythm, either a burst or a dormant series waking up
+- negative_stock_drift: the movements take the projected stock below zero
+
+Batches of events are applied one rank at a time across all series, so
+the i-th event of every series in the batch is scored in one vectorized
+step. refresh() scores the transactions created since the last watermark
+and stores the flagged ones in inventory_anomalies, which the API reads.
+Once ANOMALY_RESCORE_INTERVAL seconds have passed, it runs rescore()
+instead: the statistics and the anomalies are rebuilt from the last
+ANOMALY_WINDOW_DAYS of transactions, with the projected stock anchored on
+inventory_levels and walked back through the window's movements.
+
+Usage:
+    cd backend && python -m app.services.anomaly_detection [--rescore]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import (
+    Column, DateTime, Float, Integer, String, Table, delete, func, insert, select, text, tuple_
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.core.database import Base, async_engine
+from app.core.lazy_imports import lazy_import
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.services.kpi_rollup import ISSUE_TYPE, RECEIPT_TYPE
+
+np = lazy_import("numpy")
+
+logger = structlog.get_logger()
+
+# Serializes refreshes across processes on PostgreSQL
+ANOMALY_LOCK_KEY = 7_240_002
+SOURCE = "inventory_transactions"
+SERIES_BATCH = 1000
+INSERT_BATCH = 10_000
+STREAM_BATCH = 50_000
+EPOCH = datetime(1970, 1, 1)
+
+# Rows of the SeriesStats array
+COUNT, GAPS, SIZE_MEAN, SIZE_VAR, GAP_MEAN, GAP_VAR, LAST_AT, BALANCE = range(8)
+STAT_COLUMNS = ("count", "gaps", "size_mean", "size_var", "gap_mean", "gap_var", "last_at", "balance")
+
+# Floors of the standard deviations: a share of the mean movement size,
+# and a spread of the log time between movements
+SIZE_STD_FLOOR = 0.05
+GAP_STD_FLOOR = 0.5
+
+inventory_anomalies = Table(
+    "inventory_anomalies",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("plant_id", String(50), index=True),
+    Column("material_id", String(50)),
+    Column("transaction_id", Integer),
+    Column("anomaly_type", String(50)),
+    Column("severity", String(20)),
+    Column("score", Float),
+    Column("transaction_type", String(20)),
+    Column("quantity", Float),
+    Column("transaction_date", DateTime, index=True),
+    Column("detected_at", DateTime),
+)
+
+anomaly_series_state = Table(
+    "anomaly_series_state",
+    Base.metadata,
+    Column("plant_id", String(50), primary_key=True),
+    Column("material_id", String(50), primary_key=True),
+    *(Column(name, Float) for name in STAT_COLUMNS),
+)
+
+anomaly_detection_state = Table(
+    "anomaly_detection_state",
+    Base.metadata,
+    Column("source", String(50), primary_key=True),
+    Column("watermark", DateTime),
+    Column("rescored_at", DateTime),
+    Column("refreshed_at", DateTime),
+)
+
+# Transactions scored inside the overlap window, so re-reading it never scores one twice
+anomaly_recent_transactions = Table(
+    "anomaly_recent_transactions",
+    Base.metadata,
+    Column("transaction_id", Integer, primary_key=True),
+    Column("created_at", DateTime, index=True),
+)
+
+ANOMALY_TABLES = (inventory_anomalies, anomaly_series_state, anomaly_detection_state, anomaly_recent_transactions)
+
+
+def _batches(values: list, size: int) -> Iterable[list]:
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+def _seconds(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+@dataclass
+class Scores:
+    """Per-event scores, in the order the events were observed"""
+    size_z: np.ndarray
+    gap_z: np.ndarray
+    balance_before: np.ndarray
+    balance_after: np.ndarray
+
+
+class SeriesStats:
+    """Rolling statistics of every series, one array column per series"""
+
+    def __init__(
+        self,
+        span: int = settings.ANOMALY_SPAN,
+        min_events: int = settings.ANOMALY_MIN_EVENTS,
+        capacity: int = 1024
+    ):
+        self.alpha = 2.0 / (span + 1)
+        self.min_events = min_events
+        self.index: Dict[Tuple[str, str], int] = {}
+        self.keys: List[Tuple[str, str]] = []
+        self.values = self._empty(capacity)
+
+    @staticmethod
+    def _empty(capacity: int) -> np.ndarray:
+        values = np.zeros((len(STAT_COLUMNS), capacity))
+        values[LAST_AT] = np.nan
+        return values
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def code(self, key: Tuple[str, str]) -> int:
+        """Column of a series, adding it with empty statistics when new"""
+        code = self.index.get(key)
+        if code is None:
+            code = self.index[key] = len(self.keys)
+            self.keys.append(key)
+            if code >= self.values.shape[1]:
+                grown = self._empty(2 * self.values.shape[1])
+                grown[:, :code] = self.values[:, :code]
+                self.values = grown
+        return code
+
+    def observe(self, codes: np.ndarray, signed: np.ndarray, at: np.ndarray) -> Scores:
+        """Score and apply events; each series sees its events in the given order"""
+        codes = np.asarray(codes, dtype=np.int64)
+        n = codes.size
+        scores = Scores(np.zeros(n), np.zeros(n), np.zeros(n), np.zeros(n))
+        if n == 0:
+            return scores
+
+        # Rank of each event within its series, then all events of a rank at once
+        order = np.argsort(codes, kind="stable")
+        sorted_codes = codes[order]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n) - np.repeat(starts, np.diff(np.r_[starts, n]))
+        by_rank = np.argsort(rank, kind="stable")
+        bounds = np.searchsorted(rank[by_rank], np.arange(rank.max() + 2))
+
+        for step in range(len(bounds) - 1):
+            events = by_rank[bounds[step]:bounds[step + 1]]
+            (
+                scores.size_z[events], scores.gap_z[events],
+                scores.balance_before[events], scores.balance_after[events]
+            ) = self._step(codes[events], signed[events], at[events])
+        return scores
+
+    def _step(self, rows: np.ndarray, signed: np.ndarray, at: np.ndarray):
+        """Score one event of each series in rows, then fold it into the statistics"""
+        values = self.values
+        alpha = self.alpha
+        size = np.abs(signed)
+
+        count = values[COUNT, rows]
+        mean = values[SIZE_MEAN, rows]
+        var = values[SIZE_VAR, rows]
+        std = np.maximum(np.sqrt(var), SIZE_STD_FLOOR * mean)
+        scored = (count >= self.min_events) & (std > 0)
+        size_z = np.where(scored, (size - mean) / np.where(scored, std, 1.0), 0.0)
+
+        last_at = values[LAST_AT, rows]
+        has_gap = ~np.isnan(last_at) & (at >= np.nan_to_num(last_at, nan=np.inf))
+        log_gap = np.log1p(np.where(has_gap, at - np.nan_to_num(last_at), 0.0))
+        gaps = values[GAPS, rows]
+        gap_mean = values[GAP_MEAN, rows]
+        gap_var = values[GAP_VAR, rows]
+        gap_scored = has_gap & (gaps >= self.min_events)
+        gap_z = np.where(gap_scored, (log_gap - gap_mean) / np.maximum(np.sqrt(gap_var), GAP_STD_FLOOR), 0.0)
+
+        before = values[BALANCE, rows]
+        after = before + signed
+
+        # Statistics move after scoring, so an event is judged against its series' past
+        first = count == 0
+        delta = size - mean
+        values[SIZE_MEAN, rows] = np.where(first, size, mean + alpha * delta)
+        values[SIZE_VAR, rows] = np.where(first, 0.0, (1 - alpha) * (var + alpha * delta * delta))
+        first_gap = gaps == 0
+        gap_delta = log_gap - gap_mean
+        values[GAP_MEAN, rows] = np.where(
+            has_gap, np.where(first_gap, log_gap, gap_mean + alpha * gap_delta), gap_mean
+        )
+        values[GAP_VAR, rows] = np.where(
+            has_gap, np.where(first_gap, 0.0, (1 - alpha) * (gap_var + alpha * gap_delta * gap_delta)), gap_var
+        )
+        values[GAPS, rows] = gaps + has_gap
+        values[COUNT, rows] = count + 1
+        values[LAST_AT, rows] = np.fmax(last_at, at)
+        values[BALANCE, rows] = after
+        return size_z, gap_z, before, after
+
+
+@dataclass
+class TransactionEvents:
+    """Transactions as arrays, with the series column of each"""
+    ids: List[int] = field(default_factory=list)
+    codes: List[int] = field(default_factory=list)
+    signed: List[float] = field(default_factory=list)
+    at: List[float] = field(default_factory=list)
+    types: List[Optional[str]] = field(default_factory=list)
+    created_at: List[Optional[datetime]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def signed_quantity(transaction_type: Optional[str], quantity: float) -> float:
+    """Receipts add to stock, issues take from it, adjustments carry their sign"""
+    if transaction_type == RECEIPT_TYPE:
+        return abs(quantity)
+    if transaction_type == ISSUE_TYPE:
+        return -abs(quantity)
+    return quantity
+
+
+def flag_anomalies(
+    events: TransactionEvents,
+    scores: Scores,
+    stats: SeriesStats,
+    threshold: float = settings.ANOMALY_Z_THRESHOLD
+) -> List[Dict]:
+    """Rows for inventory_anomalies from the scored events"""
+    spikes = scores.size_z > threshold
+    unusual = np.abs(scores.gap_z) > threshold
+    drift = (scores.balance_after < 0) & (scores.balance_before >= 0)
+    flagged = [
+        ("quantity_spike", spikes, scores.size_z),
+        ("unusual_movement", unusual, scores.gap_z),
+        ("negative_stock_drift", drift, -scores.balance_after),
+    ]
+
+    detected_at = datetime.utcnow()
+    rows = []
+    for anomaly_type, mask, values in flagged:
+        for position in np.flatnonzero(mask).tolist():
+            score = float(values[position])
+            plant_id, material_id = stats.keys[events.codes[position]]
+            if anomaly_type == "negative_stock_drift":
+                severity = "high"
+            else:
+                severity = "high" if abs(score) >= 2 * threshold else "medium"
+            rows.append({
+                "plant_id": plant_id,
+                "material_id": material_id,
+                "transaction_id": events.ids[position],
+                "anomaly_type": anomaly_type,
+                "severity": severity,
+                "score": round(score, 4),
+                "transaction_type": events.types[position],
+                "quantity": events.signed[position],
+                "transaction_date": EPOCH + timedelta(seconds=events.at[position]),
+                "detected_at": detected_at,
+            })
+    return rows
+
+
+class AnomalyDetector:
+    """Keep inventory_anomalies current as transactions arrive"""
+
+    def __init__(
+        self,
+        engine: AsyncEngine = async_engine,
+        window_days: int = settings.ANOMALY_WINDOW_DAYS,
+        rescore_interval: int = settings.ANOMALY_RESCORE_INTERVAL,
+        overlap_seconds: int = settings.ERP_SYNC_OVERLAP,
+        threshold: float = settings.ANOMALY_Z_THRESHOLD
+    ):
+        self.engine = engine
+        self.window_days = window_days
+        self.rescore_interval = timedelta(seconds=rescore_interval)
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.threshold = threshold
+        # Statistics kept between refreshes, valid while the stored state is at _version
+        self.stats: Optional[SeriesStats] = None
+        self._version: Optional[datetime] = None
+        self._prepared = False
+
+    async def prepare(self) -> None:
+        if self._prepared:
+            return
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all, tables=list(ANOMALY_TABLES))
+        self._prepared = True
+
+    async def _lock(self, connection: AsyncConnection) -> None:
+        if connection.dialect.name == "postgresql":
+            await connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ANOMALY_LOCK_KEY})
+
+    async def _state(self, connection: AsyncConnection):
+        result = await connection.execute(
+            select(anomaly_detection_state).where(anomaly_detection_state.c.source == SOURCE)
+        )
+        return result.first()
+
+    async def _save_state(
+        self,
+        connection: AsyncConnection,
+        watermark: Optional[datetime],
+        rescored_at: Optional[datetime]
+    ) -> datetime:
+        await connection.execute(delete(anomaly_detection_state))
+        refreshed_at = datetime.utcnow()
+        await connection.execute(insert(anomaly_detection_state), [{
+            "source": SOURCE, "watermark": watermark, "rescored_at": rescored_at, "refreshed_at": refreshed_at
+        }])
+        return refreshed_at
+
+    def _transactions(self):
+        return select(
+            InventoryTransaction.id,
+            InventoryTransaction.plant_id,
+            InventoryTransaction.material_id,
+            InventoryTransaction.transaction_type,
+            InventoryTransaction.quantity,
+            InventoryTransaction.transaction_date,
+            InventoryTransaction.created_at,
+        ).where(
+            InventoryTransaction.plant_id.is_not(None),
+            InventoryTransaction.material_id.is_not(None),
+            InventoryTransaction.quantity.is_not(None),
+        )
+
+    async def _read_events(
+        self,
+        connection: AsyncConnection,
+        query,
+        stats: SeriesStats,
+        skip: Set[int] = frozenset()
+    ) -> TransactionEvents:
+        events = TransactionEvents()
+        result = await connection.stream(query.execution_options(yield_per=STREAM_BATCH))
+        async for partition in result.partitions():
+            for row_id, plant_id, material_id, transaction_type, quantity, transaction_date, created_at in partition:
+                if row_id in skip:
+                    continue
+                moved_at = transaction_date or created_at
+                if moved_at is None:
+                    continue
+                events.ids.append(row_id)
+                events.codes.append(stats.code((plant_id, material_id)))
+                events.signed.append(signed_quantity(transaction_type, float(quantity)))
+                events.at.append(_seconds(moved_at))
+                events.types.append(transaction_type)
+                events.created_at.append(created_at)
+        return events
+
+    def _score(self, events: TransactionEvents, stats: SeriesStats) -> List[Dict]:
+        scores = stats.observe(
+            np.asarray(events.codes, dtype=np.int64),
+            np.asarray(events.signed, dtype=np.float64),
+            np.asarray(events.at, dtype=np.float64)
+        )
+        return flag_anomalies(events, scores, stats, self.threshold)
+
+    async def _load_stats(self, connection: AsyncConnection) -> SeriesStats:
+        stats = SeriesStats()
+        result = await connection.execute(select(anomaly_series_state))
+        rows = result.all()
+        for row in rows:
+            stats.code((row.plant_id, row.material_id))
+        if rows:
+            values = np.array([[getattr(row, name) for name in STAT_COLUMNS] for row in rows], dtype=np.float64)
+            stats.values[:, :len(rows)] = values.T
+        return stats
+
+    def _series_rows(self, stats: SeriesStats, codes: Iterable[int]) -> List[Dict]:
+        values = stats.values
+        rows = []
+        for code in codes:
+            plant_id, material_id = stats.keys[code]
+            row = {"plant_id": plant_id, "material_id": material_id}
+            for position, name in enumerate(STAT_COLUMNS):
+                value = float(values[position, code])
+                row[name] = None if np.isnan(value) else value
+            rows.append(row)
+        return rows
+
+    async def _insert(self, connection: AsyncConnection, table: Table, rows: List[Dict]) -> None:
+        for batch in _batches(rows, INSERT_BATCH):
+            await connection.execute(insert(table), batch)
+
+    async def _remember(self, connection: AsyncConnection, events: TransactionEvents, since: datetime) -> None:
+        """Record the scored transactions inside the overlap window and forget older ones"""
+        await connection.execute(
+            delete(anomaly_recent_transactions).where(anomaly_recent_transactions.c.created_at < since)
+        )
+        await self._insert(connection, anomaly_recent_transactions, [
+            {"transaction_id": row_id, "created_at": created_at}
+            for row_id, created_at in zip(events.ids, events.created_at)
+            if created_at is not None and created_at >= since
+        ])
+
+    async def rescore(self) -> Dict:
+        """Rebuild the statistics and anomalies over the window in vectorized batches"""
+        await self.prepare()
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        self.stats = None
+
+        async with self.engine.begin() as connection:
+            await self._lock(connection)
+            # Taken first so transactions created during the rescore are picked up next time
+            watermark = (await connection.execute(select(func.max(InventoryTransaction.created_at)))).scalar()
+
+            stats = SeriesStats()
+            events = await self._read_events(
+                connection,
+                self._transactions().where(
+                    InventoryTransaction.transaction_date >= now - timedelta(days=self.window_days)
+                ).order_by(InventoryTransaction.transaction_date, InventoryTransaction.id),
+                stats
+            )
+
+            # Projected stock before the window: current stock less the window's movements
+            levels = await connection.execute(
+                select(
+                    InventoryLevel.plant_id,
+                    InventoryLevel.material_id,
+                    func.coalesce(func.sum(InventoryLevel.total_quantity), 0.0)
+                ).where(
+                    InventoryLevel.plant_id.is_not(None), InventoryLevel.material_id.is_not(None)
+                ).group_by(InventoryLevel.plant_id, InventoryLevel.material_id)
+            )
+            for plant_id, material_id, quantity in levels:
+                stats.values[BALANCE, stats.code((plant_id, material_id))] = float(quantity)
+            codes = np.asarray(events.codes, dtype=np.int64)
+            net = np.bincount(codes, weights=np.asarray(events.signed, dtype=np.float64), minlength=len(stats))
+            stats.values[BALANCE, :len(stats)] -= net
+
+            anomalies = self._score(events, stats)
+
+            await connection.execute(delete(inventory_anomalies))
+            await self._insert(connection, inventory_anomalies, anomalies)
+            await connection.execute(delete(anomaly_series_state))
+            await self._insert(connection, anomaly_series_state, self._series_rows(stats, range(len(stats))))
+            await connection.execute(delete(anomaly_recent_transactions))
+            if watermark is not None:
+                await self._remember(connection, events, watermark - self.overlap)
+            version = await self._save_state(connection, watermark, now)
+
+        self.stats, self._version = stats, version
+        summary = {
+            "mode": "rescore",
+            "transactions": len(events),
+            "series": len(stats),
+            "anomalies": len(anomalies),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info("Anomalies rescored", **summary)
+        return summary
+
+    async def refresh(self) -> Dict:
+        """Score the transactions created since the last refresh"""
+        await self.prepare()
+        started = time.perf_counter()
+
+        async with self.engine.begin() as connection:
+            await self._lock(connection)
+            state = await self._state(connection)
+            due = (
+                state is None or state.rescored_at is None
+                or datetime.utcnow() - state.rescored_at >= self.rescore_interval
+            )
+            if not due:
+                try:
+                    if self.stats is None or self._version != state.refreshed_at:
+                        self.stats = await self._load_stats(connection)
+                    stats = self.stats
+
+                    query = self._transactions()
+                    since = state.watermark - self.overlap if state.watermark else None
+                    if since is not None:
+                        query = query.where(InventoryTransaction.created_at >= since)
+                    seen = set((await connection.execute(
+                        select(anomaly_recent_transactions.c.transaction_id)
+                    )).scalars())
+                    events = await self._read_events(
+                        connection,
+                        query.order_by(InventoryTransaction.created_at, InventoryTransaction.id),
+                        stats,
+                        seen
+                    )
+                    anomalies = self._score(events, stats)
+
+                    await self._insert(connection, inventory_anomalies, anomalies)
+                    touched = sorted(set(events.codes))
+                    for batch in _batches(touched, SERIES_BATCH):
+                        await connection.execute(
+                            delete(anomaly_series_state).where(tuple_(
+                                anomaly_series_state.c.plant_id, anomaly_series_state.c.material_id
+                            ).in_([stats.keys[code] for code in batch]))
+                        )
+                    await self._insert(connection, anomaly_series_state, self._series_rows(stats, touched))
+
+                    latest = max(filter(None, events.created_at), default=None)
+                    watermark = max(filter(None, (state.watermark, latest)), default=None)
+                    if watermark is not None:
+                        await self._remember(connection, events, watermark - self.overlap)
+                    version = await self._save_state(connection, watermark, state.rescored_at)
+                except Exception:
+                    # The statistics may hold events that were rolled back
+                    self.stats = None
+                    raise
+
+                self._version = version
+                summary = {
+                    "mode": "refresh",
+                    "transactions": len(events),
+                    "series": len(touched),
+                    "anomalies": len(anomalies),
+                    "elapsed_seconds": round(time.perf_counter() - started, 3)
+                }
+                if events:
+                    logger.info("Anomalies refreshed", **summary)
+                return summary
+
+        return await self.rescore()
+
+
+# Shared by the loaders of a process, so its statistics stay in memory between refreshes
+anomaly_detector = AnomalyDetector()
+
+
+async def refresh_anomalies(engine: AsyncEngine = async_engine) -> Optional[Dict]:
+    """Score new transactions after an ERP load; failures are logged, not raised"""
+    detector = anomaly_detector if engine is anomaly_detector.engine else AnomalyDetector(engine)
+    try:
+        return await detector.refresh()
+    except Exception as e:
+        logger.error("Anomaly detection refresh failed", error=str(e))
+        return None
+
+
+class AnomalyService:
+    """Read detected anomalies"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_anomalies(
+        self,
+        plant_id: Optional[str] = None,
+        anomaly_type: Optional[str] = None,
+        days: int = 30,
+        limit: int = 100
+    ) -> Dict:
+        """Newest anomalies of the last days, with counts by type"""
+        since = datetime.utcnow() - timedelta(days=days)
+        filters = [inventory_anomalies.c.transaction_date >= since]
+        if plant_id:
+            filters.append(inventory_anomalies.c.plant_id == plant_id)
+        if anomaly_type:
+            filters.append(inventory_anomalies.c.anomaly_type == anomaly_type)
+
+        counts = await self.db.execute(
+            select(inventory_anomalies.c.anomaly_type, func.count()).where(*filters).group_by(
+                inventory_anomalies.c.anomaly_type
+            )
+        )
+        by_type = {anomaly_type: count for anomaly_type, count in counts}
+        result = await self.db.execute(
+            select(inventory_anomalies).where(*filters).order_by(
+                inventory_anomalies.c.transaction_date.desc(), inventory_anomalies.c.id.desc()
+            ).limit(limit)
+        )
+        refreshed_at = (await self.db.execute(
+            select(anomaly_detection_state.c.refreshed_at).where(anomaly_detection_state.c.source == SOURCE)
+        )).scalar()
+        return {
+            "anomalies": [dict(row._mapping) for row in result],
+            "total_detected": sum(by_type.values()),
+            "by_type": by_type,
+            "last_updated": refreshed_at
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detect anomalies in inventory transactions")
+    parser.add_argument("--rescore", action="store_true", help="Rebuild the statistics and anomalies over the window")
+    args = parser.parse_args()
+
+    async def run():
+        detector = AnomalyDetector()
+        try:
+            return await (detector.rescore() if args.rescore else detector.refresh())
+        finally:
+            await async_engine.dispose()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
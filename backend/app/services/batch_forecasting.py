@@ -0,0 +1,180 @@
+"""
+Vectorized batch demand forecasting
+
+Fits a linear trend plus day-of-week seasonality model to every demand
+series at once. All series share the same daily time axis, so the least
+squares fit for the whole catalog is a single matrix product with the
+pseudo-inverse of the shared design matrix.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from statistics import NormalDist
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Days in the seasonal cycle
+SEASON_LENGTH = 7
+
+# Model parameters: intercept, trend and one dummy per non-reference weekday
+N_PARAMS = 2 + SEASON_LENGTH - 1
+
+
+@dataclass
+class BatchForecast:
+    """Forecasts for many series, one row per series"""
+    start_date: date
+    forecast: np.ndarray
+    lower: np.ndarray
+    upper: np.ndarray
+    residual_std: np.ndarray
+    confidence_level: float
+
+    @property
+    def horizon_days(self) -> int:
+        return self.forecast.shape[1]
+
+    def series_forecast(self, index: int) -> List[Dict]:
+        """Format one series in the API forecast_data shape"""
+        return [
+            {
+                "date": (self.start_date + timedelta(days=day)).strftime("%Y-%m-%d"),
+                "predicted_demand": round(float(self.forecast[index, day]), 2),
+                "confidence_lower": round(float(self.lower[index, day]), 2),
+                "confidence_upper": round(float(self.upper[index, day]), 2)
+            }
+            for day in range(self.horizon_days)
+        ]
+
+
+def design_matrix(start: int, length: int, origin_weekday: int = 0) -> np.ndarray:
+    """Intercept, linear trend and day-of-week dummy columns for time steps"""
+    steps = np.arange(start, start + length)
+    weekdays = (steps + origin_weekday) % SEASON_LENGTH
+    seasonal = (weekdays[:, None] == np.arange(1, SEASON_LENGTH)[None, :]).astype(np.float64)
+    return np.column_stack([np.ones(length), steps.astype(np.float64), seasonal])
+
+
+def _validate_history(history: np.ndarray) -> np.ndarray:
+    history = np.asarray(history, dtype=np.float64)
+    if history.ndim != 2:
+        raise ValueError("history must be a 2-D array of shape (series, days)")
+    if history.shape[1] <= N_PARAMS:
+        raise ValueError(f"at least {N_PARAMS + 1} days of history are required")
+    return history
+
+
+def history_origin_weekday(start_date: date, n_days: int) -> int:
+    """Weekday of the first history column for a forecast starting at start_date"""
+    return (start_date - timedelta(days=n_days)).weekday()
+
+
+def fit_batch(history: np.ndarray, origin_weekday: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Fit every row of a (series x days) history matrix
+
+    Returns coefficients of shape (series, N_PARAMS) and the residual
+    standard deviation of each series.
+    """
+    history = _validate_history(history)
+    n_days = history.shape[1]
+
+    # One shared pseudo-inverse fits every series: (params x days) @ (days x series)
+    X = design_matrix(0, n_days, origin_weekday)
+    coefficients = np.linalg.pinv(X) @ history.T
+
+    residuals = history - (X @ coefficients).T
+    residual_std = np.sqrt(np.einsum("ij,ij->i", residuals, residuals) / (n_days - N_PARAMS))
+    return coefficients.T, residual_std
+
+
+def predict_batch(
+    coefficients: np.ndarray,
+    residual_std: np.ndarray,
+    n_days: int,
+    horizon_days: int,
+    origin_weekday: int,
+    start_date: date,
+    confidence_level: float = 0.95,
+    offset_days: int = 0
+) -> BatchForecast:
+    """Forecast from fitted coefficients for the days after an n_days history
+
+    offset_days skips days between the end of the history and
+    start_date, e.g. when the model was trained a few days ago.
+    """
+    X_pinv = np.linalg.pinv(design_matrix(0, n_days, origin_weekday))
+    X_future = design_matrix(n_days + offset_days, horizon_days, origin_weekday)
+    forecast = np.asarray(coefficients, dtype=np.float64) @ X_future.T
+
+    # Prediction interval width grows with leverage of the future points
+    leverage = np.einsum("ij,jk,ik->i", X_future, X_pinv @ X_pinv.T, X_future)
+    z = NormalDist().inv_cdf(0.5 + confidence_level / 2)
+    half_width = z * np.asarray(residual_std)[:, None] * np.sqrt(1.0 + leverage)[None, :]
+
+    np.maximum(forecast, 0.0, out=forecast)
+    lower = np.maximum(forecast - half_width, 0.0)
+    upper = forecast + half_width
+
+    return BatchForecast(
+        start_date=start_date,
+        forecast=forecast,
+        lower=lower,
+        upper=upper,
+        residual_std=np.asarray(residual_std),
+        confidence_level=confidence_level
+    )
+
+
+def forecast_batch(
+    history: np.ndarray,
+    horizon_days: int,
+    confidence_level: float = 0.95,
+    start_date: Optional[date] = None
+) -> BatchForecast:
+    """Forecast every row of a (series x days) demand history matrix
+
+    history holds daily demand, oldest day first, with the last column
+    being the day before start_date.
+    """
+    history = _validate_history(history)
+    n_days = history.shape[1]
+    start_date = start_date or date.today()
+    origin_weekday = history_origin_weekday(start_date, n_days)
+
+    coefficients, residual_std = fit_batch(history, origin_weekday)
+    return predict_batch(
+        coefficients, residual_std, n_days, horizon_days, origin_weekday, start_date, confidence_level
+    )
+
+
+def build_history_matrix(
+    rows: Sequence[Tuple[str, str, date, float]],
+    end_date: date,
+    lookback_days: int
+) -> Tuple[List[Tuple[str, str]], np.ndarray]:
+    """Pivot (material_id, plant_id, day, quantity) rows into a dense matrix
+
+    Days without transactions count as zero demand. Returns the series
+    keys in row order and the (series x lookback_days) matrix ending on
+    the day before end_date.
+    """
+    keys: Dict[Tuple[str, str], int] = {}
+    series_index = np.empty(len(rows), dtype=np.int64)
+    day_index = np.empty(len(rows), dtype=np.int64)
+    quantities = np.empty(len(rows), dtype=np.float64)
+    first_day = end_date - timedelta(days=lookback_days)
+
+    for i, (material_id, plant_id, day, quantity) in enumerate(rows):
+        series_index[i] = keys.setdefault((material_id, plant_id), len(keys))
+        day_index[i] = (day - first_day).days
+        quantities[i] = quantity
+
+    history = np.zeros((len(keys), lookback_days), dtype=np.float64)
+    in_window = (day_index >= 0) & (day_index < lookback_days)
+    np.add.at(history, (series_index[in_window], day_index[in_window]), quantities[in_window])
+    return list(keys), history
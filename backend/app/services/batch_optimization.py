@@ -0,0 +1,133 @@
+"""
+Vectorized reorder point and safety stock optimization
+
+Computes the replenishment policy of every material and plant series at
+once from arrays of daily demand statistics, lead times and cycle service
+levels. With daily demand mean d and standard deviation s_d, a lead time
+of L days with standard deviation s_L, and z the standard normal quantile
+of the service level:
+
+    safety stock  = z * sqrt(L * s_d^2 + d^2 * s_L^2)
+    reorder point = d * L + safety stock
+
+Series without a recorded service level get the target of their ABC
+class: the series making up the first 80% of a plant's demand are A, the
+next 15% B and the rest C.
+"""
+
+from __future__ import annotations
+
+from statistics import NormalDist
+from typing import Dict, Sequence
+
+from app.core.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Cumulative demand shares closing the A and B classes
+ABC_SHARES = (0.80, 0.95)
+ABC_CLASSES = ("A", "B", "C")
+
+# Service levels are clipped to keep the normal quantile finite
+MIN_SERVICE_LEVEL = 0.5
+MAX_SERVICE_LEVEL = 0.9999
+
+
+def demand_moments(total: np.ndarray, total_squares: np.ndarray, days: int):
+    """Mean and standard deviation of daily demand from its sums over days
+
+    Days without demand count as zeros, so only the days with demand
+    need to be summed.
+    """
+    total = np.asarray(total, dtype=np.float64)
+    total_squares = np.asarray(total_squares, dtype=np.float64)
+    mean = total / days
+    variance = np.maximum(total_squares - total * total / days, 0.0) / max(days - 1, 1)
+    return mean, np.sqrt(variance)
+
+
+def abc_classes(groups: np.ndarray, demand: np.ndarray, shares: Sequence[float] = ABC_SHARES) -> np.ndarray:
+    """ABC class (0, 1, 2) of each series by its share of its group's demand
+
+    groups holds integer group codes, e.g. from pandas.factorize. A
+    series belongs to the first class whose cumulative share the demand
+    of the larger series ahead of it has not yet reached. Groups without
+    demand are all C.
+    """
+    groups = np.asarray(groups)
+    demand = np.asarray(demand, dtype=np.float64)
+    n = demand.size
+    classes = np.full(n, len(shares), dtype=np.int64)
+    if n == 0:
+        return classes
+
+    # By group, then largest demand first
+    order = np.lexsort((-demand, groups))
+    sorted_groups = groups[order]
+    sorted_demand = demand[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    cumulative = np.cumsum(sorted_demand)
+    within = cumulative - np.repeat(np.r_[0.0, cumulative][starts], lengths)
+    totals = np.repeat(within[starts + lengths - 1], lengths)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ahead = np.where(totals > 0, (within - sorted_demand) / totals, np.nan)
+    ranked = np.searchsorted(np.asarray(shares), ahead, side="right")
+    classes[order] = np.where(np.isnan(ahead), len(shares), ranked)
+    return classes
+
+
+def service_level_z(service_level: np.ndarray) -> np.ndarray:
+    """Standard normal quantile of each service level
+
+    Targets take a handful of distinct values, so the quantile is
+    computed once per value.
+    """
+    levels = np.clip(np.asarray(service_level, dtype=np.float64), MIN_SERVICE_LEVEL, MAX_SERVICE_LEVEL)
+    unique, inverse = np.unique(levels, return_inverse=True)
+    normal = NormalDist()
+    return np.array([normal.inv_cdf(level) for level in unique])[inverse.reshape(levels.shape)]
+
+
+def optimize_reorder_points(
+    demand_mean: np.ndarray,
+    demand_std: np.ndarray,
+    lead_time_days: np.ndarray,
+    lead_time_std_days: np.ndarray,
+    service_level: np.ndarray
+) -> Dict[str, np.ndarray]:
+    """Safety stock and reorder point of every series"""
+    demand_mean = np.asarray(demand_mean, dtype=np.float64)
+    demand_std = np.asarray(demand_std, dtype=np.float64)
+    lead_time_days = np.asarray(lead_time_days, dtype=np.float64)
+    lead_time_std_days = np.asarray(lead_time_std_days, dtype=np.float64)
+
+    lead_time_demand_std = np.sqrt(
+        lead_time_days * demand_std ** 2 + demand_mean ** 2 * lead_time_std_days ** 2
+    )
+    safety_stock = service_level_z(service_level) * lead_time_demand_std
+    return {
+        "safety_stock": safety_stock,
+        "reorder_point": demand_mean * lead_time_days + safety_stock,
+        "lead_time_demand_std": lead_time_demand_std,
+    }
+
+
+def stock_position(
+    stock: np.ndarray,
+    demand_mean: np.ndarray,
+    reorder_point: np.ndarray,
+    review_days: float
+) -> Dict[str, np.ndarray]:
+    """Shortfall below the reorder point and excess above it plus review_days of demand"""
+    stock = np.asarray(stock, dtype=np.float64)
+    demand_mean = np.asarray(demand_mean, dtype=np.float64)
+    target_max = reorder_point + demand_mean * review_days
+    with np.errstate(divide="ignore", invalid="ignore"):
+        days_of_cover = np.where(demand_mean > 0, stock / demand_mean, np.inf)
+    return {
+        "shortfall": np.where(demand_mean > 0, np.maximum(reorder_point - stock, 0.0), 0.0),
+        "excess": np.maximum(stock - target_max, 0.0),
+        "days_of_cover": days_of_cover,
+    }
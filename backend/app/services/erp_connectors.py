@@ -0,0 +1,243 @@
+"""
+ERP delta connectors
+
+Each connector pages through the records of one plant that changed
+since a watermark, in the ERP's own field names. SAP is read over RFC,
+which blocks, so calls run on a bounded thread pool with one connection
+per thread. Oracle Fusion is read over REST through a single pooled
+httpx.AsyncClient shared by every plant.
+"""
+
+import asyncio
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+import structlog
+
+from app.core.config import settings
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class DeltaPage:
+    """Changed records and the latest change timestamp among them"""
+    records: List[Dict[str, Any]]
+    watermark: Optional[datetime]
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ERPConnector:
+    """Source of changed inventory records for one ERP system"""
+
+    erp_system: str
+
+    def fetch_changes(
+        self,
+        plant_id: str,
+        table: str,
+        since: Optional[datetime]
+    ) -> AsyncIterator[DeltaPage]:
+        """Page through records of a plant changed at or after since"""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+def pyrfc_connection():
+    """Open an RFC connection with the SAP_* settings"""
+    from pyrfc import Connection
+
+    return Connection(
+        ashost=settings.SAP_ASHOST or settings.SAP_HOST,
+        sysnr=settings.SAP_SYSNR,
+        client=settings.SAP_CLIENT,
+        user=settings.SAP_USER,
+        passwd=settings.SAP_PASSWORD
+    )
+
+
+class SAPConnector(ERPConnector):
+    """Delta reads through the SAP_DELTA_FUNCTION function module
+
+    The function module takes IV_PLANT, IV_ENTITY, IV_SINCE
+    (YYYYMMDDhhmmss), IV_OFFSET and IV_MAX_ROWS, and returns ET_ROWS with
+    a CHANGED_AT timestamp per row plus an EV_HAS_MORE flag.
+    """
+
+    erp_system = "SAP"
+    ENTITIES = {"inventory_levels": "STOCK", "inventory_transactions": "MOVEMENTS"}
+    TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
+    def __init__(
+        self,
+        connection_factory: Callable[[], Any] = pyrfc_connection,
+        max_workers: int = settings.SAP_MAX_CONNECTIONS,
+        function: str = settings.SAP_DELTA_FUNCTION,
+        page_size: int = settings.ERP_SYNC_PAGE_SIZE
+    ):
+        self.connection_factory = connection_factory
+        self.function = function
+        self.page_size = page_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sap-rfc")
+        self._local = threading.local()
+        self._connections: List[Any] = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # RFC connections are not thread-safe; each pool thread keeps one
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self.connection_factory()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def _call(self, **params) -> Dict[str, Any]:
+        try:
+            return self._connection().call(self.function, **params)
+        except Exception:
+            # Reconnect on the next call from this thread
+            self._local.connection = None
+            raise
+
+    async def fetch_changes(
+        self,
+        plant_id: str,
+        table: str,
+        since: Optional[datetime]
+    ) -> AsyncIterator[DeltaPage]:
+        loop = asyncio.get_running_loop()
+        since_param = since.strftime(self.TIMESTAMP_FORMAT) if since else "0" * 14
+        offset = 0
+        while True:
+            result = await loop.run_in_executor(self._executor, partial(
+                self._call,
+                IV_PLANT=plant_id,
+                IV_ENTITY=self.ENTITIES[table],
+                IV_SINCE=since_param,
+                IV_OFFSET=offset,
+                IV_MAX_ROWS=self.page_size
+            ))
+            rows = result.get("ET_ROWS", [])
+            changed = [row["CHANGED_AT"] for row in rows if row.get("CHANGED_AT")]
+            watermark = datetime.strptime(max(changed), self.TIMESTAMP_FORMAT) if changed else None
+            yield DeltaPage(rows, watermark)
+
+            if not result.get("EV_HAS_MORE") or not rows:
+                return
+            offset += len(rows)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        for connection in self._connections:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.warning("Closing SAP connection failed", error=str(e))
+        self._connections.clear()
+
+
+def _quoted(value: str) -> str:
+    """String literal for a Fusion REST q filter, quotes doubled"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _upper_snake(name: str) -> str:
+    """ItemNumber -> ITEM_NUMBER, matching the Oracle extract column names"""
+    return re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", name).upper()
+
+
+class OracleConnector(ERPConnector):
+    """Delta reads from the Oracle Fusion SCM REST resources"""
+
+    erp_system = "Oracle"
+    RESOURCES = {
+        "inventory_levels": "inventoryOnhandBalances",
+        "inventory_transactions": "inventoryTransactions",
+    }
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
+        max_connections: int = settings.ORACLE_MAX_CONNECTIONS,
+        page_size: int = settings.ERP_SYNC_PAGE_SIZE
+    ):
+        self.page_size = page_size
+        self._client = client or self._create_client(base_url or settings.ORACLE_BASE_URL, max_connections)
+
+    @staticmethod
+    def _create_client(base_url: Optional[str], max_connections: int) -> httpx.AsyncClient:
+        if not base_url:
+            raise ValueError("ORACLE_BASE_URL is not configured")
+        headers = {"Accept": "application/json"}
+        if settings.ORACLE_API_KEY:
+            headers["Authorization"] = f"Bearer {settings.ORACLE_API_KEY}"
+        auth = None
+        if settings.ORACLE_USERNAME and not settings.ORACLE_API_KEY:
+            auth = httpx.BasicAuth(settings.ORACLE_USERNAME, settings.ORACLE_PASSWORD or "")
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            auth=auth,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(30.0)
+        )
+
+    async def fetch_changes(
+        self,
+        plant_id: str,
+        table: str,
+        since: Optional[datetime]
+    ) -> AsyncIterator[DeltaPage]:
+        path = f"/fscmRestApi/resources/{settings.ORACLE_API_VERSION}/{self.RESOURCES[table]}"
+        query = f"OrganizationCode={_quoted(plant_id)}"
+        if since is not None:
+            query += f";LastUpdateDate>={_quoted(since.isoformat())}"
+        offset = 0
+        while True:
+            response = await self._client.get(path, params={
+                "q": query,
+                "orderBy": "LastUpdateDate",
+                "limit": self.page_size,
+                "offset": offset,
+                "onlyData": "true"
+            })
+            response.raise_for_status()
+            body = response.json()
+            rows = [{_upper_snake(name): value for name, value in item.items()} for item in body.get("items", [])]
+            changed = [
+                _naive_utc(datetime.fromisoformat(row["LAST_UPDATE_DATE"]))
+                for row in rows if row.get("LAST_UPDATE_DATE")
+            ]
+            yield DeltaPage(rows, max(changed) if changed else None)
+
+            if not body.get("hasMore") or not rows:
+                return
+            offset += len(rows)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_connectors() -> Dict[str, ERPConnector]:
+    """Connectors for every ERP configured in settings"""
+    connectors: Dict[str, ERPConnector] = {}
+    if settings.SAP_ASHOST or settings.SAP_HOST:
+        connectors[SAPConnector.erp_system] = SAPConnector()
+    if settings.ORACLE_BASE_URL:
+        connectors[OracleConnector.erp_system] = OracleConnector()
+    return connectors
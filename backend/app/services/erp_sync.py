@@ -0,0 +1,277 @@
+"""
+Incremental ERP delta sync
+
+Keeps a change watermark per ERP system, plant and table in
+erp_sync_watermarks and pulls only the records changed since then. Each
+page of changes is upserted into inventory_levels / inventory_transactions
+in the same transaction that advances the watermark, so an interrupted
+sync resumes where it stopped. The window re-read before each watermark
+(ERP_SYNC_OVERLAP) catches records committed late with older change
+timestamps; upserts make the re-read harmless.
+
+Usage:
+    cd backend && python -m app.services.erp_sync [--once]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import structlog
+from sqlalchemy import Column, DateTime, Float, Integer, String, Table, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.cache import invalidate_erp_data
+from app.core.config import settings
+from app.core.database import Base, async_engine, replicas
+from app.core.lazy_imports import lazy_import
+from app.models.plants import Plant
+from app.services.anomaly_detection import refresh_anomalies
+from app.services.erp_connectors import ERPConnector, create_connectors
+from app.services.erp_ingestion import TARGETS, IngestionReport, ensure_upsert_index, normalize, upsert_frame
+from app.services.kpi_rollup import refresh_kpi_rollups
+
+pd = lazy_import("pandas")
+
+logger = structlog.get_logger()
+
+sync_watermarks = Table(
+    "erp_sync_watermarks",
+    Base.metadata,
+    Column("erp_system", String(20), primary_key=True),
+    Column("plant_id", String(50), primary_key=True),
+    Column("entity", String(50), primary_key=True),
+    Column("watermark", DateTime),
+    Column("last_synced_at", DateTime),
+    Column("last_records", Integer, default=0),
+    Column("last_duration_seconds", Float, default=0.0),
+)
+
+
+@dataclass
+class SourceStats:
+    """Outcome of syncing one ERP system, plant and table"""
+    erp_system: str
+    plant_id: str
+    entity: str
+    records: int = 0
+    rejected: int = 0
+    pages: int = 0
+    elapsed_seconds: float = 0.0
+    watermark: Optional[datetime] = None
+    synced_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    @property
+    def records_per_second(self) -> float:
+        return self.records / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def lag_seconds(self) -> Optional[float]:
+        """Delay between the newest applied change and the end of the sync"""
+        if self.watermark is None or self.synced_at is None:
+            return None
+        if not self.records:
+            return 0.0
+        return max((self.synced_at - self.watermark).total_seconds(), 0.0)
+
+    def as_dict(self) -> Dict:
+        return {
+            **asdict(self),
+            "records_per_second": round(self.records_per_second, 1),
+            "lag_seconds": None if self.lag_seconds is None else round(self.lag_seconds, 1)
+        }
+
+
+class ERPSyncEngine:
+    """Pull ERP deltas for every active plant concurrently"""
+
+    def __init__(
+        self,
+        connectors: Optional[Dict[str, ERPConnector]] = None,
+        engine: AsyncEngine = async_engine,
+        overlap_seconds: int = settings.ERP_SYNC_OVERLAP,
+        concurrency: int = settings.ERP_SYNC_CONCURRENCY
+    ):
+        self.connectors = create_connectors() if connectors is None else connectors
+        self.engine = engine
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._prepared = False
+
+    async def prepare(self) -> None:
+        """Create the watermark table and the upsert indexes"""
+        if self._prepared:
+            return
+        async with self.engine.connect() as connection:
+            await connection.run_sync(sync_watermarks.create, checkfirst=True)
+            for target in TARGETS.values():
+                await ensure_upsert_index(connection, target)
+        self._prepared = True
+
+    async def sources(self) -> List[Tuple[str, str, str]]:
+        """(erp_system, plant_id, table) of every active plant with a connector"""
+        async with self.engine.connect() as connection:
+            result = await connection.execute(
+                select(Plant.erp_system, Plant.plant_code).where(
+                    Plant.is_active.is_(True),
+                    Plant.erp_system.in_(list(self.connectors))
+                )
+            )
+            plants = sorted(set(result.all()))
+        return [(erp_system, plant_id, table) for erp_system, plant_id in plants for table in TARGETS]
+
+    async def _watermark(self, connection: AsyncConnection, key: Dict) -> Optional[datetime]:
+        result = await connection.execute(
+            select(sync_watermarks.c.watermark).where(
+                *(sync_watermarks.c[name] == value for name, value in key.items())
+            )
+        )
+        return result.scalar()
+
+    async def _save_watermark(self, connection: AsyncConnection, key: Dict, stats: SourceStats) -> None:
+        dialect = {"postgresql": postgresql, "sqlite": sqlite}[connection.dialect.name]
+        values = {
+            "watermark": stats.watermark,
+            "last_synced_at": stats.synced_at,
+            "last_records": stats.records,
+            "last_duration_seconds": round(stats.elapsed_seconds, 3)
+        }
+        statement = dialect.insert(sync_watermarks).values(**key, **values)
+        await connection.execute(statement.on_conflict_do_update(index_elements=list(key), set_=values))
+
+    async def sync_source(self, erp_system: str, plant_id: str, entity: str) -> SourceStats:
+        """Pull and apply the changes of one plant and table"""
+        stats = SourceStats(erp_system, plant_id, entity)
+        key = {"erp_system": erp_system, "plant_id": plant_id, "entity": entity}
+        target = TARGETS[entity]
+        connector = self.connectors[erp_system]
+
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                async with self.engine.connect() as connection:
+                    stats.watermark = await self._watermark(connection, key)
+                    since = stats.watermark - self.overlap if stats.watermark else None
+
+                    async for page in connector.fetch_changes(plant_id, entity, since):
+                        report = IngestionReport(entity, f"{erp_system}:{plant_id}", erp_system)
+                        frame = normalize(pd.DataFrame.from_records(page.records), target, erp_system, report)
+                        stats.records += await upsert_frame(connection, target, frame)
+                        stats.rejected += report.rows_rejected
+                        stats.pages += 1
+                        if page.watermark and (stats.watermark is None or page.watermark > stats.watermark):
+                            stats.watermark = page.watermark
+                        stats.elapsed_seconds = time.perf_counter() - started
+                        stats.synced_at = datetime.utcnow()
+                        # Rows and watermark commit together
+                        await self._save_watermark(connection, key, stats)
+                        await connection.commit()
+            except Exception as e:
+                stats.error = str(e)
+                logger.error("ERP delta sync failed", erp_system=erp_system, plant_id=plant_id, entity=entity, error=str(e))
+            stats.elapsed_seconds = time.perf_counter() - started
+            stats.synced_at = datetime.utcnow()
+
+        return stats
+
+    async def sync_once(self) -> List[SourceStats]:
+        """Run one delta sync cycle over every source"""
+        await self.prepare()
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.sync_source(*source) for source in await self.sources()))
+
+        if any(stats.records for stats in results):
+            await refresh_kpi_rollups(self.engine)
+            await refresh_anomalies(self.engine)
+            # Dashboards recomputed after the invalidation may read from a replica
+            await replicas.wait_for_replay()
+            try:
+                await invalidate_erp_data()
+            except Exception as e:
+                logger.warning("Cache invalidation after ERP sync failed", error=str(e))
+
+        for stats in results:
+            if stats.records or stats.error:
+                logger.info("ERP source synced", **stats.as_dict())
+        logger.info(
+            "ERP delta sync completed",
+            sources=len(results),
+            records=sum(stats.records for stats in results),
+            failed=sum(1 for stats in results if stats.error),
+            elapsed_seconds=round(time.perf_counter() - started, 3)
+        )
+        return results
+
+    async def run(self, interval: int = settings.ERP_SYNC_INTERVAL) -> None:
+        """Sync every interval seconds until cancelled"""
+        while True:
+            started = time.monotonic()
+            await self.sync_once()
+            await asyncio.sleep(max(interval - (time.monotonic() - started), 0))
+
+    async def close(self) -> None:
+        for connector in self.connectors.values():
+            await connector.close()
+
+
+async def get_sync_status(connection: AsyncConnection) -> List[Dict]:
+    """Watermarks and last cycle figures of every source"""
+    if not await connection.run_sync(
+        lambda sync_connection: sync_connection.dialect.has_table(sync_connection, sync_watermarks.name)
+    ):
+        return []
+
+    now = datetime.utcnow()
+    result = await connection.execute(
+        select(sync_watermarks).order_by(
+            sync_watermarks.c.erp_system, sync_watermarks.c.plant_id, sync_watermarks.c.entity
+        )
+    )
+    statuses = []
+    for row in result:
+        stats = SourceStats(
+            row.erp_system, row.plant_id, row.entity,
+            records=row.last_records or 0,
+            elapsed_seconds=row.last_duration_seconds or 0.0,
+            watermark=row.watermark,
+            synced_at=row.last_synced_at
+        )
+        statuses.append({
+            **stats.as_dict(),
+            "seconds_since_sync": round((now - row.last_synced_at).total_seconds(), 1) if row.last_synced_at else None
+        })
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pull ERP deltas into the inventory tables")
+    parser.add_argument("--once", action="store_true", help="Run a single sync cycle")
+    parser.add_argument("--interval", type=int, default=settings.ERP_SYNC_INTERVAL)
+    args = parser.parse_args()
+
+    async def run():
+        sync_engine = ERPSyncEngine()
+        if not sync_engine.connectors:
+            raise SystemExit("No ERP connection configured; set SAP_ASHOST or ORACLE_BASE_URL")
+        try:
+            if args.once:
+                await sync_engine.sync_once()
+            else:
+                await sync_engine.run(args.interval)
+        finally:
+            await sync_engine.close()
+            await replicas.close()
+            await async_engine.dispose()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Per-series forecast cache with incremental refresh
+
+Entries are keyed by series, horizon and model version and hold the
+forecast together with the least squares state it was computed from:
+X'y and y'y over the series history. When new days of demand arrive,
+the state is advanced by those days alone and the coefficients are
+re-solved from the normal equations, giving the same result as refitting
+on the whole extended history without reading it again.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.lazy_imports import lazy_import
+from app.services.batch_forecasting import N_PARAMS, design_matrix
+
+np = lazy_import("numpy")
+
+# Series, horizon and model version
+CacheKey = Tuple[str, str, int, str]
+
+
+def gram_matrix(n_days: int, origin_weekday: int) -> np.ndarray:
+    """X'X of the design matrix for an n_days history"""
+    X = design_matrix(0, n_days, origin_weekday)
+    return X.T @ X
+
+
+@dataclass(frozen=True)
+class SeriesState:
+    """Sufficient statistics of a series' least squares fit
+
+    end_date is the first day not covered by the history.
+    """
+    n_days: int
+    origin_weekday: int
+    end_date: date
+    xty: np.ndarray
+    yty: float
+
+    @classmethod
+    def from_parameters(
+        cls,
+        coefficients: np.ndarray,
+        residual_std: float,
+        n_days: int,
+        origin_weekday: int,
+        end_date: date
+    ) -> "SeriesState":
+        """Rebuild the statistics of a trained model from its parameters
+
+        At the least squares solution X'y = X'X b, and y'y is the residual
+        sum of squares plus b'X'y.
+        """
+        coefficients = np.asarray(coefficients, dtype=np.float64)
+        xty = gram_matrix(n_days, origin_weekday) @ coefficients
+        rss = float(residual_std) ** 2 * (n_days - N_PARAMS)
+        return cls(n_days, origin_weekday, end_date, xty, rss + float(coefficients @ xty))
+
+    def advance(self, demand: np.ndarray) -> "SeriesState":
+        """State after appending daily demand starting at end_date"""
+        demand = np.asarray(demand, dtype=np.float64)
+        if demand.size == 0:
+            return self
+        X_new = design_matrix(self.n_days, demand.size, self.origin_weekday)
+        return SeriesState(
+            n_days=self.n_days + demand.size,
+            origin_weekday=self.origin_weekday,
+            end_date=self.end_date + timedelta(days=demand.size),
+            xty=self.xty + X_new.T @ demand,
+            yty=self.yty + float(demand @ demand)
+        )
+
+    def solve(self) -> Tuple[np.ndarray, float]:
+        """Coefficients and residual standard deviation of the current history"""
+        coefficients = np.linalg.solve(gram_matrix(self.n_days, self.origin_weekday), self.xty)
+        rss = max(self.yty - float(coefficients @ self.xty), 0.0)
+        return coefficients, float(np.sqrt(rss / (self.n_days - N_PARAMS)))
+
+
+@dataclass
+class CachedForecast:
+    """A forecast response and the state it was computed from"""
+    watermark: Optional[datetime]
+    start_date: date
+    state: SeriesState
+    response: Dict
+
+
+class ForecastCache:
+    """In-process LRU of per-series forecasts"""
+
+    def __init__(self, max_entries: int = settings.FORECAST_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, CachedForecast]" = OrderedDict()
+        self.hits = 0
+        self.incremental_updates = 0
+        self.misses = 0
+
+    def get(self, key: CacheKey) -> Optional[CachedForecast]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: CacheKey, entry: CachedForecast) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "incremental_updates": self.incremental_updates,
+            "misses": self.misses
+        }
+
+
+# Shared by every ForecastingService in the process
+forecast_cache = ForecastCache()
@@ -0,0 +1,91 @@
+"""
+SQL-side inventory aggregation service
+
+Computes dashboard KPIs and stock-type breakdowns with grouped SQL
+queries so that no InventoryLevel ORM objects are materialized.
+"""
+
+from typing import Dict, Optional
+
+from sqlalchemy import Select, case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.inventory import InventoryLevel
+
+# Thresholds used by the executive dashboard
+LOW_STOCK_THRESHOLD = 10
+OVERSTOCK_THRESHOLD = 1000
+
+
+def _count_where(condition):
+    """Count rows matching a condition inside an aggregate query"""
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _filtered(stmt, plant_id: Optional[str]):
+    if plant_id:
+        stmt = stmt.where(InventoryLevel.plant_id == plant_id)
+    return stmt
+
+
+def build_kpi_query(plant_id: Optional[str] = None) -> Select:
+    """Build the single-row KPI aggregate query"""
+    return _filtered(
+        select(
+            func.count(InventoryLevel.id).label("total_materials"),
+            func.coalesce(func.sum(InventoryLevel.total_quantity), 0).label("total_value"),
+            _count_where(InventoryLevel.available_quantity < LOW_STOCK_THRESHOLD).label("low_stock_count"),
+            _count_where(InventoryLevel.total_quantity > OVERSTOCK_THRESHOLD).label("overstock_count"),
+            _count_where(InventoryLevel.available_quantity == 0).label("stock_out_risk"),
+        ),
+        plant_id,
+    )
+
+
+def build_summary_query(plant_id: Optional[str] = None) -> Select:
+    """Build the per-stock-type grouped aggregate query"""
+    return _filtered(
+        select(
+            InventoryLevel.stock_type,
+            func.count(InventoryLevel.id).label("count"),
+            func.coalesce(func.sum(InventoryLevel.total_quantity), 0).label("total_quantity"),
+        ).group_by(InventoryLevel.stock_type),
+        plant_id,
+    )
+
+
+class InventoryAggregationService:
+    """Service for computing inventory aggregates in the database"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_kpis(self, plant_id: Optional[str] = None) -> Dict:
+        """Get KPI counters for inventory levels in a single query"""
+
+        row = (await self.db.execute(build_kpi_query(plant_id))).one()
+        return {
+            "total_materials": int(row.total_materials),
+            "total_value": float(row.total_value),
+            "low_stock_count": int(row.low_stock_count),
+            "overstock_count": int(row.overstock_count),
+            "stock_out_risk": int(row.stock_out_risk),
+        }
+
+    async def get_summary_by_type(self, plant_id: Optional[str] = None) -> Dict:
+        """Get per-stock-type counts and totals in a single grouped query"""
+
+        summary_by_type = {}
+        total_materials = 0
+        for stock_type, count, total_quantity in await self.db.execute(build_summary_query(plant_id)):
+            summary_by_type[stock_type.value] = {
+                "count": count,
+                "total_quantity": total_quantity,
+                "total_value": total_quantity  # Simplified value calculation
+            }
+            total_materials += count
+
+        return {
+            "summary_by_type": summary_by_type,
+            "total_materials": total_materials,
+        }
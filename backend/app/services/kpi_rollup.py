@@ -0,0 +1,603 @@
+"""
+Daily KPI rollups for the analytics endpoints
+
+kpi_daily_material holds a row per plant, material and day with stock
+movements, plus an opening row on the first day of the rollup horizon;
+the closing quantity of a row carries forward to the days without
+movements. kpi_daily_plant holds one row per plant and day with the
+inventory value, receipts, issues and stock-outs of all its materials,
+so any trend window reads at most one row per plant and day.
+
+Closing quantities are anchored on the current stock in inventory_levels
+and walked back through inventory_transactions. Quantities stand in for
+value, as in InventoryAggregationService. refresh() recomputes only the
+materials whose transactions or stock changed since the last watermark
+and adds the difference between their old and new daily contributions to
+the plant rows.
+
+Usage:
+    cd backend && python -m app.services.kpi_rollup [--rebuild]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import structlog
+from sqlalchemy import (
+    Column, Date, DateTime, Float, Integer, String, Table, case, delete, func, insert, select, text
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.core.database import Base, async_engine
+from app.core.lazy_imports import lazy_import
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.models.plants import Plant
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+logger = structlog.get_logger()
+
+RECEIPT_TYPE = "IN"
+ISSUE_TYPE = "OUT"
+
+# Rebuild once the horizon has grown this far past KPI_ROLLUP_DAYS
+HORIZON_SLACK_DAYS = 31
+# Serializes refreshes across processes on PostgreSQL
+ROLLUP_LOCK_KEY = 7_240_001
+MATERIAL_BATCH = 1000
+
+kpi_daily_material = Table(
+    "kpi_daily_material",
+    Base.metadata,
+    Column("plant_id", String(50), primary_key=True),
+    Column("material_id", String(50), primary_key=True),
+    Column("snapshot_date", Date, primary_key=True),
+    Column("receipts", Float, nullable=False, default=0.0),
+    Column("issues", Float, nullable=False, default=0.0),
+    Column("closing_quantity", Float, nullable=False, default=0.0),
+)
+
+kpi_daily_plant = Table(
+    "kpi_daily_plant",
+    Base.metadata,
+    Column("plant_id", String(50), primary_key=True),
+    Column("snapshot_date", Date, primary_key=True, index=True),
+    Column("inventory_value", Float, nullable=False, default=0.0),
+    Column("receipts", Float, nullable=False, default=0.0),
+    Column("issues", Float, nullable=False, default=0.0),
+    Column("stock_outs", Integer, nullable=False, default=0),
+    Column("materials", Integer, nullable=False, default=0),
+)
+
+kpi_rollup_state = Table(
+    "kpi_rollup_state",
+    Base.metadata,
+    Column("source", String(50), primary_key=True),
+    Column("watermark", DateTime),
+    Column("horizon_start", Date),
+    Column("refreshed_at", DateTime),
+)
+
+ROLLUP_TABLES = (kpi_daily_material, kpi_daily_plant, kpi_rollup_state)
+
+# Row order of the per-plant daily series arrays
+SERIES_COLUMNS = ("inventory_value", "receipts", "issues", "stock_outs", "materials")
+# Series that hold a level (carried forward) rather than a daily flow
+LEVEL_SERIES = (0, 3, 4)
+
+# Watermark column of each source table
+SOURCES = {
+    "inventory_transactions": InventoryTransaction.created_at,
+    "inventory_levels": InventoryLevel.last_updated,
+}
+
+
+def utc_today() -> date:
+    return datetime.utcnow().date()
+
+
+def _batches(values: List[str], size: int = MATERIAL_BATCH) -> Iterable[List[str]]:
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+def material_history(
+    levels: Dict[str, float],
+    flows: pd.DataFrame,
+    start: date
+) -> pd.DataFrame:
+    """Daily rows of each material from its current stock and movements
+
+    flows has material_id, snapshot_date, receipts and issues columns.
+    Every material in levels or flows gets an opening row on start.
+    """
+    materials = sorted(set(levels) | set(flows["material_id"]))
+    opening = pd.DataFrame({
+        "material_id": materials,
+        "snapshot_date": pd.Timestamp(start),
+        "receipts": 0.0,
+        "issues": 0.0,
+    })
+    history = (
+        pd.concat([opening, flows], ignore_index=True)
+        .groupby(["material_id", "snapshot_date"], as_index=False, sort=True)[["receipts", "issues"]]
+        .sum()
+    )
+    net = history["receipts"] - history["issues"]
+    by_material = net.groupby(history["material_id"])
+    # Stock after a day is the current stock less every later movement
+    later = by_material.transform("sum") - by_material.cumsum()
+    history["closing_quantity"] = history["material_id"].map(levels).fillna(0.0).astype(float) - later
+    return history
+
+
+def plant_contribution(history: pd.DataFrame, start: date, days: int) -> np.ndarray:
+    """Daily series (SERIES_COLUMNS x days) of the materials in history"""
+    series = np.zeros((len(SERIES_COLUMNS), days))
+    if history.empty:
+        return series
+
+    index = (pd.to_datetime(history["snapshot_date"]) - pd.Timestamp(start)).dt.days.to_numpy()
+    index = np.clip(index, 0, days - 1)
+    closing = history["closing_quantity"].to_numpy(dtype=float)
+    stock_out = (closing <= 0).astype(float)
+    first = ~history["material_id"].duplicated().to_numpy()
+
+    # Level series change only on movement days: add the step, then cumsum
+    previous_closing = np.where(first, 0.0, np.roll(closing, 1))
+    previous_stock_out = np.where(first, 0.0, np.roll(stock_out, 1))
+    np.add.at(series[0], index, closing - previous_closing)
+    np.add.at(series[1], index, history["receipts"].to_numpy(dtype=float))
+    np.add.at(series[2], index, history["issues"].to_numpy(dtype=float))
+    np.add.at(series[3], index, stock_out - previous_stock_out)
+    np.add.at(series[4], index, first.astype(float))
+    for row in LEVEL_SERIES:
+        series[row] = np.cumsum(series[row])
+    return series
+
+
+class KPIRollup:
+    """Maintain the daily KPI rollup tables"""
+
+    def __init__(
+        self,
+        engine: AsyncEngine = async_engine,
+        horizon_days: int = settings.KPI_ROLLUP_DAYS,
+        overlap_seconds: int = settings.ERP_SYNC_OVERLAP
+    ):
+        self.engine = engine
+        self.horizon_days = horizon_days
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._prepared = False
+
+    async def prepare(self) -> None:
+        if self._prepared:
+            return
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all, tables=list(ROLLUP_TABLES))
+        self._prepared = True
+
+    async def _lock(self, connection: AsyncConnection) -> None:
+        if connection.dialect.name == "postgresql":
+            await connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY})
+
+    async def _state(self, connection: AsyncConnection) -> Dict[str, Tuple[Optional[datetime], Optional[date]]]:
+        result = await connection.execute(select(kpi_rollup_state))
+        return {row.source: (row.watermark, row.horizon_start) for row in result}
+
+    async def _save_state(
+        self,
+        connection: AsyncConnection,
+        watermarks: Dict[str, Optional[datetime]],
+        start: date
+    ) -> None:
+        await connection.execute(delete(kpi_rollup_state))
+        now = datetime.utcnow()
+        await connection.execute(insert(kpi_rollup_state), [
+            {"source": source, "watermark": watermark, "horizon_start": start, "refreshed_at": now}
+            for source, watermark in watermarks.items()
+        ])
+
+    async def _latest_change(self, connection: AsyncConnection, column) -> Optional[datetime]:
+        return (await connection.execute(select(func.max(column)))).scalar()
+
+    async def _changed_materials(
+        self,
+        connection: AsyncConnection,
+        column,
+        since: Optional[datetime]
+    ) -> Tuple[Set[Tuple[str, str]], Optional[datetime]]:
+        """(plant_id, material_id) changed at or after since, and the newest change"""
+        model = column.class_
+        statement = select(model.plant_id, model.material_id, func.max(column)).group_by(
+            model.plant_id, model.material_id
+        )
+        if since is not None:
+            statement = statement.where(column >= since)
+        keys, latest = set(), None
+        for plant_id, material_id, changed_at in await connection.execute(statement):
+            if plant_id is None or material_id is None:
+                continue
+            keys.add((plant_id, material_id))
+            if changed_at is not None and (latest is None or changed_at > latest):
+                latest = changed_at
+        return keys, latest
+
+    async def _load_history(
+        self,
+        connection: AsyncConnection,
+        plant_id: str,
+        materials: Optional[List[str]],
+        start: date,
+        today: date
+    ) -> pd.DataFrame:
+        """Recompute the daily rows of some (or all) materials of a plant"""
+        day = func.date(InventoryTransaction.transaction_date)
+        levels_query = select(
+            InventoryLevel.material_id, func.coalesce(func.sum(InventoryLevel.total_quantity), 0.0)
+        ).where(InventoryLevel.plant_id == plant_id).group_by(InventoryLevel.material_id)
+        flows_query = select(
+            InventoryTransaction.material_id,
+            day.label("snapshot_date"),
+            func.coalesce(func.sum(case(
+                (InventoryTransaction.transaction_type == RECEIPT_TYPE, InventoryTransaction.quantity), else_=0.0
+            )), 0.0).label("receipts"),
+            func.coalesce(func.sum(case(
+                (InventoryTransaction.transaction_type == ISSUE_TYPE, InventoryTransaction.quantity), else_=0.0
+            )), 0.0).label("issues"),
+        ).where(
+            InventoryTransaction.plant_id == plant_id,
+            InventoryTransaction.material_id.is_not(None),
+            InventoryTransaction.transaction_date >= datetime.combine(start, datetime.min.time()),
+            InventoryTransaction.transaction_date < datetime.combine(today + timedelta(days=1), datetime.min.time()),
+        ).group_by(InventoryTransaction.material_id, day)
+
+        levels: Dict[str, float] = {}
+        flows: List[Tuple] = []
+        for batch in _batches(materials) if materials is not None else [None]:
+            levels_batch, flows_batch = levels_query, flows_query
+            if batch is not None:
+                levels_batch = levels_query.where(InventoryLevel.material_id.in_(batch))
+                flows_batch = flows_query.where(InventoryTransaction.material_id.in_(batch))
+            levels.update(
+                (material_id, float(quantity))
+                for material_id, quantity in await connection.execute(levels_batch)
+                if material_id is not None
+            )
+            flows.extend((await connection.execute(flows_batch)).all())
+        # Materials dropped from both tables keep an empty history
+        if materials is not None:
+            for material_id in materials:
+                levels.setdefault(material_id, 0.0)
+
+        flows_frame = pd.DataFrame(flows, columns=["material_id", "snapshot_date", "receipts", "issues"])
+        flows_frame = flows_frame.astype({"receipts": float, "issues": float})
+        flows_frame["snapshot_date"] = pd.to_datetime(flows_frame["snapshot_date"])
+        history = material_history(levels, flows_frame, start)
+        history.insert(0, "plant_id", plant_id)
+        return history
+
+    async def _stored_history(
+        self,
+        connection: AsyncConnection,
+        plant_id: str,
+        materials: List[str]
+    ) -> pd.DataFrame:
+        rows = []
+        for batch in _batches(materials):
+            result = await connection.execute(
+                select(kpi_daily_material).where(
+                    kpi_daily_material.c.plant_id == plant_id,
+                    kpi_daily_material.c.material_id.in_(batch)
+                ).order_by(kpi_daily_material.c.material_id, kpi_daily_material.c.snapshot_date)
+            )
+            rows.extend(result.all())
+        return pd.DataFrame(rows, columns=[column.name for column in kpi_daily_material.columns])
+
+    async def _plant_series(self, connection: AsyncConnection, plant_id: str, start: date, days: int) -> np.ndarray:
+        """Stored daily series of a plant, carried forward to the last day"""
+        result = await connection.execute(
+            select(kpi_daily_plant).where(
+                kpi_daily_plant.c.plant_id == plant_id,
+                kpi_daily_plant.c.snapshot_date >= start
+            )
+        )
+        series = np.full((len(SERIES_COLUMNS), days), np.nan)
+        for row in result:
+            index = (row.snapshot_date - start).days
+            if 0 <= index < days:
+                series[:, index] = [getattr(row, column) for column in SERIES_COLUMNS]
+        levels = pd.DataFrame(series[list(LEVEL_SERIES)].T).ffill().fillna(0.0).to_numpy().T
+        series = np.nan_to_num(series)
+        series[list(LEVEL_SERIES)] = levels
+        return series
+
+    async def _write_history(self, connection: AsyncConnection, history: pd.DataFrame) -> None:
+        if history.empty:
+            return
+        rows = history.assign(snapshot_date=pd.to_datetime(history["snapshot_date"]).dt.date)
+        await connection.execute(insert(kpi_daily_material), rows.to_dict("records"))
+
+    async def _write_series(
+        self,
+        connection: AsyncConnection,
+        plant_id: str,
+        series: np.ndarray,
+        start: date,
+        first_day: int = 0
+    ) -> None:
+        await connection.execute(
+            delete(kpi_daily_plant).where(
+                kpi_daily_plant.c.plant_id == plant_id,
+                kpi_daily_plant.c.snapshot_date >= start + timedelta(days=first_day)
+            )
+        )
+        columns = series[:, first_day:].T.tolist()
+        await connection.execute(insert(kpi_daily_plant), [
+            {
+                "plant_id": plant_id,
+                "snapshot_date": start + timedelta(days=first_day + offset),
+                "inventory_value": value,
+                "receipts": receipts,
+                "issues": issues,
+                "stock_outs": int(round(stock_outs)),
+                "materials": int(round(materials)),
+            }
+            for offset, (value, receipts, issues, stock_outs, materials) in enumerate(columns)
+        ])
+
+    async def _extend_plants(self, connection: AsyncConnection, start: date, today: date) -> None:
+        """Carry the last stored day of every plant forward to today"""
+        last_days = await connection.execute(
+            select(kpi_daily_plant.c.plant_id, func.max(kpi_daily_plant.c.snapshot_date)).group_by(
+                kpi_daily_plant.c.plant_id
+            )
+        )
+        days = (today - start).days + 1
+        for plant_id, last_day in last_days.all():
+            if isinstance(last_day, str):
+                last_day = date.fromisoformat(last_day)
+            if last_day >= today:
+                continue
+            series = await self._plant_series(connection, plant_id, start, days)
+            await self._write_series(connection, plant_id, series, start, (last_day - start).days + 1)
+
+    async def rebuild(self) -> Dict:
+        """Recompute every rollup row over a fresh horizon"""
+        await self.prepare()
+        started = time.perf_counter()
+        today = utc_today()
+        start = today - timedelta(days=self.horizon_days - 1)
+        days = self.horizon_days
+        materials = 0
+
+        async with self.engine.begin() as connection:
+            await self._lock(connection)
+            # Taken first so changes made during the rebuild are picked up next time
+            watermarks = {
+                source: await self._latest_change(connection, column) for source, column in SOURCES.items()
+            }
+            await connection.execute(delete(kpi_daily_material))
+            await connection.execute(delete(kpi_daily_plant))
+
+            plants = set()
+            for model in (InventoryLevel, InventoryTransaction):
+                result = await connection.execute(select(model.plant_id).distinct())
+                plants.update(plant_id for plant_id in result.scalars() if plant_id is not None)
+            for plant_id in sorted(plants):
+                history = await self._load_history(connection, plant_id, None, start, today)
+                await self._write_history(connection, history)
+                await self._write_series(connection, plant_id, plant_contribution(history, start, days), start)
+                materials += history["material_id"].nunique()
+            await self._save_state(connection, watermarks, start)
+
+        summary = {
+            "mode": "rebuild",
+            "plants": len(plants),
+            "materials": materials,
+            "horizon_start": start.isoformat(),
+            "elapsed_seconds": round(time.perf_counter() - started, 3)
+        }
+        logger.info("KPI rollups rebuilt", **summary)
+        return summary
+
+    async def refresh(self) -> Dict:
+        """Bring the rollups up to date with the changes since the last refresh"""
+        await self.prepare()
+        started = time.perf_counter()
+        today = utc_today()
+
+        async with self.engine.begin() as connection:
+            await self._lock(connection)
+            state = await self._state(connection)
+            starts = {horizon_start for _, horizon_start in state.values()}
+            start = starts.pop() if len(starts) == 1 else None
+            if isinstance(start, str):
+                start = date.fromisoformat(start)
+            stale = start is None or (today - start).days >= self.horizon_days + HORIZON_SLACK_DAYS
+
+            if not stale and set(state) == set(SOURCES):
+                days = (today - start).days + 1
+                changed: Set[Tuple[str, str]] = set()
+                watermarks = {}
+                for source, column in SOURCES.items():
+                    watermark = state[source][0]
+                    keys, latest = await self._changed_materials(
+                        connection, column, watermark - self.overlap if watermark else None
+                    )
+                    changed |= keys
+                    watermarks[source] = max(filter(None, (watermark, latest)), default=None)
+
+                by_plant: Dict[str, List[str]] = {}
+                for plant_id, material_id in changed:
+                    by_plant.setdefault(plant_id, []).append(material_id)
+                for plant_id, materials in sorted(by_plant.items()):
+                    materials.sort()
+                    new_history = await self._load_history(connection, plant_id, materials, start, today)
+                    old_history = await self._stored_history(connection, plant_id, materials)
+                    series = await self._plant_series(connection, plant_id, start, days)
+                    series += plant_contribution(new_history, start, days) - plant_contribution(old_history, start, days)
+
+                    for batch in _batches(materials):
+                        await connection.execute(
+                            delete(kpi_daily_material).where(
+                                kpi_daily_material.c.plant_id == plant_id,
+                                kpi_daily_material.c.material_id.in_(batch)
+                            )
+                        )
+                    await self._write_history(connection, new_history)
+                    await self._write_series(connection, plant_id, series, start)
+
+                await self._extend_plants(connection, start, today)
+                await self._save_state(connection, watermarks, start)
+                summary = {
+                    "mode": "refresh",
+                    "plants": len(by_plant),
+                    "materials": len(changed),
+                    "horizon_start": start.isoformat(),
+                    "elapsed_seconds": round(time.perf_counter() - started, 3)
+                }
+                if changed:
+                    logger.info("KPI rollups refreshed", **summary)
+                return summary
+
+        return await self.rebuild()
+
+
+async def refresh_kpi_rollups(engine: AsyncEngine = async_engine) -> Optional[Dict]:
+    """Refresh the rollups after an ERP load; failures are logged, not raised"""
+    try:
+        return await KPIRollup(engine).refresh()
+    except Exception as e:
+        logger.error("KPI rollup refresh failed", error=str(e))
+        return None
+
+
+def _rate(numerator: float, denominator: float) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+
+def window_kpis(rows: List[Dict]) -> Dict:
+    """Turnover, days of inventory and stock-out rate over daily totals"""
+    if not rows:
+        return {
+            "inventory_value": 0.0,
+            "average_inventory_value": 0.0,
+            "issues": 0.0,
+            "inventory_turnover": None,
+            "days_of_inventory": None,
+            "stock_out_rate": None
+        }
+    average_value = sum(row["inventory_value"] for row in rows) / len(rows)
+    issues = sum(row["issues"] for row in rows)
+    stock_out_rates = [row["stock_outs"] / row["materials"] for row in rows if row["materials"]]
+    turnover = _rate(issues, average_value)
+    daily_issues = issues / len(rows)
+    return {
+        "inventory_value": rows[-1]["inventory_value"],
+        "average_inventory_value": average_value,
+        "issues": issues,
+        # Annualized, so windows of different lengths compare
+        "inventory_turnover": turnover * 365 / len(rows) if turnover is not None else None,
+        "days_of_inventory": _rate(average_value, daily_issues),
+        "stock_out_rate": sum(stock_out_rates) / len(stock_out_rates) if stock_out_rates else None
+    }
+
+
+class KPIRollupService:
+    """Read KPI windows and trends from the rollup tables"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def daily_totals(self, plant_id: Optional[str] = None, days: int = 30) -> List[Dict]:
+        """Per-day totals over the last days, across all plants or one"""
+        first_day = utc_today() - timedelta(days=days - 1)
+        statement = select(
+            kpi_daily_plant.c.snapshot_date,
+            func.sum(kpi_daily_plant.c.inventory_value).label("inventory_value"),
+            func.sum(kpi_daily_plant.c.receipts).label("receipts"),
+            func.sum(kpi_daily_plant.c.issues).label("issues"),
+            func.sum(kpi_daily_plant.c.stock_outs).label("stock_outs"),
+            func.sum(kpi_daily_plant.c.materials).label("materials"),
+        ).where(kpi_daily_plant.c.snapshot_date >= first_day).group_by(
+            kpi_daily_plant.c.snapshot_date
+        ).order_by(kpi_daily_plant.c.snapshot_date)
+        if plant_id:
+            statement = statement.where(kpi_daily_plant.c.plant_id == plant_id)
+        return [dict(row._mapping) for row in await self.db.execute(statement)]
+
+    async def get_kpis(self, plant_id: Optional[str] = None, days: int = 30) -> Dict:
+        return window_kpis(await self.daily_totals(plant_id, days))
+
+    async def get_trends(self, plant_id: Optional[str] = None, days: int = 30) -> Dict:
+        rows = await self.daily_totals(plant_id, days)
+        return {
+            "total_inventory": [
+                {"date": row["snapshot_date"], "value": row["inventory_value"]} for row in rows
+            ],
+            "stock_outs": [
+                {"date": row["snapshot_date"], "count": row["stock_outs"]} for row in rows
+            ],
+            "receipts": [
+                {"date": row["snapshot_date"], "quantity": row["receipts"]} for row in rows
+            ],
+            "issues": [
+                {"date": row["snapshot_date"], "quantity": row["issues"]} for row in rows
+            ],
+        }
+
+    async def get_plant_comparison(self, days: int = 30) -> List[Dict]:
+        """Window KPIs of every plant, with its name when known"""
+        first_day = utc_today() - timedelta(days=days - 1)
+        result = await self.db.execute(
+            select(kpi_daily_plant, Plant.plant_name).outerjoin(
+                Plant, Plant.plant_code == kpi_daily_plant.c.plant_id
+            ).where(kpi_daily_plant.c.snapshot_date >= first_day).order_by(
+                kpi_daily_plant.c.plant_id, kpi_daily_plant.c.snapshot_date
+            )
+        )
+        by_plant: Dict[str, List[Dict]] = {}
+        names: Dict[str, Optional[str]] = {}
+        for row in result:
+            by_plant.setdefault(row.plant_id, []).append(row._mapping)
+            names[row.plant_id] = row.plant_name
+
+        plants = []
+        for plant_id, rows in by_plant.items():
+            kpis = window_kpis(rows)
+            plants.append({
+                "plant_id": plant_id,
+                "plant_name": names[plant_id],
+                "inventory_value": kpis["inventory_value"],
+                "turnover_rate": kpis["inventory_turnover"],
+                "days_of_inventory": kpis["days_of_inventory"],
+                "stock_out_rate": kpis["stock_out_rate"]
+            })
+        return plants
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the daily KPI rollup tables")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute every rollup row")
+    args = parser.parse_args()
+
+    async def run():
+        rollup = KPIRollup()
+        try:
+            return await (rollup.rebuild() if args.rebuild else rollup.refresh())
+        finally:
+            await async_engine.dispose()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""
+Live inventory updates over WebSocket
+
+ChangeFeed polls inventory_levels.last_updated and
+inventory_alerts.created_at against a watermark every
+LIVE_UPDATES_POLL_INTERVAL seconds, re-reading the last LIVE_UPDATES_OVERLAP
+seconds for late commits and skipping rows it has already sent. Polling sees
+every writer: the ERP delta sync (a separate process), bulk ingestion and
+the API. Only one worker in the deployment polls, the holder of a lock in
+the cache backend; the changed rows are published on a Redis channel that
+every worker listens to. With the in-process cache backend, or while Redis
+is unreachable, each worker polls for itself and delivers locally.
+
+LiveHub keeps this worker's subscribers indexed by plant and material. A
+batch of changes is encoded once per distinct set of matching keys, not
+once per subscriber. Each subscriber has a bounded queue drained by its
+own sender task, so fan-out never waits on a socket. When a slow client's
+queue overflows, the queued updates are replaced by a single "resync"
+event telling it to reload over REST. A client that keeps overflowing is
+disconnected.
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import orjson
+import structlog
+from sqlalchemy import Index, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.database import async_engine
+from app.core.serialization import ORJSON_OPTIONS, RowSerializer
+from app.models.inventory import InventoryAlert, InventoryLevel
+from app.schemas.inventory import InventoryAlertResponse, InventoryLevelResponse
+
+logger = structlog.get_logger()
+
+CHANNEL = "live:updates"
+LEADER_KEY = "live:feed:leader"
+
+LEVEL_ROWS = RowSerializer(InventoryLevelResponse, InventoryLevel.__table__)
+ALERT_ROWS = RowSerializer(InventoryAlertResponse, InventoryAlert.__table__)
+
+# Events sent to clients, with the watermark column that detects them
+EVENTS = {
+    "inventory_update": (LEVEL_ROWS, InventoryLevel.last_updated),
+    "alert_created": (ALERT_ROWS, InventoryAlert.created_at),
+}
+
+WATERMARK_INDEXES = (
+    Index("ix_inventory_levels_last_updated_id", InventoryLevel.last_updated, InventoryLevel.id),
+    Index("ix_inventory_alerts_created_at_id", InventoryAlert.created_at, InventoryAlert.id),
+)
+
+RESYNC = orjson.dumps({"event": "resync"})
+# Overflows after which a client is disconnected instead of resynced again
+MAX_OVERFLOWS = 3
+
+
+def encode_event(event: str, data) -> bytes:
+    return orjson.dumps({"event": event, "data": data}, option=ORJSON_OPTIONS)
+
+
+class Subscriber:
+    """One WebSocket client: its subscriptions and outgoing queue"""
+
+    def __init__(self, send: Callable, close: Callable, queue_size: int = settings.LIVE_UPDATES_QUEUE_SIZE):
+        self._send = send
+        self._close = close
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.plants: Set[str] = set()
+        self.materials: Set[str] = set()
+        self.everything = False
+        self.sent = 0
+        self.overflows = 0
+        self.closing = False
+
+    @property
+    def subscriptions(self) -> int:
+        return len(self.plants) + len(self.materials) + int(self.everything)
+
+    def offer(self, message: bytes) -> None:
+        """Queue a message without waiting; a full queue becomes a resync"""
+        if self.closing:
+            return
+        try:
+            self.queue.put_nowait(message)
+            return
+        except asyncio.QueueFull:
+            pass
+        self.overflows += 1
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if self.overflows > MAX_OVERFLOWS:
+            self.closing = True
+            logger.warning("Disconnecting slow live update client", overflows=self.overflows)
+            asyncio.get_running_loop().create_task(self._close(1013))
+        else:
+            self.queue.put_nowait(RESYNC)
+
+    async def run_sender(self) -> None:
+        """Send queued messages until cancelled; only this client waits on its socket"""
+        while True:
+            message = await self.queue.get()
+            try:
+                await asyncio.wait_for(self._send(message.decode()), settings.LIVE_UPDATES_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.closing = True
+                logger.warning("Live update send timed out")
+                await self._close(1013)
+                return
+            self.sent += 1
+
+
+class LiveHub:
+    """This worker's subscribers and the fan-out of change batches to them"""
+
+    def __init__(self):
+        self.subscribers: Set[Subscriber] = set()
+        self._by_plant: Dict[str, Set[Subscriber]] = {}
+        self._by_material: Dict[str, Set[Subscriber]] = {}
+        self._everything: Set[Subscriber] = set()
+        self.batches = 0
+        self.messages = 0
+        self.dispatch_seconds = 0.0
+
+    def add(self, subscriber: Subscriber) -> None:
+        self.subscribers.add(subscriber)
+
+    def remove(self, subscriber: Subscriber) -> None:
+        self.unsubscribe(subscriber, subscriber.plants, subscriber.materials, subscriber.everything)
+        self.subscribers.discard(subscriber)
+
+    def subscribe(self, subscriber: Subscriber, plants: Iterable[str], materials: Iterable[str], everything: bool) -> None:
+        for plant_id in plants:
+            subscriber.plants.add(plant_id)
+            self._by_plant.setdefault(plant_id, set()).add(subscriber)
+        for material_id in materials:
+            subscriber.materials.add(material_id)
+            self._by_material.setdefault(material_id, set()).add(subscriber)
+        if everything:
+            subscriber.everything = True
+            self._everything.add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber, plants: Iterable[str], materials: Iterable[str], everything: bool) -> None:
+        for key, index, subscribed in (
+            (plants, self._by_plant, subscriber.plants),
+            (materials, self._by_material, subscriber.materials)
+        ):
+            for value in list(key):
+                subscribed.discard(value)
+                members = index.get(value)
+                if members is not None:
+                    members.discard(subscriber)
+                    if not members:
+                        del index[value]
+        if everything:
+            subscriber.everything = False
+            self._everything.discard(subscriber)
+
+    def dispatch(self, event: str, rows: List[dict]) -> None:
+        """Queue the rows each subscriber asked for, encoding each distinct selection once"""
+        started = time.perf_counter()
+        by_plant: Dict[str, List[int]] = {}
+        by_material: Dict[str, List[int]] = {}
+        for position, row in enumerate(rows):
+            by_plant.setdefault(row["plant_id"], []).append(position)
+            by_material.setdefault(row["material_id"], []).append(position)
+
+        # Which plant and material keys of this batch each subscriber matches
+        matches: Dict[Subscriber, Tuple[Set[str], Set[str]]] = {}
+        for plant_id in by_plant.keys() & self._by_plant.keys():
+            for subscriber in self._by_plant[plant_id]:
+                matches.setdefault(subscriber, (set(), set()))[0].add(plant_id)
+        for material_id in by_material.keys() & self._by_material.keys():
+            for subscriber in self._by_material[material_id]:
+                matches.setdefault(subscriber, (set(), set()))[1].add(material_id)
+
+        encoded: Dict[Tuple[FrozenSet[str], FrozenSet[str]], bytes] = {}
+        if self._everything:
+            everything = encode_event(event, rows)
+            for subscriber in self._everything:
+                subscriber.offer(everything)
+        for subscriber, (plants, materials) in matches.items():
+            if subscriber.everything:
+                continue
+            selection = (frozenset(plants), frozenset(materials))
+            message = encoded.get(selection)
+            if message is None:
+                positions = set()
+                for plant_id in plants:
+                    positions.update(by_plant[plant_id])
+                for material_id in materials:
+                    positions.update(by_material[material_id])
+                message = encoded[selection] = encode_event(event, [rows[p] for p in sorted(positions)])
+            subscriber.offer(message)
+            self.messages += 1
+
+        self.messages += len(self._everything)
+        self.batches += 1
+        self.dispatch_seconds += time.perf_counter() - started
+
+    def deliver(self, payload: bytes) -> None:
+        """Dispatch a published change batch"""
+        batch = orjson.loads(payload)
+        self.dispatch(batch["event"], batch["data"])
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "plants": len(self._by_plant),
+            "materials": len(self._by_material),
+            "everything": len(self._everything),
+            "batches": self.batches,
+            "messages": self.messages,
+            "queued": sum(subscriber.queue.qsize() for subscriber in self.subscribers),
+            "overflows": sum(subscriber.overflows for subscriber in self.subscribers),
+            "dispatch_ms_per_batch": round(self.dispatch_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+        }
+
+
+class LocalBus:
+    """Delivers published batches to this worker only"""
+
+    mode = "in-process"
+
+    def __init__(self, deliver: Callable[[bytes], None]):
+        self._deliver = deliver
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, payload: bytes) -> None:
+        self._deliver(payload)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBus:
+    """Redis pub/sub between workers, delivering locally while Redis is unreachable"""
+
+    def __init__(self, url: str, deliver: Callable[[bytes], None], channel: str = CHANNEL):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self._client = redis.from_url(url)
+        self._errors = RedisError
+        self._deliver = deliver
+        self.channel = channel
+        self.connected = False
+        self._listener: Optional[asyncio.Task] = None
+
+    @property
+    def mode(self) -> str:
+        return "redis" if self.connected else "in-process (redis unavailable)"
+
+    async def start(self) -> None:
+        self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self._client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                self.connected = True
+                logger.info("Live updates subscribed to Redis", channel=self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        try:
+                            self._deliver(message["data"])
+                        except Exception as e:
+                            logger.error("Live update delivery failed", error=str(e))
+            except self._errors as e:
+                if self.connected:
+                    logger.warning("Live update channel lost", error=str(e))
+                self.connected = False
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+    async def publish(self, payload: bytes) -> None:
+        if self.connected:
+            try:
+                await self._client.publish(self.channel, payload)
+                return
+            except self._errors as e:
+                logger.warning("Live update publish failed", error=str(e))
+        self._deliver(payload)
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+        await self._client.aclose()
+
+
+class ChangeFeed:
+    """Polls the watermark columns and publishes changed rows"""
+
+    def __init__(
+        self,
+        publish: Callable,
+        engine: AsyncEngine = async_engine,
+        interval: float = settings.LIVE_UPDATES_POLL_INTERVAL,
+        overlap_seconds: float = settings.LIVE_UPDATES_OVERLAP,
+        batch_rows: int = settings.LIVE_UPDATES_BATCH_ROWS
+    ):
+        self._publish = publish
+        self.engine = engine
+        self.interval = interval
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.batch_rows = batch_rows
+        self.worker_id = f"{os.getpid()}-{id(self)}".encode()
+        self.leader = False
+        self.watermarks: Dict[str, Optional[datetime]] = {}
+        # Rows already published inside the overlap window, by id
+        self._seen: Dict[str, Dict[int, datetime]] = {event: {} for event in EVENTS}
+        # (timestamp, id) of the last row of a full batch, where the next poll resumes
+        self._resume: Dict[str, Optional[tuple]] = {}
+        self.published = 0
+
+    async def prepare(self) -> None:
+        async with self.engine.begin() as connection:
+            for index in WATERMARK_INDEXES:
+                await connection.run_sync(index.create, checkfirst=True)
+        # Start from the newest rows, so only changes after startup are sent
+        await self.follow()
+
+    async def follow(self) -> None:
+        """Move the watermarks to the newest rows without publishing them"""
+        async with self.engine.connect() as connection:
+            for event, (_, column) in EVENTS.items():
+                self.watermarks[event] = (await connection.execute(select(func.max(column)))).scalar()
+
+    async def _is_leader(self) -> bool:
+        backend = response_cache.backend
+        ttl = max(int(self.interval * 5), 5)
+        if await backend.add(LEADER_KEY, self.worker_id, ttl):
+            return True
+        if await backend.get(LEADER_KEY) == self.worker_id:
+            await backend.set(LEADER_KEY, self.worker_id, ttl)
+            return True
+        return False
+
+    async def poll(self) -> int:
+        """Publish rows changed since the watermarks; returns the number of rows"""
+        published = 0
+        async with self.engine.connect() as connection:
+            for event, (rows, column) in EVENTS.items():
+                published += await self._poll_event(connection, event, rows, column)
+        self.published += published
+        return published
+
+    async def _poll_event(self, connection, event: str, rows: RowSerializer, column) -> int:
+        """Publish up to batch_rows unsent rows of one event
+
+        Keys are scanned on the (timestamp, id) index and only rows not sent
+        yet are loaded, so re-reading the overlap window after a bulk update
+        skips its rows instead of spending each poll's batch on them.
+        """
+        watermark = self.watermarks.get(event)
+        row_id = column.class_.id
+        seen = self._seen[event]
+        keys = select(row_id, column).order_by(column, row_id).limit(self.batch_rows)
+        # The last poll published a full batch; carry on after its last row
+        position = self._resume.get(event)
+        published = 0
+        newest = None
+        while True:
+            query = keys
+            if position is not None:
+                query = query.where(tuple_(column, row_id) > tuple_(*position))
+            elif watermark is not None:
+                query = query.where(column > watermark - self.overlap)
+            batch = (await connection.execute(query)).all()
+            stamps = [at for _, at in batch if at is not None]
+            if stamps:
+                newest = max(newest, stamps[-1]) if newest else stamps[-1]
+
+            fresh = [key for key, at in batch if seen.get(key) != at]
+            if fresh:
+                result = await connection.execute(
+                    rows.select(select(column.class_).where(row_id.in_(fresh))).order_by(column, row_id)
+                )
+                records = result.all()
+                index = rows.fields.index(column.key)
+                for record in records:
+                    seen[record.id] = record[index]
+                if records:
+                    await self._publish(encode_event(event, rows.rows(records)))
+                    published += len(records)
+
+            if len(batch) < self.batch_rows or batch[-1][1] is None:
+                position = None
+                break
+            position = (batch[-1][1], batch[-1][0])
+            if published >= self.batch_rows:
+                break
+        self._resume[event] = position
+
+        if newest is not None:
+            # Forget rows that fell out of the overlap window
+            cutoff = newest - self.overlap
+            for expired in [key for key, at in seen.items() if at is None or at < cutoff]:
+                del seen[expired]
+            self.watermarks[event] = max(newest, watermark) if watermark else newest
+        return published
+
+    async def run(self) -> None:
+        prepared = False
+        while True:
+            started = time.monotonic()
+            try:
+                if not prepared:
+                    await self.prepare()
+                    prepared = True
+                leader = await self._is_leader()
+                if leader != self.leader:
+                    logger.info("Live update feed leadership changed", leader=leader)
+                    self.leader = leader
+                if leader:
+                    await self.poll()
+                else:
+                    # Another worker publishes; follow the newest rows so a takeover resumes near them
+                    await self.follow()
+            except Exception as e:
+                logger.error("Live update poll failed", error=str(e))
+            await asyncio.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+
+class LiveUpdates:
+    """Hub, bus and change feed of this worker, started with the first client"""
+
+    def __init__(self):
+        self.hub = LiveHub()
+        self.bus = None
+        self.feed: Optional[ChangeFeed] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._task is not None:
+                return
+            if settings.CACHE_BACKEND == "redis":
+                self.bus = RedisBus(settings.REDIS_URL, self.hub.deliver)
+            else:
+                self.bus = LocalBus(self.hub.deliver)
+            await self.bus.start()
+            self.feed = ChangeFeed(self.bus.publish)
+            self._task = asyncio.create_task(self.feed.run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.bus is not None:
+            await self.bus.close()
+            self.bus = None
+
+    def stats(self) -> Dict:
+        return {
+            "bus": self.bus.mode if self.bus else None,
+            "feed_leader": self.feed.leader if self.feed else False,
+            "rows_published": self.feed.published if self.feed else 0,
+            "watermarks": self.feed.watermarks if self.feed else {},
+            **self.hub.stats(),
+        }
+
+
+live_updates = LiveUpdates()
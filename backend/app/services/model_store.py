@@ -0,0 +1,215 @@
+"""
+Versioned storage for trained forecast models
+
+Models are written per partition (a plant, or "all" for the whole
+catalog) under settings.AI_MODEL_PATH:
+
+    forecast/<partition>/<version>/metadata.json
+    forecast/<partition>/<version>/params.npy
+    forecast/<partition>/<version>/index.npy
+    forecast/<partition>/LATEST
+
+params.npy holds one column per model parameter and one entry per
+series, and index.npy the sorted series keys. Both are opened with
+mmap_mode, so a version costs no memory until a series is looked up and
+every worker process shares the same pages through the OS page cache.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+# Partition used when training the whole catalog
+GLOBAL_PARTITION = "all"
+
+# Separates material_id and plant_id in packed index keys
+KEY_SEPARATOR = "\x1f"
+
+
+def partition_name(plant_id: Optional[str]) -> str:
+    """Filesystem-safe partition name for a plant"""
+    if not plant_id:
+        return GLOBAL_PARTITION
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", plant_id)
+
+
+def pack_key(material_id: str, plant_id: str) -> bytes:
+    return f"{material_id}{KEY_SEPARATOR}{plant_id}".encode()
+
+
+def _atomic_write(path: Path, data: str):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(data)
+    os.replace(tmp, path)
+
+
+def _columns(arrays: Dict[str, np.ndarray]) -> Tuple[List[str], List[np.ndarray]]:
+    """Flatten named parameter arrays into single columns"""
+    names, columns = [], []
+    for name, array in arrays.items():
+        array = np.asarray(array, dtype=np.float64)
+        if array.ndim == 1:
+            names.append(name)
+            columns.append(array)
+        else:
+            for i in range(array.shape[1]):
+                names.append(f"{name}:{i}")
+                columns.append(array[:, i])
+    return names, columns
+
+
+class ModelArtifact:
+    """A memory-mapped model version"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.metadata = json.loads((path / "metadata.json").read_text())
+        self.version = self.metadata["version"]
+        self._index = np.load(path / "index.npy", mmap_mode="r")
+        self._params = np.load(path / "params.npy", mmap_mode="r")
+
+        # Column positions of each named array, in write order
+        self._layout: Dict[str, List[int]] = {}
+        for position, column in enumerate(self.metadata["columns"]):
+            self._layout.setdefault(column.split(":")[0], []).append(position)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def row(self, material_id: str, plant_id: str) -> Optional[int]:
+        """Row of a series, found by binary search over the mapped index"""
+        key = pack_key(material_id, plant_id)
+        position = int(np.searchsorted(self._index, key))
+        if position < len(self._index) and self._index[position] == key:
+            return position
+        return None
+
+    def parameters(self, row: int) -> Dict[str, np.ndarray]:
+        """Copy the parameters of one series out of the mapped columns"""
+        values = np.array(self._params[:, row])
+        return {
+            name: values[positions] if len(positions) > 1 else values[positions[0]]
+            for name, positions in self._layout.items()
+        }
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return [tuple(key.decode().split(KEY_SEPARATOR, 1)) for key in self._index]
+
+
+class ModelStore:
+    """Read and write versioned per-series parameters
+
+    kind names the directory under the root, e.g. "forecast" for trained
+    forecast models or "optimization" for reorder policies.
+    """
+
+    def __init__(self, root: Optional[str] = None, kind: str = "forecast"):
+        self.root = Path(root or settings.AI_MODEL_PATH) / kind
+        self._artifacts: Dict[str, Tuple[int, ModelArtifact]] = {}
+        self._lock = threading.Lock()
+
+    def partition_path(self, partition: str) -> Path:
+        return self.root / partition
+
+    def save_version(
+        self,
+        partition: str,
+        keys: List[Tuple[str, str]],
+        arrays: Dict[str, np.ndarray],
+        metadata: Dict
+    ) -> str:
+        """Write a new model version and mark it as the latest"""
+        version = datetime.utcnow().strftime("v%Y%m%dT%H%M%S%f")
+        path = self.partition_path(partition) / version
+        path.mkdir(parents=True, exist_ok=False)
+
+        packed = np.array([pack_key(*key) for key in keys], dtype=bytes)
+        order = np.argsort(packed, kind="stable")
+        names, columns = _columns(arrays)
+        params = np.stack(columns)[:, order] if columns else np.empty((0, len(keys)))
+
+        np.save(path / "index.npy", packed[order])
+        np.save(path / "params.npy", np.ascontiguousarray(params))
+        _atomic_write(path / "metadata.json", json.dumps(
+            {
+                **metadata,
+                "version": version,
+                "partition": partition,
+                "series": len(keys),
+                "columns": names
+            },
+            default=str
+        ))
+        _atomic_write(self.partition_path(partition) / "LATEST", version)
+        return version
+
+    def latest_version(self, partition: str) -> Optional[str]:
+        latest = self.partition_path(partition) / "LATEST"
+        return latest.read_text().strip() if latest.exists() else None
+
+    def open_version(self, partition: str, version: Optional[str] = None) -> ModelArtifact:
+        """Map a version without caching it"""
+        version = version or self.latest_version(partition)
+        if version is None:
+            raise FileNotFoundError(f"No trained models for partition '{partition}'")
+        return ModelArtifact(self.partition_path(partition) / version)
+
+    def artifact(self, partition: str) -> Optional[ModelArtifact]:
+        """Latest version of a partition, mapped on first use
+
+        The mapping is reused until LATEST changes, so a retrain in any
+        worker is picked up by the others on their next lookup.
+        """
+        try:
+            stamp = (self.partition_path(partition) / "LATEST").stat().st_mtime_ns
+        except FileNotFoundError:
+            self._artifacts.pop(partition, None)
+            return None
+
+        cached = self._artifacts.get(partition)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with self._lock:
+            cached = self._artifacts.get(partition)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, self.open_version(partition))
+                self._artifacts[partition] = cached
+        return cached[1]
+
+    def lookup(
+        self,
+        material_id: str,
+        plant_id: str
+    ) -> Optional[Tuple[ModelArtifact, Dict[str, np.ndarray]]]:
+        """Trained parameters of a series from its plant or the global partition"""
+        for partition in (partition_name(plant_id), GLOBAL_PARTITION):
+            artifact = self.artifact(partition)
+            if artifact is None:
+                continue
+            row = artifact.row(material_id, plant_id)
+            if row is not None:
+                return artifact, artifact.parameters(row)
+        return None
+
+
+_model_store: Optional[ModelStore] = None
+
+
+def get_model_store() -> ModelStore:
+    """Process-wide model store; versions are mapped lazily"""
+    global _model_store
+    if _model_store is None:
+        _model_store = ModelStore()
+    return _model_store
@@ -0,0 +1,287 @@
+"""
+Monthly range partitioning of inventory_transactions
+
+On PostgreSQL the table is partitioned by transaction_date into one
+inventory_transactions_pYYYYMM partition per month, plus a default
+partition for rows outside them, so date-filtered queries only touch the
+months they ask for. Indexes are declared on the parent and built on
+every partition:
+
+- B-tree indexes ending in transaction_date DESC for the filter
+  combinations of GET /inventory/transactions, which then read a page in
+  date order without sorting
+- BRIN indexes on transaction_date and created_at for the range scans of
+  forecasting and the KPI rollups, at a few pages per partition
+
+Unique indexes on a partitioned table must include the partition column,
+so the primary key is (id, transaction_date) and the ERP upsert key ends
+in transaction_date.
+
+Usage:
+    cd backend && python -m app.services.transaction_partitions migrate
+    cd backend && python -m app.services.transaction_partitions create --months-ahead 3
+    cd backend && python -m app.services.transaction_partitions detach --older-than 36 [--drop]
+    cd backend && python -m app.services.transaction_partitions status
+"""
+
+import argparse
+import asyncio
+import json
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+
+import structlog
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.database import async_engine
+from app.services.erp_ingestion import TARGETS
+
+logger = structlog.get_logger()
+
+TABLE = "inventory_transactions"
+PARTITION_COLUMN = "transaction_date"
+DEFAULT_PARTITION = f"{TABLE}_default"
+LEGACY_TABLE = f"{TABLE}_unpartitioned"
+PARTITION_NAME = re.compile(rf"^{TABLE}_p(\d{{4}})(\d{{2}})$")
+
+# Indexes declared on the parent table, by name
+INDEXES = {
+    # No filter, date range or transaction type only
+    f"ix_{TABLE}_date": "(transaction_date DESC)",
+    f"ix_{TABLE}_plant_date": "(plant_id, transaction_date DESC)",
+    # Material alone spans few plants; material and plant reads in order
+    f"ix_{TABLE}_material_plant_date": "(material_id, plant_id, transaction_date DESC)",
+    f"ix_{TABLE}_plant_type_date": "(plant_id, transaction_type, transaction_date DESC)",
+    f"brin_{TABLE}_date": "USING brin (transaction_date) WITH (pages_per_range = 32)",
+    f"brin_{TABLE}_created_at": "USING brin (created_at) WITH (pages_per_range = 32)",
+}
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month:%Y%m}"
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _require_postgresql(connection: AsyncConnection) -> None:
+    if connection.dialect.name != "postgresql":
+        raise RuntimeError(f"Table partitioning needs PostgreSQL, not '{connection.dialect.name}'")
+
+
+async def is_partitioned(connection: AsyncConnection) -> bool:
+    result = await connection.execute(
+        text("SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:table)"), {"table": TABLE}
+    )
+    return result.scalar() == "p"
+
+
+async def list_partitions(connection: AsyncConnection) -> List[Dict]:
+    """Attached partitions with their month and estimated row count"""
+    result = await connection.execute(text(
+        "SELECT child.relname, child.reltuples, pg_total_relation_size(child.oid) "
+        "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:table) ORDER BY child.relname"
+    ), {"table": TABLE})
+    partitions = []
+    for name, rows, size in result:
+        match = PARTITION_NAME.match(name)
+        partitions.append({
+            "name": name,
+            "month": date(int(match.group(1)), int(match.group(2)), 1).isoformat() if match else None,
+            "estimated_rows": max(int(rows), 0),
+            "size_bytes": int(size)
+        })
+    return partitions
+
+
+async def create_partition(connection: AsyncConnection, month: date) -> bool:
+    """Attach the partition of a month; rows of that month in the default partition move into it"""
+    name = partition_name(month)
+    exists = await connection.execute(text("SELECT to_regclass(:name)"), {"name": name})
+    if exists.scalar() is not None:
+        return False
+
+    lower, upper = month_start(month), add_months(month, 1)
+    bounds = {"lower": datetime.combine(lower, datetime.min.time()), "upper": datetime.combine(upper, datetime.min.time())}
+    await connection.execute(text(f"CREATE TABLE {_quote(name)} (LIKE {_quote(TABLE)} INCLUDING DEFAULTS)"))
+    # The matching CHECK lets ATTACH skip its validation scan
+    await connection.execute(text(
+        f"ALTER TABLE {_quote(name)} ADD CONSTRAINT {_quote(name + '_bounds')} CHECK ("
+        f"{PARTITION_COLUMN} IS NOT NULL AND {PARTITION_COLUMN} >= '{bounds['lower']}' "
+        f"AND {PARTITION_COLUMN} < '{bounds['upper']}')"
+    ))
+    if (await connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION})).scalar():
+        await connection.execute(text(
+            f"WITH moved AS (DELETE FROM {_quote(DEFAULT_PARTITION)} "
+            f"WHERE {PARTITION_COLUMN} >= :lower AND {PARTITION_COLUMN} < :upper RETURNING *) "
+            f"INSERT INTO {_quote(name)} SELECT * FROM moved"
+        ), bounds)
+    await connection.execute(text(
+        f"ALTER TABLE {_quote(TABLE)} ATTACH PARTITION {_quote(name)} "
+        f"FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+    ))
+    await connection.execute(text(f"ALTER TABLE {_quote(name)} DROP CONSTRAINT {_quote(name + '_bounds')}"))
+    logger.info("Transaction partition created", partition=name)
+    return True
+
+
+async def ensure_partitions(
+    connection: AsyncConnection,
+    months_ahead: int = settings.TRANSACTION_PARTITION_MONTHS_AHEAD,
+    first_month: Optional[date] = None
+) -> List[str]:
+    """Create the partitions from first_month (default: this month) to months_ahead"""
+    _require_postgresql(connection)
+    current = month_start(datetime.utcnow().date())
+    month = month_start(first_month or current)
+    created = []
+    while month <= add_months(current, months_ahead):
+        if await create_partition(connection, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+async def detach_partitions(
+    connection: AsyncConnection,
+    older_than_months: int = settings.TRANSACTION_RETENTION_MONTHS,
+    drop: bool = False
+) -> List[str]:
+    """Detach (and optionally drop) the partitions of months before the retention window"""
+    _require_postgresql(connection)
+    cutoff = add_months(month_start(datetime.utcnow().date()), -older_than_months)
+    detached = []
+    for partition in await list_partitions(connection):
+        if partition["month"] is None or date.fromisoformat(partition["month"]) >= cutoff:
+            continue
+        name = _quote(partition["name"])
+        await connection.execute(text(f"ALTER TABLE {_quote(TABLE)} DETACH PARTITION {name}"))
+        if drop:
+            await connection.execute(text(f"DROP TABLE {name}"))
+        detached.append(partition["name"])
+        logger.info("Transaction partition detached", partition=partition["name"], dropped=drop)
+    return detached
+
+
+async def ensure_indexes(connection: AsyncConnection) -> None:
+    """Create the filter and BRIN indexes on the parent table"""
+    for name, definition in INDEXES.items():
+        await connection.execute(text(f"CREATE INDEX IF NOT EXISTS {_quote(name)} ON {_quote(TABLE)} {definition}"))
+
+
+async def partition_table(
+    connection: AsyncConnection,
+    months_ahead: int = settings.TRANSACTION_PARTITION_MONTHS_AHEAD,
+    keep_legacy: bool = False
+) -> Dict:
+    """Convert inventory_transactions into a partitioned table in place
+
+    The existing rows are copied into monthly partitions; rows without a
+    transaction_date take their created_at. With keep_legacy the old table
+    stays behind as inventory_transactions_unpartitioned.
+    """
+    _require_postgresql(connection)
+    if await is_partitioned(connection):
+        return {"migrated": False, "partitions": len(await list_partitions(connection))}
+
+    sequence = (await connection.execute(
+        text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": TABLE}
+    )).scalar()
+    await connection.execute(text(f"ALTER TABLE {_quote(TABLE)} RENAME TO {_quote(LEGACY_TABLE)}"))
+    # Index names are per schema; free them for the new table
+    legacy_indexes = await connection.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :table"), {"table": LEGACY_TABLE}
+    )
+    for index_name in legacy_indexes.scalars().all():
+        await connection.execute(text(
+            f"ALTER INDEX {_quote(index_name)} RENAME TO {_quote(index_name[:49] + '_unpartitioned')}"
+        ))
+
+    await connection.execute(text(
+        f"CREATE TABLE {_quote(TABLE)} (LIKE {_quote(LEGACY_TABLE)} INCLUDING DEFAULTS) "
+        f"PARTITION BY RANGE ({PARTITION_COLUMN})"
+    ))
+    await connection.execute(text(f"CREATE TABLE {_quote(DEFAULT_PARTITION)} PARTITION OF {_quote(TABLE)} DEFAULT"))
+
+    first, = (await connection.execute(text(f"SELECT min({PARTITION_COLUMN}) FROM {_quote(LEGACY_TABLE)}"))).one()
+    created = await ensure_partitions(connection, months_ahead, first.date() if first else None)
+
+    columns = (await connection.execute(text(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = :table ORDER BY ordinal_position"
+    ), {"table": LEGACY_TABLE})).scalars().all()
+    names = ", ".join(_quote(column) for column in columns)
+    values = ", ".join(
+        f"COALESCE({PARTITION_COLUMN}, created_at, timezone('utc', now()))" if column == PARTITION_COLUMN
+        else _quote(column)
+        for column in columns
+    )
+    copied = await connection.execute(
+        text(f"INSERT INTO {_quote(TABLE)} ({names}) SELECT {values} FROM {_quote(LEGACY_TABLE)}")
+    )
+
+    await connection.execute(text(f"ALTER TABLE {_quote(TABLE)} ADD PRIMARY KEY (id, {PARTITION_COLUMN})"))
+    target = TARGETS[TABLE]
+    await connection.execute(text(
+        f"CREATE UNIQUE INDEX {_quote(target.index_name)} ON {_quote(TABLE)} "
+        f"({', '.join(_quote(column) for column in target.key)})"
+    ))
+    await ensure_indexes(connection)
+    if sequence:
+        await connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {_quote(TABLE)}.id"))
+    if not keep_legacy:
+        await connection.execute(text(f"DROP TABLE {_quote(LEGACY_TABLE)}"))
+
+    summary = {"migrated": True, "rows": copied.rowcount, "partitions": len(created) + 1, "kept_legacy": keep_legacy}
+    logger.info("inventory_transactions partitioned", **summary)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the monthly partitions of inventory_transactions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate = commands.add_parser("migrate", help="Convert the table into a partitioned table")
+    migrate.add_argument("--months-ahead", type=int, default=settings.TRANSACTION_PARTITION_MONTHS_AHEAD)
+    migrate.add_argument("--keep-legacy", action="store_true", help=f"Keep the old table as {LEGACY_TABLE}")
+    create = commands.add_parser("create", help="Create the partitions of the coming months")
+    create.add_argument("--months-ahead", type=int, default=settings.TRANSACTION_PARTITION_MONTHS_AHEAD)
+    detach = commands.add_parser("detach", help="Detach the partitions past the retention window")
+    detach.add_argument("--older-than", type=int, default=settings.TRANSACTION_RETENTION_MONTHS, help="Months to keep")
+    detach.add_argument("--drop", action="store_true", help="Drop detached partitions instead of keeping them as tables")
+    commands.add_parser("status", help="List the partitions")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            async with async_engine.begin() as connection:
+                _require_postgresql(connection)
+                if args.command == "migrate":
+                    return await partition_table(connection, args.months_ahead, args.keep_legacy)
+                if not await is_partitioned(connection):
+                    raise SystemExit(f"{TABLE} is not partitioned; run the migrate command first")
+                if args.command == "create":
+                    return {"created": await ensure_partitions(connection, args.months_ahead)}
+                if args.command == "detach":
+                    return {"detached": await detach_partitions(connection, args.older_than, args.drop)}
+                return {"partitions": await list_partitions(connection)}
+        finally:
+            await async_engine.dispose()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
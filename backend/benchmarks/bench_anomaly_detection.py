@@ -0,0 +1,198 @@
+"""
+Benchmark: streaming anomaly detection over inventory transactions
+
+Scores synthetic movements with SeriesStats two ways, one event at a time
+as they would stream in and as one vectorized batch, checks both give the
+same scores, and reports events per second. Then seeds inventory_levels
+and inventory_transactions, runs a full rescore, adds a burst of new
+transactions with injected quantity spikes and over-issues, and times the
+incremental refresh, the share of injected anomalies it flagged and the
+latency of the anomaly endpoint's read. The target database comes from
+DATABASE_URL.
+
+Usage:
+    cd backend && python -m benchmarks.bench_anomaly_detection --plants 20 --materials 2000 --transactions 1000000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+
+from app.core.database import AsyncSessionLocal, Base, async_engine
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.services.anomaly_detection import (
+    ANOMALY_TABLES, AnomalyDetector, AnomalyService, SeriesStats, inventory_anomalies
+)
+
+
+def synthetic_events(rng, series: int, events: int):
+    codes = rng.integers(0, series, events)
+    signed = rng.gamma(4.0, 10.0, events) * np.where(rng.random(events) < 0.6, -1.0, 1.0)
+    at = np.sort(rng.uniform(0, 90 * 86_400, events))
+    return codes, signed, at
+
+
+def engine_throughput(args, rng):
+    codes, signed, at = synthetic_events(rng, args.series, args.events)
+
+    stats = SeriesStats()
+    for code in range(args.series):
+        stats.code(("PLANT", str(code)))
+    started = time.perf_counter()
+    batch = stats.observe(codes, signed, at)
+    batch_seconds = time.perf_counter() - started
+
+    streamed = min(args.events, args.stream_events)
+    stats = SeriesStats()
+    for code in range(args.series):
+        stats.code(("PLANT", str(code)))
+    size_z = np.zeros(streamed)
+    started = time.perf_counter()
+    for i in range(streamed):
+        size_z[i] = stats.observe(codes[i:i + 1], signed[i:i + 1], at[i:i + 1]).size_z[0]
+    stream_seconds = time.perf_counter() - started
+
+    print(f"engine, {args.events:,} events over {args.series:,} series")
+    print(f"  one event at a time    {streamed / stream_seconds:>12,.0f} events/s  "
+          f"({stream_seconds / streamed * 1e6:.1f} us per event)")
+    print(f"  vectorized batch       {args.events / batch_seconds:>12,.0f} events/s")
+    print(f"  identical scores       {np.allclose(size_z, batch.size_z[:streamed])}")
+
+
+def transaction_rows(rng, plants: int, materials: int, count: int, max_age_days: float, created_now: bool = False):
+    """Transactions recorded when they happened, or all just now"""
+    now = datetime.utcnow()
+    plant_ids = rng.integers(0, plants, count)
+    material_ids = rng.integers(0, materials, count)
+    ages = np.sort(rng.uniform(0, max_age_days * 86_400, count))[::-1]
+    quantities = rng.integers(1, 100, count)
+    issues = rng.random(count) < 0.5
+    return [
+        {
+            "material_id": f"MAT{material_ids[i]:06d}",
+            "plant_id": f"PLANT{plant_ids[i]:03d}",
+            "transaction_type": "OUT" if issues[i] else "IN",
+            "quantity": float(quantities[i]),
+            "unit_of_measure": "PCS",
+            "erp_system": "SAP",
+            "transaction_date": now - timedelta(seconds=float(ages[i])),
+            "created_at": now if created_now else now - timedelta(seconds=float(ages[i])),
+        }
+        for i in range(count)
+    ]
+
+
+async def seed(args, rng):
+    tables = [InventoryLevel.__table__, InventoryTransaction.__table__, *ANOMALY_TABLES]
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all, tables=tables)
+        for table in tables:
+            await connection.execute(delete(table))
+        await connection.execute(insert(InventoryLevel), [
+            {
+                "material_id": f"MAT{m:06d}",
+                "plant_id": f"PLANT{p:03d}",
+                "storage_location": "WH-A1",
+                "available_quantity": 100_000.0,
+                "reserved_quantity": 0.0,
+                "total_quantity": 100_000.0,
+                "erp_system": "SAP",
+            }
+            for p in range(args.plants) for m in range(args.materials)
+        ])
+        for offset in range(0, args.transactions, 50_000):
+            count = min(50_000, args.transactions - offset)
+            await connection.execute(
+                insert(InventoryTransaction), transaction_rows(rng, args.plants, args.materials, count, 85)
+            )
+
+
+async def detection(args, rng):
+    started = time.perf_counter()
+    await seed(args, rng)
+    print(
+        f"\nseeded {args.plants} plants x {args.materials:,} materials, "
+        f"{args.transactions:,} transactions in {time.perf_counter() - started:.1f} s"
+    )
+
+    # Without an overlap only the new transactions are re-read
+    detector = AnomalyDetector(overlap_seconds=args.overlap)
+    rescored = await detector.rescore()
+    print(
+        f"rescore: {rescored['transactions']:,} transactions, {rescored['series']:,} series, "
+        f"{rescored['anomalies']:,} anomalies in {rescored['elapsed_seconds']:.2f} s"
+    )
+
+    # New activity, with spikes of 50x the usual movement and issues beyond the stock
+    delta = transaction_rows(rng, args.plants, args.materials, args.delta, 0.01, created_now=True)
+    spikes = rng.choice(len(delta), args.injected, replace=False)
+    for position in spikes[: args.injected // 2]:
+        delta[position]["quantity"] = 2_500.0
+    for position in spikes[args.injected // 2:]:
+        delta[position].update(transaction_type="OUT", quantity=250_000.0)
+    async with async_engine.begin() as connection:
+        last_id = (await connection.execute(select(func.max(InventoryTransaction.id)))).scalar() or 0
+        await connection.execute(insert(InventoryTransaction), delta)
+        injected = {
+            (delta[position]["plant_id"], delta[position]["material_id"], delta[position]["quantity"])
+            for position in spikes
+        }
+
+    refreshed = await detector.refresh()
+    print(
+        f"refresh: {refreshed['transactions']:,} new transactions, {refreshed['anomalies']:,} anomalies "
+        f"in {refreshed['elapsed_seconds']:.3f} s "
+        f"({refreshed['transactions'] / max(refreshed['elapsed_seconds'], 1e-9):,.0f} transactions/s)"
+    )
+    async with async_engine.connect() as connection:
+        flagged = {
+            (row.plant_id, row.material_id, abs(row.quantity))
+            for row in await connection.execute(
+                select(inventory_anomalies).where(
+                    inventory_anomalies.c.transaction_id > last_id
+                )
+            )
+        }
+    print(f"injected anomalies flagged: {len(injected & flagged)} of {len(injected)}")
+
+    timings = []
+    for _ in range(args.repeats):
+        async with AsyncSessionLocal() as session:
+            started = time.perf_counter()
+            await AnomalyService(session).get_anomalies("PLANT000", None, 30, 100)
+            timings.append(time.perf_counter() - started)
+    print(f"anomaly read, one plant (median of {args.repeats}): {statistics.median(timings) * 1000:.1f} ms")
+    await async_engine.dispose()
+
+
+async def run(args):
+    rng = np.random.default_rng(42)
+    engine_throughput(args, rng)
+    if not args.engine_only:
+        await detection(args, rng)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=500_000, help="Series for the engine benchmark")
+    parser.add_argument("--events", type=int, default=5_000_000, help="Events for the engine benchmark")
+    parser.add_argument("--stream-events", type=int, default=100_000, help="Events scored one at a time")
+    parser.add_argument("--engine-only", action="store_true", help="Skip the database part")
+    parser.add_argument("--plants", type=int, default=20)
+    parser.add_argument("--materials", type=int, default=2_000, help="Materials per plant")
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--delta", type=int, default=5_000, help="Transactions added before the refresh")
+    parser.add_argument("--injected", type=int, default=100, help="Anomalies injected into the delta")
+    parser.add_argument("--overlap", type=int, default=0, help="Seconds re-read before each watermark")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Benchmark: sync session in async handler vs AsyncSession under concurrency
+
+Serves the inventory KPI query through two otherwise identical routes,
+one using the legacy blocking `get_db` session and one using
+`get_db_async`, and reports p50/p99 latency with many concurrent clients.
+The routes run in a single-worker uvicorn subprocess. A probe client hits a
+route that does no database work at the same time, showing how much a
+blocking query stalls unrelated requests on the worker.
+
+Usage:
+    cd backend && python -m benchmarks.bench_async_concurrency --clients 200
+
+Set DATABASE_URL to benchmark against PostgreSQL; otherwise a temporary
+SQLite database is created and populated.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_tmpdir = None
+if "DATABASE_URL" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.database import Base, SessionLocal, engine, get_db, get_db_async
+from app.models.inventory import InventoryLevel, StockType
+from app.services.inventory_aggregation import InventoryAggregationService, build_kpi_query
+
+
+def populate(rows: int, batch_size: int = 50_000):
+    """Insert synthetic inventory level rows into a fresh database"""
+    Base.metadata.create_all(engine, tables=[InventoryLevel.__table__])
+    stock_types = list(StockType)
+    rng = random.Random(42)
+    with SessionLocal() as session:
+        for offset in range(0, rows, batch_size):
+            session.execute(insert(InventoryLevel), [
+                {
+                    "material_id": f"MAT{i % 50_000:06d}",
+                    "plant_id": f"PLANT{i % 20:03d}",
+                    "stock_type": stock_types[i % len(stock_types)],
+                    "available_quantity": rng.uniform(0, 2000),
+                    "reserved_quantity": 0.0,
+                    "total_quantity": rng.uniform(0, 2000),
+                    "unit_of_measure": "PCS",
+                    "erp_system": "SAP",
+                }
+                for i in range(offset, min(offset + batch_size, rows))
+            ])
+        session.commit()
+
+
+def create_benchmark_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/sync/kpis")
+    async def sync_kpis(db: Session = Depends(get_db)):
+        # Legacy pattern: blocking query inside an async handler
+        return dict(db.execute(build_kpi_query()).one()._mapping)
+
+    @app.get("/async/kpis")
+    async def async_kpis(db: AsyncSession = Depends(get_db_async)):
+        return await InventoryAggregationService(db).get_kpis()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+app = create_benchmark_app()
+
+
+def start_server() -> tuple:
+    """Start the benchmark app in a single-worker uvicorn subprocess"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.bench_async_concurrency:app",
+         "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/ping").raise_for_status()
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Benchmark server did not start")
+
+
+async def run_load(base_url: str, path: str, clients: int, requests_per_client: int):
+    """Fire requests from concurrent clients and collect latencies"""
+    latencies = []
+    probe_latencies = []
+    limits = httpx.Limits(max_connections=clients + 1)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        async def timed_get(url, into):
+            started = time.perf_counter()
+            response = await client.get(url)
+            into.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+        async def worker():
+            for _ in range(requests_per_client):
+                await timed_get(path, latencies)
+
+        async def probe(done: asyncio.Event):
+            while not done.is_set():
+                await timed_get("/ping", probe_latencies)
+                await asyncio.sleep(0.01)
+
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(done))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    return latencies, probe_latencies, elapsed
+
+
+def percentiles(latencies):
+    if len(latencies) < 2:
+        return latencies[0], latencies[0]
+    quantiles = statistics.quantiles(latencies, n=100)
+    return quantiles[49], quantiles[98]
+
+
+def report(label: str, latencies, probe_latencies, elapsed: float):
+    p50, p99 = percentiles(latencies)
+    probe_p50, probe_p99 = percentiles(probe_latencies)
+    print(
+        f"{label:<8} kpis p50={p50 * 1000:>9.1f} ms p99={p99 * 1000:>9.1f} ms  "
+        f"ping p50={probe_p50 * 1000:>9.1f} ms p99={probe_p99 * 1000:>9.1f} ms  "
+        f"throughput={len(latencies) / elapsed:>8.1f} req/s"
+    )
+
+
+async def main_async(args, base_url: str):
+    # Warm up both pools before measuring
+    await run_load(base_url, "/sync/kpis", 1, 1)
+    await run_load(base_url, "/async/kpis", 1, 1)
+
+    print(f"{args.clients} concurrent clients x {args.requests} requests")
+    report("before", *await run_load(base_url, "/sync/kpis", args.clients, args.requests))
+    report("after", *await run_load(base_url, "/async/kpis", args.clients, args.requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5, help="Requests per client")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows to create in the temporary database")
+    args = parser.parse_args()
+
+    if _tmpdir is not None:
+        print(f"Populating {args.rows:,} inventory_levels rows...")
+        populate(args.rows)
+
+    engine.dispose()
+
+    process, base_url = start_server()
+    try:
+        asyncio.run(main_async(args, base_url))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Benchmark: per-request authentication overhead
+
+Serves a route that does nothing but depend on get_current_user and drives
+it in-process through httpx, the way a dashboard page fires a burst of
+parallel API calls with one bearer token. Compares the former dependency
+(jwt.decode plus no user lookup on every request), the cached dependency
+with the user lookup disabled, cold and warm, and the full dependency with
+the database user lookup. A route without authentication gives the
+baseline cost of the framework itself; overhead is reported on top of it.
+
+Usage:
+    cd backend && python -m benchmarks.bench_auth --requests 5000 --parallel 12
+
+Set DATABASE_URL to look users up in PostgreSQL; otherwise a temporary
+SQLite database is created with the users table.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmpdir = None
+if "DATABASE_URL" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import delete, insert
+
+from app.core import security as auth
+from app.core.database import async_engine
+from app.models.users import User
+
+
+async def legacy_current_user(credentials: HTTPAuthorizationCredentials = Depends(auth.security)):
+    """get_current_user as it was: every request decodes the token"""
+    payload = auth.verify_token(credentials.credentials)
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    return {"user_id": payload["sub"], "token_data": payload}
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/open")
+    async def open_route():
+        return {"ok": True}
+
+    @app.get("/legacy")
+    async def legacy_route(current_user: dict = Depends(legacy_current_user)):
+        return {"user": current_user["user_id"]}
+
+    @app.get("/cached")
+    async def cached_route(current_user: dict = Depends(auth.get_current_user)):
+        return {"user": current_user["user_id"]}
+
+    return app
+
+
+async def seed_users(count: int):
+    async with async_engine.begin() as connection:
+        await connection.run_sync(User.__table__.create, checkfirst=True)
+        await connection.execute(delete(User).where(User.username.like("bench-%")))
+        await connection.execute(insert(User), [
+            {
+                "username": f"bench-{i}", "email": f"bench-{i}@example.com", "full_name": f"Bench {i}",
+                "hashed_password": "-", "role": "manager", "is_active": True,
+            }
+            for i in range(count)
+        ])
+
+
+async def drive(client, path: str, tokens, requests: int, parallel: int):
+    """Issue requests in bursts of `parallel`, one token per burst; returns per-request seconds"""
+    timings = []
+    for burst in range(requests // parallel):
+        headers = {"Authorization": f"Bearer {tokens[burst % len(tokens)]}"}
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.get(path, headers=headers) for _ in range(parallel)))
+        timings.append((time.perf_counter() - started) / parallel)
+        assert all(response.status_code == 200 for response in responses), responses[0].text
+    return timings
+
+
+def reset_caches(lookup_users: bool):
+    auth.token_cache._entries.clear()
+    auth.user_cache.invalidate()
+    auth.user_cache._loader = auth.load_user if lookup_users else _no_user
+
+
+async def _no_user(username: str):
+    # Stands in for the lookup without touching the database
+    return {"role": "manager", "is_active": True, "full_name": username}
+
+
+async def run(args):
+    await seed_users(args.users)
+    tokens = [auth.create_access_token({"sub": f"bench-{i}"}) for i in range(args.users)]
+    transport = httpx.ASGITransport(app=build_app())
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await drive(client, "/open", tokens, args.parallel * 10, args.parallel)
+
+        async def case(label: str, path: str, lookup_users: bool = False, warm: bool = False):
+            reset_caches(lookup_users)
+            if warm:
+                await drive(client, path, tokens, len(tokens) * args.parallel, args.parallel)
+            timings = await drive(client, path, tokens, args.requests, args.parallel)
+            results.append((label, statistics.median(timings), statistics.quantiles(timings, n=100)[98]))
+
+        await case("no auth (baseline)", "/open")
+        await case("decode every request (before)", "/legacy")
+        # Each burst uses a fresh token: one decode per burst, shared by the parallel requests
+        fresh = [auth.create_access_token({"sub": f"bench-{i % args.users}", "n": i})
+                 for i in range(args.requests // args.parallel)]
+        tokens, warm_tokens = fresh, tokens
+        await case("token cache, cold tokens", "/cached")
+        tokens = warm_tokens
+        await case("token cache, warm", "/cached", warm=True)
+        await case("token cache + user lookup, warm", "/cached", lookup_users=True, warm=True)
+        reset_caches(True)
+        auth.user_cache.ttl = 0
+        timings = await drive(client, "/cached", tokens, args.requests, args.parallel)
+        results.append((
+            "token cache + uncached user lookup", statistics.median(timings), statistics.quantiles(timings, n=100)[98]
+        ))
+    await async_engine.dispose()
+
+    baseline = results[0][1]
+    print(
+        f"{args.requests:,} requests in bursts of {args.parallel}, {args.users} users, "
+        f"{async_engine.dialect.name} user lookups"
+    )
+    print(f"\n{'dependency':<36} {'p50 us/req':>11} {'p99 us/req':>11} {'auth overhead us':>17}")
+    for label, median, p99 in results:
+        print(f"{label:<36} {median * 1e6:>11.1f} {p99 * 1e6:>11.1f} {(median - baseline) * 1e6:>17.1f}")
+    print(f"\ntoken cache: {auth.token_cache.stats()}  user cache: {auth.user_cache.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--parallel", type=int, default=12, help="Concurrent requests per page load")
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmark: columnar export vs JSON list endpoints
+
+Pulls every inventory level and transaction through the API in-process:
+JSON keyset pages from /inventory/levels, the NDJSON stream, one large
+/inventory/transactions response, and the Arrow IPC and Parquet exports.
+For each, reports the response size, server throughput in MB/s and rows/s
+and the client's time to parse the body into columns. A separate untimed
+run of each levels export reports the server's peak Python heap and Arrow
+memory. The benchmark also checks that the exported columns carry the
+response schemas' types and every row.
+
+Usage:
+    cd backend && python -m benchmarks.bench_columnar_export --rows 500000
+
+Set DATABASE_URL to benchmark against PostgreSQL; otherwise a temporary
+SQLite database is created and populated.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+_tmpdir = None
+if "DATABASE_URL" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+import httpx
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.core.database import async_engine
+from app.schemas.inventory import InventoryLevelResponse, InventoryTransactionResponse
+from app.api.v1.endpoints.inventory import LEVEL_KEYSET, LEVEL_ROWS, build_levels_query
+from app.core.serialization import RowSerializer
+from app.services.columnar_export import EXPORT_BATCH_SIZE, arrow_schema, export_batches
+from benchmarks.bench_serialization import current_app, populate
+
+
+async def fetch_json_pages(client, page_size: int):
+    body_bytes, pages, cursor = 0, [], None
+    while True:
+        params = {"page_size": page_size, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/inventory/levels", params=params)
+        response.raise_for_status()
+        body_bytes += len(response.content)
+        pages.append(response.content)
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            return body_bytes, pages
+
+
+def parse_json_pages(pages):
+    return sum(len(json.loads(page)["items"]) for page in pages)
+
+
+def parse_ndjson(body: bytes):
+    return len([json.loads(line) for line in body.splitlines()])
+
+
+def parse_json_list(body: bytes):
+    return len(json.loads(body))
+
+
+def parse_arrow(body: bytes):
+    return pa.ipc.open_stream(body).read_all()
+
+
+def parse_parquet(body: bytes):
+    return pq.read_table(io.BytesIO(body))
+
+
+async def fetch(client, path: str, params: dict):
+    if path == "pages":
+        return await fetch_json_pages(client, params["page_size"])
+    response = await client.get(path, params=params)
+    response.raise_for_status()
+    return len(response.content), response.content
+
+
+async def measure(client, label: str, path: str, params: dict, parse, rows: int, results: list):
+    started = time.perf_counter()
+    size, body = await fetch(client, path, params)
+    elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parsed = parse(body)
+    parse_seconds = time.perf_counter() - started
+    count = parsed if isinstance(parsed, int) else parsed.num_rows
+    assert count == rows, f"{label}: {count} rows, expected {rows}"
+    results.append((label, size, elapsed, parse_seconds, rows))
+    return parsed
+
+
+async def export_memory(query, rows: RowSerializer, export_format: str):
+    """Peak Python heap and Arrow pool growth of an export, its chunks discarded as they are produced"""
+    pool = pa.default_memory_pool()
+    arrow_before = pool.max_memory()
+    # Tracing slows Python down several times, so this run is not timed
+    tracemalloc.start()
+    async for _ in export_batches(query, rows, export_format):
+        pass
+    _, heap_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return heap_peak, pool.max_memory() - arrow_before
+
+
+async def run(args):
+    if _tmpdir is not None:
+        print(f"Populating {args.rows:,} inventory levels and transactions...")
+        await populate(args.rows)
+
+    results = []
+    transport = httpx.ASGITransport(app=current_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await measure(client, "levels JSON pages", "pages", {"page_size": 5000}, parse_json_pages, args.rows, results)
+        await measure(
+            client, "levels NDJSON stream", "/inventory/levels", {"stream": True}, parse_ndjson, args.rows, results
+        )
+        for export_format, parse in (("arrow", parse_arrow), ("parquet", parse_parquet)):
+            table = await measure(
+                client, f"levels {export_format}", "/inventory/levels/export",
+                {"format": export_format}, parse, args.rows, results
+            )
+            assert table.schema.equals(arrow_schema(InventoryLevelResponse)), table.schema
+        await measure(
+            client, "transactions JSON", "/inventory/transactions", {"limit": args.rows}, parse_json_list, args.rows, results
+        )
+        for export_format, parse in (("arrow", parse_arrow), ("parquet", parse_parquet)):
+            table = await measure(
+                client, f"transactions {export_format}", "/inventory/transactions/export",
+                {"format": export_format}, parse, args.rows, results
+            )
+            assert table.schema.equals(arrow_schema(InventoryTransactionResponse)), table.schema
+
+    memory = {}
+    for export_format in ("arrow", "parquet"):
+        memory[export_format] = await export_memory(
+            build_levels_query().order_by(*LEVEL_KEYSET), LEVEL_ROWS, export_format
+        )
+    await async_engine.dispose()
+
+    print(f"\n{args.rows:,} rows per table, served in-process")
+    print(f"{'export':<22} {'size MB':>9} {'server s':>9} {'MB/s':>8} {'rows/s':>11} {'parse s':>8}")
+    for label, size, elapsed, parse_seconds, rows in results:
+        print(
+            f"{label:<22} {size / 1e6:>9.1f} {elapsed:>9.2f} {size / 1e6 / elapsed:>8.1f} {rows / elapsed:>11,.0f}"
+            f" {parse_seconds:>8.2f}"
+        )
+    print(f"\nserver memory of a full levels export, batches of {EXPORT_BATCH_SIZE:,} rows")
+    for export_format, (heap_peak, arrow_peak) in memory.items():
+        print(f"  {export_format:<8} python heap peak {heap_peak / 1e6:>7.1f} MB   arrow pool peak +{arrow_peak / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000, help="Rows to create in the temporary database")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
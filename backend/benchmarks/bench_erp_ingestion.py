@@ -0,0 +1,108 @@
+"""
+Benchmark: bulk ERP ingestion throughput
+
+Writes a synthetic SAP material document extract and loads it into
+inventory_transactions through the COPY + upsert pipeline, then loads
+it again (every row unchanged) and compares both against row-by-row
+INSERT statements like the ones in database/init.sql. Needs PostgreSQL;
+the target database comes from DATABASE_URL.
+
+Usage:
+    cd backend && python -m benchmarks.bench_erp_ingestion --rows 2000000
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.database import Base, async_engine
+from app.models.inventory import InventoryTransaction
+from app.services.erp_ingestion import BulkLoader, ingest_file
+
+
+def write_extract(path: str, rows: int, seed: int = 42):
+    """SAP MATDOC-style extract with unique document lines"""
+    rng = np.random.default_rng(seed)
+    start = date.today() - timedelta(days=365)
+    materials = rng.integers(100_000, 150_000, rows)
+    plants = rng.integers(1000, 1020, rows)
+    quantities = rng.integers(1, 500, rows)
+    days = rng.integers(0, 365, rows)
+    with open(path, "w", newline="") as extract:
+        writer = csv.writer(extract)
+        writer.writerow(["MJAHR", "MBLNR", "ZEILE", "MATNR", "WERKS", "MENGE", "MEINS", "SHKZG", "BWART", "BUDAT"])
+        for i in range(rows):
+            issue = quantities[i] % 3 != 0
+            writer.writerow([
+                2026, 4_900_000_000 + i // 10, f"{i % 10 + 1:04d}", f"{materials[i]:018d}", plants[i],
+                quantities[i], "PC", "H" if issue else "S", "261" if issue else "101",
+                (start + timedelta(days=int(days[i]))).strftime("%Y%m%d")
+            ])
+
+
+async def row_by_row(rows: int) -> float:
+    """Baseline: one INSERT statement per transaction"""
+    async with async_engine.connect() as connection:
+        raw = await connection.get_raw_connection()
+        driver = raw.driver_connection
+        started = time.perf_counter()
+        async with driver.transaction():
+            for i in range(rows):
+                await driver.execute(
+                    "INSERT INTO inventory_transactions (material_id, plant_id, transaction_type, quantity, "
+                    "unit_of_measure, reference_document, reference_number, erp_system, transaction_date) "
+                    "VALUES ($1, $2, 'OUT', $3, 'PC', 'SO', $4, 'BENCH', now())",
+                    f"MAT{i:06d}", "PLANT001", float(i % 100), f"SO-{i}"
+                )
+        elapsed = time.perf_counter() - started
+        await driver.execute("DELETE FROM inventory_transactions WHERE erp_system = 'BENCH'")
+    return rows / elapsed
+
+
+async def run(args, path):
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all, tables=[InventoryTransaction.__table__])
+        if args.truncate:
+            await connection.exec_driver_sql("TRUNCATE inventory_transactions")
+
+    loader = BulkLoader()
+    first = await ingest_file(path, "inventory_transactions", "SAP", args.chunk_rows, loader)
+    again = await ingest_file(path, "inventory_transactions", "SAP", args.chunk_rows, loader)
+    baseline = await row_by_row(args.baseline_rows)
+    await async_engine.dispose()
+
+    print(f"{args.rows:,} transactions, {args.chunk_rows:,} rows per chunk")
+    print(f"row-by-row INSERT: {baseline:>12,.0f} rows/s")
+    for name, report in (("initial load", first), ("re-load", again)):
+        print(
+            f"{name + ':':<18} {report.rows_per_second:>12,.0f} rows/s "
+            f"({report.rows_per_second * 60 / 1e6:.1f}M rows/min, {report.rows_upserted:,} rows written)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=settings.INGESTION_CHUNK_ROWS)
+    parser.add_argument("--baseline-rows", type=int, default=20_000)
+    parser.add_argument("--truncate", action="store_true", help="Empty inventory_transactions first")
+    args = parser.parse_args()
+
+    if async_engine.dialect.name != "postgresql":
+        parser.error("DATABASE_URL must point at PostgreSQL")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "matdoc.csv")
+        write_extract(path, args.rows)
+        asyncio.run(run(args, path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark: incremental ERP delta sync
+
+Runs ERPSyncEngine against local SAP (RFC) and Oracle (REST) stand-ins.
+Seeds ERP history, syncs it once, adds a burst of new activity and syncs
+again, then compares the delta cycle against a full re-extract. Reports
+records per second and sync lag per source. The target database comes
+from DATABASE_URL.
+
+Usage:
+    cd backend && python -m benchmarks.bench_erp_sync --plants 4 --history 20000 --delta 2000
+"""
+
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select
+
+from app.core.database import Base, async_engine
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.models.plants import Plant
+from app.services.erp_connectors import OracleConnector, SAPConnector
+from app.services.erp_sync import ERPSyncEngine, sync_watermarks
+from benchmarks.erp_standins import ChangeLog, StandInOracleServer, StandInSAPServer, backdate
+
+
+def summarize(label: str, results, elapsed: float):
+    by_source = defaultdict(lambda: [0, 0.0, 0.0])
+    for stats in results:
+        if stats.error:
+            print(f"  {stats.erp_system} {stats.plant_id} {stats.entity}: {stats.error}")
+        entry = by_source[(stats.erp_system, stats.entity)]
+        entry[0] += stats.records
+        entry[1] = max(entry[1], stats.elapsed_seconds)
+        entry[2] = max(entry[2], stats.lag_seconds or 0.0)
+
+    total = sum(stats.records for stats in results)
+    print(f"{label}: {total:,} records in {elapsed:.2f} s ({total / elapsed:,.0f} records/s)")
+    for (erp_system, entity), (records, slowest, lag) in sorted(by_source.items()):
+        rate = records / slowest if slowest else 0.0
+        print(f"  {erp_system:<7} {entity:<23} {records:>9,} records {rate:>10,.0f} records/s   lag {lag:>6.1f} s")
+
+
+async def timed_cycle(sync_engine: ERPSyncEngine):
+    started = time.perf_counter()
+    results = await sync_engine.sync_once()
+    return results, time.perf_counter() - started
+
+
+async def run(args, change_log, sap_server, oracle_server):
+    sap_plants = [f"{1000 + i}" for i in range(args.plants)]
+    oracle_plants = [f"M{i + 1}" for i in range(args.plants)]
+    tables = [Plant.__table__, InventoryLevel.__table__, InventoryTransaction.__table__, sync_watermarks]
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all, tables=tables)
+        for table in tables:
+            await connection.execute(delete(table))
+        await connection.execute(insert(Plant), [
+            {"plant_code": plant_id, "plant_name": plant_id, "erp_system": erp_system, "is_active": True}
+            for erp_system, plants in (("SAP", sap_plants), ("Oracle", oracle_plants))
+            for plant_id in plants
+        ])
+
+    for plant_id in sap_plants:
+        change_log.add_sap_activity(plant_id, args.history, args.history // 10)
+    for plant_id in oracle_plants:
+        change_log.add_oracle_activity(plant_id, args.history, args.history // 10)
+    backdate(change_log, 86_400)
+
+    sync_engine = ERPSyncEngine({
+        "SAP": SAPConnector(sap_server.connection_factory(), max_workers=args.sap_threads),
+        "Oracle": OracleConnector(oracle_server.base_url, max_connections=args.oracle_connections),
+    }, overlap_seconds=args.overlap)
+    try:
+        summarize("initial sync", *await timed_cycle(sync_engine))
+
+        for plant_id in sap_plants:
+            change_log.add_sap_activity(plant_id, args.delta, args.delta // 10)
+        for plant_id in oracle_plants:
+            change_log.add_oracle_activity(plant_id, args.delta, args.delta // 10)
+        summarize("delta sync", *await timed_cycle(sync_engine))
+        # Let the delta age past the overlap window
+        await asyncio.sleep(args.overlap + 1)
+        summarize("idle sync", *await timed_cycle(sync_engine))
+
+        # What a full re-extract every cycle would cost
+        async with async_engine.begin() as connection:
+            await connection.execute(delete(sync_watermarks))
+        summarize("full re-extract", *await timed_cycle(sync_engine))
+        async with async_engine.connect() as connection:
+            for table in (InventoryTransaction.__table__, InventoryLevel.__table__):
+                rows = (await connection.execute(select(func.count()).select_from(table))).scalar()
+                print(f"{table.name}: {rows:,} rows")
+    finally:
+        await sync_engine.close()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plants", type=int, default=4, help="Plants per ERP system")
+    parser.add_argument("--history", type=int, default=20_000, help="Transactions per plant before the first sync")
+    parser.add_argument("--delta", type=int, default=2_000, help="New transactions per plant between syncs")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated ERP latency per call")
+    parser.add_argument("--overlap", type=int, default=1, help="Seconds re-read before each watermark")
+    parser.add_argument("--sap-threads", type=int, default=4)
+    parser.add_argument("--oracle-connections", type=int, default=10)
+    args = parser.parse_args()
+
+    change_log = ChangeLog()
+    latency = args.latency_ms / 1000
+    sap_server = StandInSAPServer(change_log, latency).start()
+    oracle_server = StandInOracleServer(change_log, latency).start()
+    try:
+        asyncio.run(run(args, change_log, sap_server, oracle_server))
+    finally:
+        sap_server.stop()
+        oracle_server.stop()
+
+
+if __name__ == "__main__":
+    main()
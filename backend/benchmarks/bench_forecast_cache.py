@@ -0,0 +1,118 @@
+"""
+Benchmark: per-series forecast cache
+
+Trains a model for synthetic demand series in a SQLite file, then
+measures ForecastingService.get_material_forecast latency for a cold
+cache, repeat hits, and an incremental refresh after a new day of
+transactions arrives.
+
+Usage:
+    cd backend && python -m benchmarks.bench_forecast_cache --series 200 --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.database import Base
+from app.models.inventory import InventoryTransaction
+from app.services.ai_forecasting import ForecastingService
+from app.services.batch_forecasting import history_origin_weekday
+from app.services.forecast_cache import forecast_cache
+from app.services.model_store import GLOBAL_PARTITION, ModelStore
+from app.services.model_training import train_chunk
+
+
+def transactions(keys, days, rng):
+    today = datetime.combine(date.today(), datetime.min.time())
+    return [
+        {
+            "material_id": material_id,
+            "plant_id": plant_id,
+            "transaction_type": "OUT",
+            "quantity": float(rng.poisson(20)),
+            "unit_of_measure": "PCS",
+            "erp_system": "SAP",
+            "transaction_date": today - timedelta(days=day, hours=-9),
+        }
+        for material_id, plant_id in keys
+        for day in days
+    ]
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000
+
+
+async def timed(service, keys, db, horizon):
+    samples = []
+    for material_id, plant_id in keys:
+        started = time.perf_counter()
+        await service.get_material_forecast(material_id, plant_id, horizon, db)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def run(args, path, model_root):
+    keys = [(f"MAT{i:06d}", f"P{i % 5:02d}") for i in range(args.series)]
+    rng = np.random.default_rng(42)
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    with sync_engine.begin() as connection:
+        connection.execute(insert(InventoryTransaction), transactions(keys, range(2, 2 + args.days), rng))
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    service = ForecastingService(model_store=ModelStore(model_root))
+    async with AsyncSession(engine) as db:
+        end_date = date.today() - timedelta(days=1)
+        series, history = await service.load_demand_history(db, args.days, end_date)
+        origin_weekday = history_origin_weekday(end_date, history.shape[1])
+        service.model_store.save_version(GLOBAL_PARTITION, series, train_chunk(history, origin_weekday), {
+            "trained_at": datetime.now(),
+            "history_end_date": end_date,
+            "history_days": history.shape[1],
+            "origin_weekday": origin_weekday
+        })
+
+        cold = await timed(service, keys, db, args.horizon)
+        sample = [keys[i] for i in rng.integers(0, len(keys), args.requests)]
+        hits = await timed(service, sample, db, args.horizon)
+
+    with sync_engine.begin() as connection:
+        connection.execute(insert(InventoryTransaction), transactions(keys, [1], rng))
+
+    async with AsyncSession(engine) as db:
+        incremental = await timed(service, keys, db, args.horizon)
+    await engine.dispose()
+
+    print(f"{args.series:,} series x {args.days} days, horizon {args.horizon}")
+    for name, samples in (("cold", cold), ("repeat hit", hits), ("incremental", incremental)):
+        p50, p99 = percentiles(samples)
+        print(f"{name:<12} p50 {p50:>8.3f} ms   p99 {p99:>8.3f} ms   mean {statistics.mean(samples) * 1000:>8.3f} ms")
+    print(forecast_cache.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=200)
+    parser.add_argument("--days", type=int, default=90, help="Days of history per series")
+    parser.add_argument("--horizon", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, os.path.join(directory, "bench.db"), directory))
+
+
+if __name__ == "__main__":
+    main()
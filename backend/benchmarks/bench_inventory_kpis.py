@@ -0,0 +1,141 @@
+"""
+Benchmark: inventory KPI aggregation in Python vs in SQL
+
+Builds a synthetic inventory_levels table (1M rows by default) in a
+SQLite file and compares the legacy load-everything approach against
+InventoryAggregationService for latency and peak Python memory.
+
+Usage:
+    cd backend && python -m benchmarks.bench_inventory_kpis --rows 1000000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.core.database import Base
+from app.models.inventory import InventoryLevel, StockType
+from app.services.inventory_aggregation import InventoryAggregationService
+
+
+def populate(session, rows: int, batch_size: int = 50_000):
+    """Insert synthetic inventory level rows"""
+    stock_types = list(StockType)
+    rng = random.Random(42)
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(offset + batch_size, rows)):
+            available = rng.choice([0.0, rng.uniform(0, 2000)])
+            reserved = rng.uniform(0, 100)
+            batch.append({
+                "material_id": f"MAT{i % 50_000:06d}",
+                "plant_id": f"PLANT{i % 20:03d}",
+                "storage_location": "WH-A1",
+                "stock_type": stock_types[i % len(stock_types)],
+                "available_quantity": available,
+                "reserved_quantity": reserved,
+                "total_quantity": available + reserved,
+                "unit_of_measure": "PCS",
+                "erp_system": "SAP",
+            })
+        session.execute(insert(InventoryLevel), batch)
+    session.commit()
+
+
+def legacy_kpis(session, plant_id=None):
+    """Previous implementation: load every row and aggregate in Python"""
+    query = session.query(InventoryLevel)
+    if plant_id:
+        query = query.filter(InventoryLevel.plant_id == plant_id)
+    levels = query.all()
+
+    summary_by_type = {}
+    for level in levels:
+        entry = summary_by_type.setdefault(
+            level.stock_type.value, {"count": 0, "total_quantity": 0, "total_value": 0}
+        )
+        entry["count"] += 1
+        entry["total_quantity"] += level.total_quantity
+        entry["total_value"] += level.total_quantity
+
+    return {
+        "total_materials": len(levels),
+        "total_value": sum(level.total_quantity for level in levels),
+        "low_stock_count": len([level for level in levels if level.available_quantity < 10]),
+        "overstock_count": len([level for level in levels if level.total_quantity > 1000]),
+        "stock_out_risk": len([level for level in levels if level.available_quantity == 0]),
+    }, summary_by_type
+
+
+def sql_kpis(async_engine):
+    """New implementation: aggregate in the database"""
+
+    async def run(plant_id):
+        async with AsyncSession(async_engine) as session:
+            service = InventoryAggregationService(session)
+            kpis = await service.get_kpis(plant_id)
+            summary = await service.get_summary_by_type(plant_id)
+        return kpis, summary["summary_by_type"]
+
+    return lambda session, plant_id=None: asyncio.run(run(plant_id))
+
+
+def measure(label, func, session, plant_id=None):
+    session.expunge_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(session, plant_id)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed * 1000:>10.1f} ms {peak / 1024 / 1024:>10.1f} MiB")
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--plant-id", default=None, help="Optional plant filter")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{db_path}")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+        Base.metadata.create_all(engine, tables=[InventoryLevel.__table__])
+        session = sessionmaker(bind=engine)()
+
+        print(f"Populating {args.rows:,} inventory_levels rows...")
+        populate(session, args.rows)
+
+        print(f"{'approach':<24} {'latency':>13} {'peak memory':>14}")
+        (legacy, legacy_summary), legacy_time, legacy_peak = measure(
+            "python aggregation", legacy_kpis, session, args.plant_id
+        )
+        (new, new_summary), new_time, new_peak = measure(
+            "sql aggregation", sql_kpis(async_engine), session, args.plant_id
+        )
+
+        assert {k: legacy[k] for k in legacy if k != "total_value"} == \
+            {k: new[k] for k in new if k != "total_value"}, "KPI counts differ"
+        assert abs(legacy["total_value"] - new["total_value"]) <= 1e-6 * max(1.0, legacy["total_value"])
+        assert {k: v["count"] for k, v in legacy_summary.items()} == \
+            {k: v["count"] for k, v in new_summary.items()}, "summary counts differ"
+
+        print(f"speedup: {legacy_time / new_time:.1f}x, "
+              f"memory reduction: {legacy_peak / max(new_peak, 1):.1f}x")
+        session.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark: daily KPI rollups vs live aggregation
+
+Seeds inventory_levels and a year of inventory_transactions, rebuilds the
+KPI rollups, then applies a burst of new and backdated transactions plus
+stock updates with an incremental refresh and checks the result against a
+full rebuild. Reports the latency of 365-day analytics reads from the
+rollups next to a live GROUP BY over the raw transactions. The target
+database comes from DATABASE_URL.
+
+Usage:
+    cd backend && python -m benchmarks.bench_kpi_rollup --plants 20 --materials 2000 --transactions 1000000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import case, delete, func, insert, select, update
+
+from app.core.database import AsyncSessionLocal, Base, async_engine
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.models.plants import Plant
+from app.services.kpi_rollup import ROLLUP_TABLES, KPIRollup, KPIRollupService, kpi_daily_plant
+
+
+def transaction_rows(rng, plants: int, materials: int, count: int, max_age_days: int):
+    now = datetime.utcnow()
+    plant_ids = rng.integers(0, plants, count)
+    material_ids = rng.integers(0, materials, count)
+    ages = rng.uniform(0, max_age_days * 86_400, count)
+    quantities = rng.integers(1, 100, count)
+    issues = rng.random(count) < 0.6
+    return [
+        {
+            "material_id": f"MAT{material_ids[i]:06d}",
+            "plant_id": f"PLANT{plant_ids[i]:03d}",
+            "transaction_type": "OUT" if issues[i] else "IN",
+            "quantity": float(quantities[i]),
+            "unit_of_measure": "PCS",
+            "erp_system": "SAP",
+            "transaction_date": now - timedelta(seconds=float(ages[i])),
+        }
+        for i in range(count)
+    ]
+
+
+async def seed(args, rng):
+    tables = [Plant.__table__, InventoryLevel.__table__, InventoryTransaction.__table__, *ROLLUP_TABLES]
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all, tables=tables)
+        for table in tables:
+            await connection.execute(delete(table))
+        await connection.execute(insert(Plant), [
+            {"plant_code": f"PLANT{p:03d}", "plant_name": f"Plant {p}", "is_active": True}
+            for p in range(args.plants)
+        ])
+        quantities = rng.choice([0.0, 50.0, 500.0, 2000.0], args.plants * args.materials)
+        await connection.execute(insert(InventoryLevel), [
+            {
+                "material_id": f"MAT{m:06d}",
+                "plant_id": f"PLANT{p:03d}",
+                "storage_location": "WH-A1",
+                "available_quantity": float(quantities[p * args.materials + m]),
+                "reserved_quantity": 0.0,
+                "total_quantity": float(quantities[p * args.materials + m]),
+                "erp_system": "SAP",
+            }
+            for p in range(args.plants) for m in range(args.materials)
+        ])
+        for offset in range(0, args.transactions, 50_000):
+            count = min(50_000, args.transactions - offset)
+            await connection.execute(
+                insert(InventoryTransaction), transaction_rows(rng, args.plants, args.materials, count, 365)
+            )
+
+
+async def plant_rows():
+    async with async_engine.connect() as connection:
+        result = await connection.execute(
+            select(kpi_daily_plant).order_by(kpi_daily_plant.c.plant_id, kpi_daily_plant.c.snapshot_date)
+        )
+        return [tuple(row) for row in result]
+
+
+async def read_latency(label: str, read, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        async with AsyncSessionLocal() as session:
+            started = time.perf_counter()
+            await read(session)
+            timings.append(time.perf_counter() - started)
+    print(f"  {label:<34} {statistics.median(timings) * 1000:>9.1f} ms")
+
+
+async def live_trend(session):
+    """Daily receipts and issues straight from the raw transactions"""
+    day = func.date(InventoryTransaction.transaction_date)
+    await session.execute(
+        select(
+            day,
+            func.sum(case((InventoryTransaction.transaction_type == "IN", InventoryTransaction.quantity), else_=0.0)),
+            func.sum(case((InventoryTransaction.transaction_type == "OUT", InventoryTransaction.quantity), else_=0.0)),
+        ).where(
+            InventoryTransaction.transaction_date >= datetime.utcnow() - timedelta(days=365)
+        ).group_by(day)
+    )
+
+
+async def run(args):
+    rng = np.random.default_rng(42)
+    started = time.perf_counter()
+    await seed(args, rng)
+    print(
+        f"seeded {args.plants} plants x {args.materials:,} materials, "
+        f"{args.transactions:,} transactions in {time.perf_counter() - started:.1f} s"
+    )
+
+    # Seeded rows are seconds old; a production overlap would re-read all of them
+    rollup = KPIRollup(overlap_seconds=args.overlap)
+    rebuilt = await rollup.rebuild()
+    print(f"rebuild: {rebuilt['materials']:,} materials in {rebuilt['elapsed_seconds']:.2f} s")
+
+    # New activity: fresh and backdated transactions plus stock updates
+    async with async_engine.begin() as connection:
+        await connection.execute(
+            insert(InventoryTransaction),
+            transaction_rows(rng, args.plants, args.materials, args.delta, 30)
+        )
+        await connection.execute(
+            update(InventoryLevel).where(InventoryLevel.id % 97 == 0).values(
+                total_quantity=InventoryLevel.total_quantity + 10, last_updated=datetime.utcnow()
+            )
+        )
+    refreshed = await rollup.refresh()
+    print(
+        f"refresh: {refreshed['materials']:,} changed materials in {refreshed['plants']} plants "
+        f"in {refreshed['elapsed_seconds']:.2f} s"
+    )
+    incremental = await plant_rows()
+    await rollup.rebuild()
+    rebuilt_rows = await plant_rows()
+    matches = len(incremental) == len(rebuilt_rows) and all(
+        left[:2] == right[:2] and np.allclose(left[2:], right[2:]) for left, right in zip(incremental, rebuilt_rows)
+    )
+    print(f"incremental refresh matches rebuild: {matches}")
+
+    print(f"365-day reads (median of {args.repeats}):")
+    await read_latency("trend, all plants (rollup)", lambda s: KPIRollupService(s).get_trends(None, 365), args.repeats)
+    await read_latency("kpis, all plants (rollup)", lambda s: KPIRollupService(s).get_kpis(None, 365), args.repeats)
+    await read_latency("trend, one plant (rollup)", lambda s: KPIRollupService(s).get_trends("PLANT000", 365), args.repeats)
+    await read_latency("plant comparison (rollup)", lambda s: KPIRollupService(s).get_plant_comparison(365), args.repeats)
+    await read_latency("daily flows, live GROUP BY", live_trend, max(1, args.repeats // 5))
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plants", type=int, default=20)
+    parser.add_argument("--materials", type=int, default=2_000, help="Materials per plant")
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--delta", type=int, default=5_000, help="Transactions added before the refresh")
+    parser.add_argument("--overlap", type=int, default=0, help="Seconds re-read before each watermark")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: caller-side cost of structured logging, synchronous vs queued
+
+Times log calls as seen by the calling thread (the event loop in the API)
+under the former configuration, where JSON rendering and the stdout write
+happen inside the call, and under setup_logging's queued pipeline. Debug
+calls below the level are timed for both, and a burst against a slow
+sink shows the queued pipeline dropping records instead of stalling the
+caller. Output goes to /dev/null, slowed by --sink-delay-us per write.
+
+Usage:
+    cd backend && python -m benchmarks.bench_logging --events 200000 --sink-delay-us 50
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+os.environ.setdefault("LOG_LEVEL", "INFO")
+
+import structlog
+
+from app.core import logging as app_logging
+from app.core.config import settings
+
+
+class SlowSink:
+    """/dev/null that takes delay seconds per write, like a backed-up pipe"""
+
+    def __init__(self, delay: float):
+        self.devnull = open(os.devnull, "w")
+        self.delay = delay
+
+    def write(self, text: str):
+        if self.delay:
+            deadline = time.perf_counter() + self.delay
+            while time.perf_counter() < deadline:
+                pass
+        return self.devnull.write(text)
+
+    def flush(self):
+        self.devnull.flush()
+
+
+def setup_synchronous_logging():
+    """The configuration before the queued pipeline"""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    logging.basicConfig(format="%(message)s", stream=sys.stdout, level=logging.INFO)
+    structlog.reset_defaults()
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.PositionalArgumentsFormatter(),
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.UnicodeDecoder(),
+            structlog.processors.JSONRenderer()
+        ],
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+
+def setup_queued_logging():
+    structlog.reset_defaults()
+    app_logging.setup_logging()
+
+
+def per_call_us(events: int, level: str) -> float:
+    logger = structlog.get_logger("bench")
+    log = getattr(logger, level)
+    started = time.perf_counter()
+    for i in range(events):
+        log("Inventory level updated", plant_id="PLANT001", material_id="MAT000042", quantity=i)
+    return (time.perf_counter() - started) / events * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--sink-delay-us", type=float, default=50.0, help="Time each write to the sink takes")
+    args = parser.parse_args()
+
+    report = sys.stdout
+    results = {}
+    for name, setup in (("synchronous", setup_synchronous_logging), ("queued", setup_queued_logging)):
+        for delay in (0.0, args.sink_delay_us):
+            sys.stdout = SlowSink(delay / 1e6)
+            setup()
+            info = per_call_us(args.events if not delay else args.events // 10, "info")
+            debug = per_call_us(args.events, "debug")
+            pipeline = app_logging.log_pipeline if name == "queued" else None
+            stats = pipeline.stats() if pipeline else {}
+            if pipeline:
+                pipeline.stop()
+            results[(name, delay)] = (info, debug, stats.get("dropped"))
+            sys.stdout = report
+
+    print(f"caller-side cost per call, queue of {settings.LOG_QUEUE_SIZE:,} records")
+    print(f"  {'pipeline':<12} {'sink write':>10} {'info':>10} {'debug (off)':>12} {'dropped':>9}")
+    for (name, delay), (info, debug, dropped) in results.items():
+        print(
+            f"  {name:<12} {delay:>8.0f}us {info:>8.2f}us {debug:>10.3f}us "
+            f"{'-' if dropped is None else f'{dropped:,}':>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Benchmark: API latency during a login storm
+
+Serves POST /auth/login next to a copy of the former login handler, which
+checked bcrypt passwords on the event loop, in a single-worker uvicorn
+subprocess. Fires a burst of concurrent logins at each handler while a
+probe client keeps calling a cheap API route. Reports probe latency with
+no logins running and during each storm, plus login throughput, rejected
+logins and the hasher's queue metrics. A share of the users have hashes
+at a lower cost factor, and the login path rehashes them.
+
+Usage:
+    cd backend && python -m benchmarks.bench_login_storm --logins 200 --clients 50
+
+Set DATABASE_URL to use PostgreSQL; otherwise a temporary SQLite database
+is created with the users table.
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_tmpdir = None
+if "DATABASE_URL" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+import httpx
+from fastapi import Depends, FastAPI, Form, HTTPException
+from passlib.context import CryptContext
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.endpoints import auth
+from app.core.database import Base, engine, get_db_async
+from app.core.security import create_access_token, password_hasher, pwd_context
+from app.models.users import User
+
+PASSWORD = "storm-password"
+
+
+def populate(users: int, outdated_share: float):
+    """Create bench users; some with hashes at a cost below BCRYPT_ROUNDS"""
+    current = pwd_context.hash(PASSWORD)
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=10).hash(PASSWORD)
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    with engine.begin() as connection:
+        connection.execute(delete(User).where(User.username.like("storm-%")))
+        connection.execute(insert(User), [
+            {
+                "username": f"storm-{i}", "email": f"storm-{i}@example.com", "full_name": f"Storm {i}",
+                "hashed_password": outdated if i < users * outdated_share else current,
+                "role": "manager", "is_active": True,
+            }
+            for i in range(users)
+        ])
+
+
+def create_benchmark_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/auth")
+
+    @app.post("/legacy/login")
+    async def legacy_login(
+        username: str = Form(...),
+        password: str = Form(...),
+        db: AsyncSession = Depends(get_db_async)
+    ):
+        # Former pattern: bcrypt runs on the event loop
+        user = await auth.find_user(db, username)
+        if user is None or not pwd_context.verify(password, user.hashed_password):
+            raise HTTPException(status_code=401, detail="Incorrect username or password")
+        return {"access_token": create_access_token({"sub": user.username}), "token_type": "bearer"}
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    @app.get("/stats")
+    async def stats():
+        return password_hasher.stats()
+
+    return app
+
+
+app = create_benchmark_app()
+
+
+def start_server() -> tuple:
+    """Start the benchmark app in a single-worker uvicorn subprocess"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.bench_login_storm:app",
+         "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"{base_url}/ping").raise_for_status()
+            return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Benchmark server did not start")
+
+
+async def storm(base_url: str, path: str, logins: int, clients: int, users: int, probe_seconds: float = 0.0):
+    """Concurrent logins while a probe calls /ping; returns probe latencies and login outcomes"""
+    probe_latencies, statuses = [], []
+    limits = httpx.Limits(max_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        async def probe(done: asyncio.Event):
+            while not done.is_set():
+                started = time.perf_counter()
+                (await client.get("/ping")).raise_for_status()
+                probe_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        remaining = iter(range(logins))
+
+        async def login_client():
+            for i in remaining:
+                response = await client.post(path, data={"username": f"storm-{i % users}", "password": PASSWORD})
+                statuses.append(response.status_code)
+
+        done = asyncio.Event()
+        probe_task = asyncio.create_task(probe(done))
+        started = time.perf_counter()
+        if logins:
+            await asyncio.gather(*(login_client() for _ in range(clients)))
+        else:
+            await asyncio.sleep(probe_seconds)
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+        stats = (await client.get("/stats")).json()
+    return probe_latencies, statuses, elapsed, stats
+
+
+def report(label: str, probe_latencies, statuses, elapsed: float):
+    quantiles = statistics.quantiles(probe_latencies, n=100)
+    ok = statuses.count(200)
+    print(
+        f"{label:<26} ping p50={quantiles[49] * 1000:>8.1f} ms p99={quantiles[98] * 1000:>8.1f} ms "
+        f"max={max(probe_latencies) * 1000:>8.1f} ms   "
+        f"logins ok={ok:>4} rejected={statuses.count(503):>4} {ok / elapsed:>6.1f}/s"
+    )
+
+
+async def main_async(args, base_url: str):
+    print(f"{args.logins} logins from {args.clients} concurrent clients, {os.cpu_count()} CPUs")
+    probes, statuses, elapsed, _ = await storm(base_url, "/auth/login", 0, 1, args.users, probe_seconds=3)
+    report("no logins", probes, statuses, elapsed)
+    report("storm, bcrypt on loop", *(await storm(
+        base_url, "/legacy/login", args.logins, args.clients, args.users
+    ))[:3])
+    probes, statuses, elapsed, stats = await storm(base_url, "/auth/login", args.logins, args.clients, args.users)
+    report("storm, hashing executor", probes, statuses, elapsed)
+    print(
+        f"\nhasher: {stats['workers']} workers, max queued {stats['max_queued']}, "
+        f"queue wait p50={stats['queue_wait']['p50_ms']} ms p95={stats['queue_wait']['p95_ms']} ms, "
+        f"hash p50={stats['hash_time']['p50_ms']} ms, rehashed {stats['rehashed']}, rejected {stats['rejected']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent login clients")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--outdated", type=float, default=0.2, help="Share of users with a lower-cost hash")
+    args = parser.parse_args()
+
+    populate(args.users, args.outdated)
+    engine.dispose()
+
+    process, base_url = start_server()
+    try:
+        asyncio.run(main_async(args, base_url))
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
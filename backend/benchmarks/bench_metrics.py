@@ -0,0 +1,118 @@
+"""
+Benchmark: per-request and per-query overhead of the Prometheus instrumentation
+
+Drives a minimal ASGI app directly, with and without MetricsMiddleware, and
+runs SELECT 1 on an in-memory SQLite engine with and without the query
+listeners inside a request context. The difference per request and per
+query is the cost of the instrumentation; the run fails when the request
+overhead exceeds --budget-us. With --multiprocess, samples go to files in a
+temporary directory as they do with several uvicorn workers.
+
+Usage:
+    cd backend && python -m benchmarks.bench_metrics --requests 200000 --queries 50000
+    cd backend && python -m benchmarks.bench_metrics --multiprocess
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def per_request_seconds(app, requests: int, repeats: int) -> float:
+    """Best of repeats, seconds per request"""
+    route = SimpleNamespace(path="/api/v1/inventory/levels")
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(requests):
+            scope = {"type": "http", "method": "GET", "path": "/api/v1/inventory/levels", "route": route}
+            await app(scope, receive, send)
+        best = min(best, (time.perf_counter() - started) / requests)
+    return best
+
+
+def per_query_seconds(engine, queries: int, repeats: int) -> float:
+    from sqlalchemy import text
+
+    from app.core.metrics import _request_queries
+
+    statement = text("SELECT 1")
+    token = _request_queries.set([0, 0.0])
+    best = float("inf")
+    try:
+        with engine.connect() as connection:
+            for _ in range(repeats):
+                started = time.perf_counter()
+                for _ in range(queries):
+                    connection.execute(statement)
+                best = min(best, (time.perf_counter() - started) / queries)
+    finally:
+        _request_queries.reset(token)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=50_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--budget-us", type=float, default=5.0, help="Allowed overhead per request")
+    parser.add_argument("--multiprocess", action="store_true", help="File-backed samples, as with several workers")
+    args = parser.parse_args()
+
+    # Decided when prometheus_client is first imported, see app.core.metrics
+    tmpdir = tempfile.TemporaryDirectory() if args.multiprocess else None
+    if tmpdir:
+        os.environ["METRICS_MULTIPROC_DIR"] = tmpdir.name
+    os.environ["ENABLE_METRICS"] = "true"
+
+    from sqlalchemy import create_engine
+
+    from app.core.metrics import MULTIPROC_DIR, MetricsMiddleware, instrument_engine
+
+    bare = asyncio.run(per_request_seconds(bare_app, args.requests, args.repeats))
+    measured = asyncio.run(per_request_seconds(MetricsMiddleware(bare_app), args.requests, args.repeats))
+    request_overhead_us = (measured - bare) * 1e6
+
+    plain = create_engine("sqlite://")
+    instrumented = create_engine("sqlite://")
+    instrument_engine(instrumented, "bench")
+    query = per_query_seconds(plain, args.queries, args.repeats)
+    query_measured = per_query_seconds(instrumented, args.queries, args.repeats)
+
+    print(f"samples: {'files in ' + MULTIPROC_DIR if MULTIPROC_DIR else 'in-process'}")
+    print(f"requests (best of {args.repeats} x {args.requests:,})")
+    print(f"  bare ASGI app           {bare * 1e6:>8.2f} us")
+    print(f"  with MetricsMiddleware  {measured * 1e6:>8.2f} us")
+    print(f"  overhead                {request_overhead_us:>8.2f} us   budget {args.budget_us:.1f} us")
+    print(f"queries (best of {args.repeats} x {args.queries:,}, SQLite in memory)")
+    print(f"  SELECT 1                {query * 1e6:>8.2f} us")
+    print(f"  with listeners          {query_measured * 1e6:>8.2f} us")
+    print(f"  overhead                {(query_measured - query) * 1e6:>8.2f} us")
+
+    if tmpdir:
+        tmpdir.cleanup()
+    if request_overhead_us > args.budget_us:
+        print("request overhead over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
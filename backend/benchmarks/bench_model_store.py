@@ -0,0 +1,105 @@
+"""
+Benchmark: memory-mapped model store
+
+Writes one model version for many series, then measures time to open it,
+the first (cold) lookup, warm lookup throughput and the resident memory
+of several worker processes mapping the same version, compared with
+loading every array into memory.
+
+Usage:
+    cd backend && python -m benchmarks.bench_model_store --series 1000000 --workers 4
+"""
+
+import argparse
+import multiprocessing
+import tempfile
+import time
+
+import numpy as np
+
+from app.services.batch_forecasting import N_PARAMS
+from app.services.model_store import GLOBAL_PARTITION, ModelStore
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def worker(root: str, keys, mapped: bool, queue):
+    store = ModelStore(root)
+    baseline = rss_mb()
+    artifact = store.artifact(GLOBAL_PARTITION)
+    if not mapped:
+        # What a naive loader does: materialize every parameter up front
+        params = np.array(artifact._params)
+        index = {key: row for row, key in enumerate(artifact.keys())}
+        assert params.shape[1] == len(index)
+    for material_id, plant_id in keys:
+        store.lookup(material_id, plant_id)
+    queue.put(rss_mb() - baseline)
+
+
+def worker_memory(root: str, keys, workers: int, mapped: bool) -> float:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    processes = [context.Process(target=worker, args=(root, keys, mapped, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    total = sum(queue.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    keys = [(f"MAT{i:08d}", f"P{i % 50:03d}") for i in range(args.series)]
+    arrays = {
+        "coefficients": rng.normal(size=(args.series, N_PARAMS)),
+        "residual_std": rng.uniform(1, 10, args.series),
+        "accuracy": rng.uniform(0.5, 1.0, args.series),
+    }
+
+    with tempfile.TemporaryDirectory() as root:
+        store = ModelStore(root)
+        started = time.perf_counter()
+        store.save_version(GLOBAL_PARTITION, keys, arrays, {"history_days": 90})
+        print(f"{args.series:,} series written in {time.perf_counter() - started:.2f} s")
+
+        store = ModelStore(root)
+        started = time.perf_counter()
+        artifact = store.artifact(GLOBAL_PARTITION)
+        print(f"open version:   {(time.perf_counter() - started) * 1000:>10.2f} ms")
+
+        started = time.perf_counter()
+        store.lookup(*keys[len(keys) // 2])
+        print(f"first lookup:   {(time.perf_counter() - started) * 1000:>10.2f} ms")
+
+        sample = [keys[i] for i in rng.integers(0, args.series, args.lookups)]
+        started = time.perf_counter()
+        for material_id, plant_id in sample:
+            store.lookup(material_id, plant_id)
+        elapsed = time.perf_counter() - started
+        print(f"warm lookups:   {args.lookups / elapsed:>10,.0f} /s")
+
+        row = artifact.row(*keys[7])
+        assert np.allclose(artifact.parameters(row)["coefficients"], arrays["coefficients"][7])
+
+        worker_keys = sample[:1000]
+        mapped = worker_memory(root, worker_keys, args.workers, mapped=True)
+        loaded = worker_memory(root, worker_keys, args.workers, mapped=False)
+        print(f"RSS growth across {args.workers} workers: mmap {mapped:,.1f} MB, full load {loaded:,.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: parallel model training scaling
+
+Trains synthetic demand series with TrainingScheduler at increasing
+worker counts and reports wall time, speedup over one worker and
+parallel efficiency. Pool start-up is excluded by warming each pool
+before timing.
+
+Usage:
+    cd backend && python -m benchmarks.bench_model_training --series 200000 --days 365
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmarks.bench_batch_forecast import synthetic_history
+from app.services.model_training import TrainingScheduler
+
+
+def worker_counts(max_workers: int):
+    counts, workers = [], 1
+    while workers < max_workers:
+        counts.append(workers)
+        workers *= 2
+    return counts + [max_workers]
+
+
+async def timed_training(scheduler: TrainingScheduler, history) -> float:
+    await scheduler.run_chunk(history[:1], 0)
+
+    started = time.perf_counter()
+    async for event in scheduler.train(history, 0):
+        if event["event"] == "trained":
+            assert event["arrays"]["coefficients"].shape[0] == history.shape[0]
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=365, help="Days of history per series")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    history = synthetic_history(args.series, args.days)
+    print(f"{args.series:,} series x {args.days} days, {os.cpu_count()} cores")
+    print(f"{'workers':>8} {'seconds':>9} {'series/s':>12} {'speedup':>8} {'efficiency':>11}")
+
+    baseline = None
+    for workers in worker_counts(args.max_workers):
+        scheduler = TrainingScheduler(max_workers=workers)
+        try:
+            elapsed = asyncio.run(timed_training(scheduler, history))
+        finally:
+            scheduler.shutdown()
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(
+            f"{workers:>8} {elapsed:>9.2f} {args.series / elapsed:>12,.0f} "
+            f"{speedup:>7.2f}x {speedup / workers:>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
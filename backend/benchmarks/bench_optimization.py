@@ -0,0 +1,115 @@
+"""
+Benchmark: catalog-wide reorder point and safety stock optimization
+
+Builds synthetic demand sums, stock and lead times for many material/plant
+series in the shape OptimizationService.load_inputs returns, then times
+the vectorized optimize() pass and writing the run with save_run() to a
+temporary store. A per-series loop over the same formulas, timed on a
+sample and extrapolated, gives the baseline; both are checked to agree.
+Reading a plant and a single reorder point back from the stored run is
+timed last.
+
+Usage:
+    cd backend && python -m benchmarks.bench_optimization --series 500000 --plants 40
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import tempfile
+import time
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.ai_optimization import OptimizationService
+from app.services.model_store import ModelStore
+
+
+def synthetic_inputs(n_series: int, n_plants: int, days: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    daily = rng.gamma(1.5, 20.0, n_series) * (rng.random(n_series) > 0.1)
+    spread = daily * rng.uniform(0.2, 1.5, n_series)
+    recorded = rng.random(n_series) < 0.3
+    return pd.DataFrame({
+        "plant_id": [f"PLANT{p:03d}" for p in rng.integers(0, n_plants, n_series)],
+        "material_id": [f"MAT{i:07d}" for i in range(n_series)],
+        "demand_total": daily * days,
+        "demand_squares": (daily ** 2 + spread ** 2) * days,
+        "stock": rng.uniform(0, 60, n_series) * daily + rng.uniform(0, 50, n_series),
+        "lead_time_days": np.where(recorded, rng.uniform(3, 30, n_series), np.nan),
+        "lead_time_std_days": np.where(recorded, rng.uniform(0, 5, n_series), np.nan),
+        "service_level": np.where(recorded & (rng.random(n_series) < 0.5), 0.99, np.nan),
+    })
+
+
+def loop_reorder_points(frame: pd.DataFrame, arrays, days: int, sample: int) -> float:
+    """Seconds per series of the same formulas one series at a time"""
+    normal = NormalDist()
+    started = time.perf_counter()
+    for row in range(min(sample, len(frame))):
+        total = frame["demand_total"].iat[row]
+        mean = total / days
+        std = math.sqrt(max(frame["demand_squares"].iat[row] - total * total / days, 0.0) / (days - 1))
+        lead_time = arrays["lead_time_days"][row]
+        lead_time_std = arrays["lead_time_std_days"][row]
+        z = normal.inv_cdf(min(max(arrays["service_level"][row], 0.5), 0.9999))
+        safety_stock = z * math.sqrt(lead_time * std ** 2 + mean ** 2 * lead_time_std ** 2)
+        reorder_point = mean * lead_time + safety_stock
+        if not math.isclose(reorder_point, arrays["reorder_point"][row], rel_tol=1e-9, abs_tol=1e-9):
+            raise AssertionError(f"Series {row} differs: {reorder_point} != {arrays['reorder_point'][row]}")
+    return (time.perf_counter() - started) / min(sample, len(frame))
+
+
+async def read_latency(service: OptimizationService, frame: pd.DataFrame, repeats: int):
+    plant_id, material_id = frame["plant_id"].iat[0], frame["material_id"].iat[0]
+    for label, read in (
+        ("plant optimization", lambda: service.get_plant_optimization(plant_id)),
+        ("global optimization", service.get_global_optimization),
+        ("one reorder point", lambda: service.calculate_optimal_reorder_points(material_id, plant_id)),
+    ):
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            await read()
+            timings.append(time.perf_counter() - started)
+        print(f"  {label:<22} {statistics.median(timings) * 1e6:>9.1f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--series", type=int, default=500_000)
+    parser.add_argument("--plants", type=int, default=40)
+    parser.add_argument("--days", type=int, default=settings.OPTIMIZATION_LOOKBACK_DAYS)
+    parser.add_argument("--loop-sample", type=int, default=20_000, help="Series computed one at a time for the baseline")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    frame = synthetic_inputs(args.series, args.plants, args.days)
+    with tempfile.TemporaryDirectory() as root:
+        service = OptimizationService(ModelStore(root, kind="optimization"))
+
+        started = time.perf_counter()
+        arrays = service.optimize(frame, args.days)
+        computed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        service.save_run(frame, arrays, {"run_id": "bench", "computed_at": "now", "lookback_days": args.days})
+        saved = time.perf_counter() - started
+
+        per_series = loop_reorder_points(frame, arrays, args.days, args.loop_sample)
+        print(f"{args.series:,} series across {args.plants} plants")
+        print(f"  per-series loop (extrapolated) {per_series * args.series:>9.2f} s")
+        print(f"  vectorized optimize()          {computed:>9.2f} s   {per_series * args.series / computed:.0f}x")
+        print(f"  save_run() to the store        {saved:>9.2f} s")
+        print(f"  loop and vectorized agree on {min(args.loop_sample, args.series):,} sampled series")
+
+        print(f"reads from the stored run (median of {args.repeats}):")
+        asyncio.run(read_latency(service, frame, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
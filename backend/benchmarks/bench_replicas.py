@@ -0,0 +1,164 @@
+"""
+Benchmark: read/write splitting across a primary and two read replicas
+
+Stands in three SQLite databases for the primary and two replicas, each
+holding one plant named after its database, and serves in-process
+endpoints behind ReplicaRoutingMiddleware. Checks that reads on the read
+routes alternate between the replicas, that other routes, sessions that
+wrote and use_primary() stay on the primary, and that a replica whose
+health check fails leaves the rotation and comes back. Then times a
+session's read routed to a replica against one on the primary. Exits 1
+when a read lands on the wrong database.
+
+Usage:
+    cd backend && python -m benchmarks.bench_replicas --sessions 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+_tmpdir = tempfile.TemporaryDirectory()
+DATABASES = {
+    name: os.path.join(_tmpdir.name, name, f"{name}.db") for name in ("primary", "replica1", "replica2")
+}
+for _path in DATABASES.values():
+    os.makedirs(os.path.dirname(_path))
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASES['primary']}"
+os.environ["DATABASE_REPLICA_URLS"] = json.dumps([
+    f"sqlite:///{DATABASES['replica1']}", f"sqlite:///{DATABASES['replica2']}"
+])
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import AsyncSessionLocal, Base, async_engine, get_db_async, replicas
+from app.core.replicas import ReplicaRoutingMiddleware, _read_routing, use_primary
+from app.models.plants import Plant
+
+failures = []
+
+
+async def populate():
+    engines = {"primary": async_engine, **replicas.engines()}
+    for name, engine in engines.items():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all, tables=[Plant.__table__])
+            await connection.execute(insert(Plant), [{"plant_code": "PLANT001", "plant_name": name, "is_active": True}])
+
+
+async def plant_name(db: AsyncSession) -> str:
+    return await db.scalar(select(Plant.plant_name).where(Plant.plant_code == "PLANT001"))
+
+
+def routed_app():
+    app = FastAPI()
+
+    @app.get("/api/v1/plants/source")
+    async def read_route(db: AsyncSession = Depends(get_db_async)):
+        return {"source": await plant_name(db)}
+
+    @app.get("/api/v1/ai/source")
+    async def other_route(db: AsyncSession = Depends(get_db_async)):
+        return {"source": await plant_name(db)}
+
+    @app.get("/api/v1/plants/after-write")
+    async def after_write(db: AsyncSession = Depends(get_db_async)):
+        # The update is rolled back; only where the next read goes matters
+        await db.execute(update(Plant).where(Plant.plant_code == "PLANT001").values(city="Lyon"))
+        source = await plant_name(db)
+        await db.rollback()
+        return {"source": source}
+
+    @app.get("/api/v1/plants/pinned")
+    async def pinned():
+        with use_primary():
+            async with AsyncSessionLocal() as db:
+                return {"source": await plant_name(db)}
+
+    return ReplicaRoutingMiddleware(app, ["/api/v1/plants"])
+
+
+async def sources(client: httpx.AsyncClient, path: str, requests: int):
+    return [(await client.get(path)).json()["source"] for _ in range(requests)]
+
+
+def expect(label: str, got, wanted):
+    ok = got == wanted
+    print(f"{'ok  ' if ok else 'FAIL'} {label:<44} {got}")
+    if not ok:
+        failures.append(label)
+
+
+async def set_reachable(name: str, reachable: bool):
+    """Move a replica's directory away (or back) so new connections fail"""
+    directory = os.path.dirname(DATABASES[name])
+    if reachable:
+        os.rename(directory + ".down", directory)
+    else:
+        os.rename(directory, directory + ".down")
+    await replicas.engines()[name].dispose()
+    await replicas.check_all()
+
+
+async def per_session_us(sessions: int, routed: bool) -> float:
+    token = _read_routing.set("replica" if routed else None)
+    try:
+        started = time.perf_counter()
+        for _ in range(sessions):
+            async with AsyncSessionLocal() as db:
+                await plant_name(db)
+        return (time.perf_counter() - started) / sessions * 1e6
+    finally:
+        _read_routing.reset(token)
+
+
+async def run(args):
+    await populate()
+    await replicas.start()
+    transport = httpx.ASGITransport(app=routed_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        expect("read route, round-robin", sorted(await sources(client, "/api/v1/plants/source", 4)),
+               ["replica1", "replica1", "replica2", "replica2"])
+        expect("other route", await sources(client, "/api/v1/ai/source", 2), ["primary", "primary"])
+        expect("read route, read after a write", await sources(client, "/api/v1/plants/after-write", 2),
+               ["primary", "primary"])
+        expect("read route, use_primary()", await sources(client, "/api/v1/plants/pinned", 2), ["primary", "primary"])
+
+        await set_reachable("replica2", False)
+        expect("replica2 down", await sources(client, "/api/v1/plants/source", 3), ["replica1"] * 3)
+        await set_reachable("replica1", False)
+        expect("both replicas down", await sources(client, "/api/v1/plants/source", 2), ["primary", "primary"])
+        await set_reachable("replica1", True)
+        await set_reachable("replica2", True)
+        expect("replicas back", sorted(await sources(client, "/api/v1/plants/source", 2)), ["replica1", "replica2"])
+
+    for replica in replicas.stats()["replicas"]:
+        print(f"  {replica['name']}: healthy={replica['healthy']} sessions={replica['sessions']}")
+    print(f"  reads falling back to the primary: {replicas.stats()['primary_fallbacks']}")
+
+    primary = await per_session_us(args.sessions, routed=False)
+    routed = await per_session_us(args.sessions, routed=True)
+    print(f"session with one read: primary {primary:.1f} us, replica {routed:.1f} us, routing {routed - primary:+.1f} us")
+
+    await replicas.close()
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+    if failures:
+        print(f"{len(failures)} routing check(s) failed: {', '.join(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmark: list response serialization, ORM + Pydantic vs result tuples + orjson
+
+Serializes pages of inventory levels and transactions two ways: the former
+path (ORM objects validated into the response schema with from_attributes,
+then validated and serialized again by FastAPI's response model) and the
+fast path (RowSerializer over result tuples, encoded by FastJSONResponse).
+Reports
+rows per second for serialization alone and for the whole request served
+in-process, database fetch included, and checks that both paths return
+byte-identical bodies.
+
+Usage:
+    cd backend && python -m benchmarks.bench_serialization --rows 100000 --page-size 5000
+
+Set DATABASE_URL to benchmark against PostgreSQL; otherwise a temporary
+SQLite database is created and populated.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmpdir = None
+if "DATABASE_URL" not in os.environ:
+    _tmpdir = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'bench.db')}"
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from app.api.v1.endpoints import inventory
+from app.core.database import AsyncSessionLocal, Base, async_engine, get_db_async
+from app.core.pagination import apply_keyset, next_cursor
+from app.core.security import get_current_user
+from app.core.serialization import FastJSONResponse
+from app.models.inventory import InventoryLevel, InventoryTransaction, StockType
+from app.schemas.inventory import InventoryLevelList, InventoryTransactionResponse
+
+
+async def populate(rows: int, batch_size: int = 20_000):
+    rng = random.Random(42)
+    now = datetime(2026, 1, 1, 12, 0, 0)
+    stock_types = list(StockType)
+    # A few quantities written in exponent or long decimal form
+    quantities = [0.0, 1.0, 12.5, 1e-05, 2.5e16]
+
+    def quantity():
+        return rng.choice(quantities) if rng.random() < 0.01 else round(rng.uniform(0, 5000), 3)
+
+    async with async_engine.begin() as connection:
+        tables = [InventoryLevel.__table__, InventoryTransaction.__table__]
+        await connection.run_sync(Base.metadata.create_all, tables=tables)
+        for table in tables:
+            await connection.execute(delete(table))
+        for offset in range(0, rows, batch_size):
+            count = min(batch_size, rows - offset)
+            await connection.execute(insert(InventoryLevel), [
+                {
+                    "material_id": f"MAT{i:06d}", "plant_id": f"PLANT{i % 20:03d}",
+                    "storage_location": "WH-A1", "stock_type": stock_types[i % len(stock_types)],
+                    "available_quantity": quantity(), "reserved_quantity": quantity(), "total_quantity": quantity(),
+                    "unit_of_measure": "PCS", "erp_system": "SAP", "erp_material_code": f"E{i}",
+                    "last_updated": now - timedelta(seconds=i, microseconds=i % 7 * 1000), "created_at": now,
+                    "batch_number": None if i % 3 else f"B{i}", "quality_status": "RELEASED",
+                }
+                for i in range(offset, offset + count)
+            ])
+            await connection.execute(insert(InventoryTransaction), [
+                {
+                    "material_id": f"MAT{i:06d}", "plant_id": f"PLANT{i % 20:03d}",
+                    "transaction_type": "OUT" if i % 3 else "IN", "quantity": quantity(),
+                    "unit_of_measure": "PCS", "erp_system": "SAP", "erp_transaction_id": f"T{i}",
+                    "transaction_date": now - timedelta(minutes=i), "created_at": now,
+                    "notes": "Goods issue — line ü" if i % 11 == 0 else None,
+                }
+                for i in range(offset, offset + count)
+            ])
+
+
+def legacy_app() -> FastAPI:
+    """The former handlers: ORM rows returned through response_model"""
+    app = FastAPI()
+
+    @app.get("/levels", response_model=InventoryLevelList)
+    async def levels(page_size: int, db: AsyncSession = Depends(get_db_async)):
+        query = apply_keyset(select(InventoryLevel), inventory.LEVEL_KEYSET, None)
+        items = (await db.execute(query.limit(page_size))).scalars().all()
+        return InventoryLevelList(
+            items=items, page_size=page_size, next_cursor=next_cursor(items, inventory.LEVEL_KEYSET, page_size)
+        )
+
+    @app.get("/transactions", response_model=List[InventoryTransactionResponse])
+    async def transactions(limit: int, db: AsyncSession = Depends(get_db_async)):
+        result = await db.execute(inventory.build_transactions_query(limit=limit))
+        return result.scalars().all()
+
+    return app
+
+
+def current_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(inventory.router, prefix="/inventory")
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "bench", "token_data": {}}
+    return app
+
+
+def best_rate(rows: int, timings) -> float:
+    return rows / min(timings)
+
+
+async def serialization_only(page_size: int, repeats: int):
+    """Rows/s of turning fetched rows into response bytes"""
+    query = apply_keyset(select(InventoryLevel), inventory.LEVEL_KEYSET, None).limit(page_size)
+    async with AsyncSessionLocal() as session:
+        objects = (await session.execute(query)).scalars().all()
+        tuples = (await session.execute(inventory.LEVEL_ROWS.select(query))).all()
+
+    legacy, fast = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        model = InventoryLevelList(items=objects, page_size=page_size, next_cursor=None)
+        # What FastAPI does with a returned model under response_model
+        legacy_body = InventoryLevelList.model_validate(model.model_dump()).model_dump_json().encode()
+        legacy.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        fast_body = FastJSONResponse({
+            "items": inventory.LEVEL_ROWS.rows(tuples), "page_size": page_size, "next_cursor": None
+        }).body
+        fast.append(time.perf_counter() - started)
+    return best_rate(len(objects), legacy), best_rate(len(tuples), fast), legacy_body == fast_body
+
+
+async def end_to_end(page_size: int, repeats: int):
+    """Rows/s and body equality of whole requests, fetch included"""
+    results = []
+    cases = [
+        ("levels page", "/levels", "/inventory/levels", {"page_size": page_size}),
+        ("transactions", "/transactions", "/inventory/transactions", {"limit": page_size}),
+    ]
+    legacy = httpx.AsyncClient(transport=httpx.ASGITransport(app=legacy_app()), base_url="http://bench")
+    current = httpx.AsyncClient(transport=httpx.ASGITransport(app=current_app()), base_url="http://bench")
+    async with legacy, current:
+        for label, legacy_path, current_path, params in cases:
+            timings = {"legacy": [], "current": []}
+            bodies = {}
+            for _ in range(repeats):
+                for name, client, path in (("legacy", legacy, legacy_path), ("current", current, current_path)):
+                    started = time.perf_counter()
+                    response = await client.get(path, params=params)
+                    timings[name].append(time.perf_counter() - started)
+                    response.raise_for_status()
+                    bodies[name] = response.content
+            results.append((
+                label,
+                page_size / statistics.median(timings["legacy"]),
+                page_size / statistics.median(timings["current"]),
+                bodies["legacy"] == bodies["current"],
+            ))
+    return results
+
+
+async def run(args):
+    if _tmpdir is not None:
+        print(f"Populating {args.rows:,} inventory levels and transactions...")
+        await populate(args.rows)
+
+    legacy, fast, identical = await serialization_only(args.page_size, args.repeats)
+    print(f"\nserialization only, {args.page_size:,} inventory levels per page")
+    print(f"  ORM + Pydantic                {legacy:>12,.0f} rows/s")
+    print(f"  tuples + orjson               {fast:>12,.0f} rows/s   {fast / legacy:.1f}x   identical bytes: {identical}")
+
+    print(f"\nwhole request in-process, {args.page_size:,} rows, median of {args.repeats}")
+    print(f"  {'endpoint':<14} {'before rows/s':>14} {'after rows/s':>14} {'speedup':>8}  identical bytes")
+    for label, before, after, same in await end_to_end(args.page_size, args.repeats):
+        print(f"  {label:<14} {before:>14,.0f} {after:>14,.0f} {after / before:>7.1f}x  {same}")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows to create in the temporary database")
+    parser.add_argument("--page-size", type=int, default=5_000)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: worker cold start import time against a budget
+
+Imports main, as every uvicorn worker does at boot, in fresh interpreters
+and reports the median wall time with the slowest top-level imports from
+python -X importtime. Fails when the median exceeds --budget-ms, or when
+a heavy numerical or ML library was actually loaded rather than deferred
+with lazy_import. Startup's database work is a single schema version
+lookup and is not part of the import.
+
+Usage:
+    cd backend && python -m benchmarks.bench_startup --runs 5 --budget-ms 1500
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Must stay deferred until first use
+HEAVY_MODULES = ("numpy", "pandas", "pyarrow", "scipy", "sklearn", "statsmodels", "prophet", "tensorflow")
+
+PROBE = f"""
+import json, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+from app.core.lazy_imports import is_loaded
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {HEAVY_MODULES!r} if is_loaded(name)]}}))
+"""
+
+
+def cold_import():
+    """Seconds to import main, heavy modules loaded and importtime lines"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, check=True
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    return probe["seconds"], probe["loaded"], result.stderr.splitlines()
+
+
+def slowest_imports(lines, limit: int):
+    """Top-level imports by cumulative microseconds"""
+    imports = []
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under the package importing them
+        if name.startswith("  "):
+            continue
+        imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="Allowed median time to import main")
+    parser.add_argument("--top", type=int, default=15, help="Slowest top-level imports shown")
+    args = parser.parse_args()
+
+    runs = [cold_import() for _ in range(args.runs)]
+    median_ms = statistics.median(seconds for seconds, _, _ in runs) * 1000
+    loaded = sorted({name for _, names, _ in runs for name in names})
+
+    print(f"import main, {args.runs} cold interpreters")
+    print(f"  median {median_ms:>8.1f} ms   budget {args.budget_ms:.0f} ms")
+    print(f"  min    {min(seconds for seconds, _, _ in runs) * 1000:>8.1f} ms")
+    print("slowest top-level imports (last run):")
+    for cumulative, name in slowest_imports(runs[-1][2], args.top):
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+    print(f"heavy modules loaded at import: {', '.join(loaded) if loaded else 'none'}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    if loaded:
+        failures.append(f"loaded at import instead of on first use: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
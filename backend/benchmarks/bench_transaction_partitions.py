@@ -0,0 +1,148 @@
+"""
+Benchmark: inventory_transactions query plans before and after partitioning
+
+Seeds an append-only inventory_transactions table spanning several years,
+runs EXPLAIN ANALYZE on the GET /inventory/transactions query for the
+common filter combinations, partitions the table by month with its
+filter-matched and BRIN indexes, and runs the same plans again. Reports
+execution time, buffers touched, partitions scanned and the scan nodes
+used. Needs PostgreSQL; the target database comes from DATABASE_URL and
+its inventory_transactions table is replaced.
+
+Usage:
+    cd backend && python -m benchmarks.bench_transaction_partitions --rows 5000000 --years 3
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.api.v1.endpoints.inventory import build_transactions_query
+from app.core.database import async_engine
+from app.models.inventory import InventoryTransaction
+from app.services.transaction_partitions import TABLE, list_partitions, partition_table
+
+
+def filter_cases(now: datetime, years: int):
+    old_quarter = now - timedelta(days=365 * years - 30)
+    return [
+        ("no filter", {}),
+        ("plant", {"plant_id": "PLANT007"}),
+        ("material", {"material_id": "MAT001234"}),
+        ("plant + material", {"plant_id": "PLANT007", "material_id": "MAT001234"}),
+        ("type", {"transaction_type": "ADJ"}),
+        ("plant + type", {"plant_id": "PLANT007", "transaction_type": "ADJ"}),
+        ("last 30 days", {"start_date": now - timedelta(days=30)}),
+        ("plant + last 30 days", {"plant_id": "PLANT007", "start_date": now - timedelta(days=30)}),
+        ("material + old quarter", {
+            "material_id": "MAT001234", "start_date": old_quarter, "end_date": old_quarter + timedelta(days=90)
+        }),
+        ("all filters + old quarter", {
+            "plant_id": "PLANT007", "material_id": "MAT001234", "transaction_type": "OUT",
+            "start_date": old_quarter, "end_date": old_quarter + timedelta(days=90)
+        }),
+    ]
+
+
+async def seed(rows: int, years: int):
+    async with async_engine.begin() as connection:
+        await connection.execute(text(f"DROP TABLE IF EXISTS {TABLE} CASCADE"))
+        await connection.execute(text(f"DROP TABLE IF EXISTS {TABLE}_unpartitioned CASCADE"))
+        await connection.run_sync(InventoryTransaction.__table__.create)
+        # Rows arrive in date order, as in an append-only ERP feed
+        await connection.execute(text(f"""
+            INSERT INTO {TABLE} (material_id, plant_id, transaction_type, quantity, unit_of_measure,
+                                 erp_system, erp_transaction_id, transaction_date, created_at)
+            SELECT 'MAT' || lpad((hashint % 5000)::text, 6, '0'),
+                   'PLANT' || lpad((hashint % 20)::text, 3, '0'),
+                   CASE WHEN hashint % 50 = 0 THEN 'ADJ' WHEN hashint % 3 = 0 THEN 'IN' ELSE 'OUT' END,
+                   (hashint % 200) + 1, 'PCS', 'SAP', 'T' || i, at, at
+            FROM (
+                SELECT i, hashint4(i)::bigint & 2147483647 AS hashint,
+                       timezone('utc', now()) - make_interval(secs => (:rows - i)::float8 * CAST(:span AS float8) / :rows) AS at
+                FROM generate_series(1, :rows) AS i
+            ) AS generated
+        """), {"rows": rows, "span": years * 365 * 86_400.0})
+        await connection.execute(text(f"ANALYZE {TABLE}"))
+
+
+def _walk(node, nodes, relations):
+    nodes.append(node["Node Type"])
+    if "Relation Name" in node:
+        relations.add(node["Relation Name"])
+    for child in node.get("Plans", []):
+        _walk(child, nodes, relations)
+
+
+async def explain(connection, query, repeats: int):
+    sql = str(query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+    timings, plan = [], None
+    for _ in range(repeats):
+        result = await connection.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"))
+        document = result.scalar()
+        plan = (json.loads(document) if isinstance(document, str) else document)[0]
+        timings.append(plan["Execution Time"])
+    nodes, relations = [], set()
+    _walk(plan["Plan"], nodes, relations)
+    root = plan["Plan"]
+    buffers = root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0)
+    scans = sorted({node for node in nodes if "Scan" in node})
+    return statistics.median(timings), buffers, len(relations), ", ".join(scans)
+
+
+async def measure(cases, repeats: int):
+    results = {}
+    async with async_engine.connect() as connection:
+        for label, filters in cases:
+            results[label] = await explain(connection, build_transactions_query(**filters, limit=100), repeats)
+    return results
+
+
+async def run(args):
+    started = time.perf_counter()
+    await seed(args.rows, args.years)
+    print(f"seeded {args.rows:,} transactions over {args.years} years in {time.perf_counter() - started:.1f} s")
+    cases = filter_cases(datetime.utcnow(), args.years)
+
+    before = await measure(cases, args.repeats)
+    started = time.perf_counter()
+    async with async_engine.begin() as connection:
+        await partition_table(connection)
+        await connection.execute(text(f"ANALYZE {TABLE}"))
+        partitions = len(await list_partitions(connection))
+    print(f"partitioned into {partitions} partitions in {time.perf_counter() - started:.1f} s")
+    after = await measure(cases, args.repeats)
+    await async_engine.dispose()
+
+    print(f"\n{'filters':<26} {'before ms':>10} {'buffers':>9}   {'after ms':>9} {'buffers':>9} {'parts':>6}  scans after")
+    for label, _ in cases:
+        before_ms, before_buffers, _, before_scans = before[label]
+        after_ms, after_buffers, parts, after_scans = after[label]
+        print(
+            f"{label:<26} {before_ms:>10.2f} {before_buffers:>9,}   {after_ms:>9.2f} {after_buffers:>9,} "
+            f"{parts:>6}  {after_scans}"
+        )
+        if args.verbose:
+            print(f"{'':<26} before: {before_scans}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3, help="EXPLAIN ANALYZE runs per query (median)")
+    parser.add_argument("--verbose", action="store_true", help="Also print the scan nodes before partitioning")
+    args = parser.parse_args()
+
+    if async_engine.dialect.name != "postgresql":
+        parser.error("DATABASE_URL must point at PostgreSQL")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Local stand-ins for the SAP and Oracle ERP interfaces
+
+StandInSAPServer answers the SAP_DELTA_FUNCTION RFC contract over a
+JSON-lines TCP socket, and StandInRFCConnection is a blocking client with
+the same call()/close() surface as pyrfc.Connection. StandInOracleServer
+serves the Fusion inventory REST resources over HTTP. Both read from a
+ChangeLog that tests and benchmarks append ERP activity to.
+"""
+
+import asyncio
+import bisect
+import json
+import random
+import socket
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Query
+
+SAP_TIMESTAMP = "%Y%m%d%H%M%S"
+
+
+class ChangeLog:
+    """Changed records per (plant, entity), ordered by change time"""
+
+    def __init__(self, materials_per_plant: int = 500, seed: int = 42):
+        self.materials_per_plant = materials_per_plant
+        self._rng = random.Random(seed)
+        self._records: Dict[Tuple[str, str], List[Tuple[datetime, int, Dict]]] = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _append(self, plant_id: str, entity: str, changed_at: datetime, record: Dict):
+        with self._lock:
+            self._sequence += 1
+            self._records.setdefault((plant_id, entity), []).append((changed_at, self._sequence, record))
+
+    def changes(self, plant_id: str, entity: str, since: datetime, offset: int, limit: int) -> Tuple[List[Dict], bool]:
+        with self._lock:
+            records = self._records.get((plant_id, entity), [])
+            start = bisect.bisect_left(records, (since, 0))
+            page = records[start + offset:start + offset + limit]
+            has_more = start + offset + limit < len(records)
+        return [record for _, _, record in page], has_more
+
+    @staticmethod
+    def _times(count: int, spread: float) -> List[datetime]:
+        """Change times spread evenly over the last spread seconds"""
+        now = datetime.utcnow()
+        return [now - timedelta(seconds=spread * (count - i) / count) for i in range(count)]
+
+    def add_sap_activity(self, plant_id: str, movements: int, stock_changes: int, spread: float = 30.0):
+        for now in self._times(movements, spread):
+            self._sequence_document = getattr(self, "_sequence_document", 4_900_000_000) + 1
+            issue = self._rng.random() < 0.7
+            self._append(plant_id, "MOVEMENTS", now, {
+                "MJAHR": str(now.year),
+                "MBLNR": str(self._sequence_document),
+                "ZEILE": "0001",
+                "MATNR": f"{self._rng.randrange(self.materials_per_plant):018d}",
+                "WERKS": plant_id,
+                "MENGE": f"{self._rng.randint(1, 200)}.000",
+                "MEINS": "PC",
+                "SHKZG": "H" if issue else "S",
+                "BWART": "261" if issue else "101",
+                "BUDAT": now.strftime("%Y%m%d"),
+                "CHANGED_AT": now.strftime(SAP_TIMESTAMP),
+            })
+        for now in self._times(stock_changes, spread):
+            self._append(plant_id, "STOCK", now, {
+                "MATNR": f"{self._rng.randrange(self.materials_per_plant):018d}",
+                "WERKS": plant_id,
+                "LGORT": "0001",
+                "CHARG": "",
+                "LABST": f"{self._rng.uniform(0, 2000):.3f}",
+                "MEINS": "PC",
+                "CHANGED_AT": now.strftime(SAP_TIMESTAMP),
+            })
+
+    def add_oracle_activity(self, plant_id: str, transactions: int, onhand_changes: int, spread: float = 30.0):
+        for now in self._times(transactions, spread):
+            stamp = now.isoformat(timespec="milliseconds") + "+00:00"
+            self._sequence_transaction = getattr(self, "_sequence_transaction", 10_000_000) + 1
+            quantity = self._rng.randint(1, 200) * (-1 if self._rng.random() < 0.7 else 1)
+            self._append(plant_id, "inventoryTransactions", now, {
+                "TransactionId": self._sequence_transaction,
+                "ItemNumber": f"AS-{self._rng.randrange(self.materials_per_plant):05d}",
+                "OrganizationCode": plant_id,
+                "TransactionQuantity": quantity,
+                "TransactionUom": "Ea",
+                "TransactionTypeName": "Sales Order Issue" if quantity < 0 else "PO Receipt",
+                "TransactionDate": stamp,
+                "LastUpdateDate": stamp,
+            })
+        for now in self._times(onhand_changes, spread):
+            stamp = now.isoformat(timespec="milliseconds") + "+00:00"
+            onhand = round(self._rng.uniform(0, 2000), 2)
+            self._append(plant_id, "inventoryOnhandBalances", now, {
+                "ItemNumber": f"AS-{self._rng.randrange(self.materials_per_plant):05d}",
+                "OrganizationCode": plant_id,
+                "SubinventoryCode": "STORES",
+                "OnhandQuantity": onhand,
+                "ReservedQuantity": 0,
+                "AvailableQuantity": onhand,
+                "PrimaryUomCode": "Ea",
+                "LastUpdateDate": stamp,
+            })
+
+
+class _RFCHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line)
+            params = request["params"]
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            since = datetime.strptime(params["IV_SINCE"], SAP_TIMESTAMP) if int(params["IV_SINCE"]) else datetime.min
+            rows, has_more = self.server.change_log.changes(
+                params["IV_PLANT"], params["IV_ENTITY"], since, params["IV_OFFSET"], params["IV_MAX_ROWS"]
+            )
+            self.wfile.write(json.dumps({"ET_ROWS": rows, "EV_HAS_MORE": has_more}).encode() + b"\n")
+
+
+class StandInSAPServer(socketserver.ThreadingTCPServer):
+    """RFC stand-in; latency is added to every call in seconds"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, change_log: ChangeLog, latency: float = 0.0, port: int = 0):
+        super().__init__(("127.0.0.1", port), _RFCHandler)
+        self.change_log = change_log
+        self.latency = latency
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def start(self) -> "StandInSAPServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def connection_factory(self):
+        host, port = self.server_address
+        return lambda: StandInRFCConnection(host, port)
+
+
+class StandInRFCConnection:
+    """Blocking client with the pyrfc.Connection call()/close() surface"""
+
+    def __init__(self, host: str, port: int):
+        self._socket = socket.create_connection((host, port))
+        self._file = self._socket.makefile("rwb")
+
+    def call(self, function: str, **params) -> Dict:
+        self._file.write(json.dumps({"function": function, "params": params}).encode() + b"\n")
+        self._file.flush()
+        return json.loads(self._file.readline())
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+
+def oracle_app(change_log: ChangeLog, latency: float = 0.0) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/fscmRestApi/resources/{version}/{resource}")
+    async def resource(
+        resource: str,
+        q: str = Query(""),
+        limit: int = Query(25),
+        offset: int = Query(0)
+    ):
+        if latency:
+            await asyncio.sleep(latency)
+        filters = dict(part.replace(">=", "=").split("=", 1) for part in q.split(";") if part)
+        plant_id = filters["OrganizationCode"][1:-1].replace("''", "'")
+        since = datetime.min
+        if "LastUpdateDate" in filters:
+            since = datetime.fromisoformat(filters["LastUpdateDate"].strip("'")).replace(tzinfo=None)
+        items, has_more = change_log.changes(plant_id, resource, since, offset, limit)
+        return {"items": items, "count": len(items), "hasMore": has_more, "limit": limit, "offset": offset}
+
+    return app
+
+
+class StandInOracleServer:
+    """Fusion REST stand-in served by uvicorn in a background thread"""
+
+    def __init__(self, change_log: ChangeLog, latency: float = 0.0, port: int = 0):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", port))
+        self.port = sock.getsockname()[1]
+        sock.close()
+        config = uvicorn.Config(oracle_app(change_log, latency), host="127.0.0.1", port=self.port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "StandInOracleServer":
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def backdate(change_log: ChangeLog, seconds: float):
+    """Shift every recorded change into the past, e.g. to simulate ERP history"""
+    shift = timedelta(seconds=seconds)
+    with change_log._lock:
+        for key, records in change_log._records.items():
+            change_log._records[key] = [(changed_at - shift, sequence, record) for changed_at, sequence, record in records]
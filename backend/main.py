@@ -13,10 +13,17 @@ import structlog
 from typing import Dict, Any
 
 from app.core.config import settings
-from app.core.database import init_db
-from app.core.security import get_current_user
+from app.core.cache import response_cache
+from app.core.database import async_engine, close_db, engine, init_db, replicas
+from app.core.metrics import MetricsMiddleware, metrics_exporter
+from app.core.query_profiler import ProfilerMiddleware, query_profiler
+from app.core.replicas import ReplicaRoutingMiddleware
+from app.core.security import get_current_user, password_hasher
 from app.api.v1.api import api_router
+from app.api.v1.endpoints import live
 from app.core.logging import setup_logging
+from app.services.live_updates import live_updates
+from app.services.model_training import shutdown_training_scheduler
 
 # Setup structured logging
 setup_logging()
@@ -32,11 +39,27 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Inventory Health AI application")
     await init_db()
     logger.info("Database initialized successfully")
+    await replicas.start()
+    if settings.ENABLE_METRICS:
+        metrics_exporter.start({
+            "sync": engine,
+            "async": async_engine.sync_engine,
+            **{name: replica.sync_engine for name, replica in replicas.engines().items()}
+        })
+    if settings.QUERY_PROFILER_ENABLED:
+        query_profiler.start({"sync": engine, "async": async_engine, **replicas.engines()})
     
     yield
     
     # Shutdown
     logger.info("Shutting down Inventory Health AI application")
+    await live_updates.close()
+    await response_cache.close()
+    shutdown_training_scheduler()
+    password_hasher.shutdown()
+    if settings.ENABLE_METRICS:
+        metrics_exporter.close()
+    await close_db()
 
 def create_application() -> FastAPI:
     """Create and configure FastAPI application"""
@@ -66,9 +89,24 @@ def create_application() -> FastAPI:
         allow_headers=["*"],
     )
     
+    # Dashboard reads on the read replicas, when there are any
+    if settings.DATABASE_REPLICA_URLS:
+        app.add_middleware(ReplicaRoutingMiddleware)
+    
+    # Per-request query profiles, headers only in debug mode
+    if settings.QUERY_PROFILER_ENABLED:
+        app.add_middleware(ProfilerMiddleware)
+    
+    # Request metrics, outermost so they include the other middleware
+    if settings.ENABLE_METRICS:
+        app.add_middleware(MetricsMiddleware)
+    
     # Include API routes
     app.include_router(api_router, prefix="/api/v1")
     
+    # Live update WebSocket, at /ws as documented
+    app.include_router(live.router, tags=["live updates"])
+    
     # Health check endpoint
     @app.get("/health")
     async def health_check() -> Dict[str, Any]:
@@ -0,0 +1,43 @@
+"""
+Shared fixtures: SQLite databases standing in for PostgreSQL servers
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The application's own engines are created at import; without a server
+# they point at a throwaway SQLite file
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir.name, 'app.db')}")
+
+from app.core.database import Base
+
+
+@pytest.fixture
+def sqlite_database(tmp_path):
+    """Factory creating a SQLite file with the given tables and rows
+
+    Returns the async engine of the new database. Engines use NullPool so
+    each test's event loop opens its own connections.
+    """
+    def create(name: str, rows=None):
+        path = tmp_path / name / f"{name}.db"
+        path.parent.mkdir()
+        setup = create_engine(f"sqlite:///{path}")
+        with setup.begin() as connection:
+            Base.metadata.create_all(connection, tables=[model.__table__ for model in (rows or {})])
+            for model, values in (rows or {}).items():
+                if values:
+                    connection.execute(insert(model), values)
+        setup.dispose()
+        return create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+    return create
@@ -0,0 +1,151 @@
+"""
+Token and user caches behind request authentication
+"""
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.v1.endpoints.live import _authenticate
+from app.core import security
+from app.core.auth_cache import UserCache, VerifiedTokenCache
+from app.core.cache import LRUCacheBackend
+from app.core.security import DEMO_ROLE, DEMO_USERNAME, authenticate, create_access_token, verify_token
+
+USERS = {
+    "planner": {"role": "manager", "is_active": True, "full_name": "Planner"},
+    "leaver": {"role": "admin", "is_active": False, "full_name": "Leaver"},
+}
+
+
+class UnreachableBackend(LRUCacheBackend):
+    async def incr(self, key: str):
+        return None
+
+
+def worker(backend, **options) -> VerifiedTokenCache:
+    return VerifiedTokenCache(verify_token, backend=backend, check_interval=0, **options)
+
+
+def test_revoked_token_is_rejected_by_every_worker():
+    backend = LRUCacheBackend()
+    first, second = worker(backend), worker(backend)
+    token, other = create_access_token({"sub": "planner"}), create_access_token({"sub": "planner", "n": 2})
+
+    async def scenario():
+        payload = await first.claims(token)
+        assert payload["sub"] == "planner"
+        assert await second.claims(token) == payload
+        assert await second.claims(other) is not None
+
+        await first.revoke(token, payload)
+        assert await first.claims(token) is None
+        # The other worker drops its verified tokens on the next check
+        assert await second.claims(token) is None
+        assert await second.claims(other) is not None
+
+    asyncio.run(scenario())
+
+
+def test_revocation_without_counter_still_rejects_token():
+    cache = worker(UnreachableBackend())
+    token = create_access_token({"sub": "planner"})
+
+    async def scenario():
+        payload = await cache.claims(token)
+        await cache.revoke(token, payload)
+        assert await cache.claims(token) is None
+
+    asyncio.run(scenario())
+
+
+def test_cached_claims_expire_with_the_token():
+    cache = worker(LRUCacheBackend(), ttl=300)
+    token = create_access_token({"sub": "planner"}, expires_delta=timedelta(seconds=1))
+
+    async def scenario():
+        assert await cache.claims(token) is not None
+        # exp and the decoder's clock both have one-second resolution
+        await asyncio.sleep(2.1)
+        assert await cache.claims(token) is None
+
+    asyncio.run(scenario())
+
+
+def test_user_cache_loads_each_user_once():
+    calls = []
+    fail = {"planner": True}
+
+    async def load(username):
+        calls.append(username)
+        await asyncio.sleep(0.01)
+        if fail.pop(username, False):
+            raise ConnectionError("database unavailable")
+        return USERS.get(username)
+
+    cache = UserCache(load, ttl=60)
+
+    async def scenario():
+        # Every waiter of a failed load sees the failure; the next request retries
+        results = await asyncio.gather(*(cache.get("planner") for _ in range(10)), return_exceptions=True)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert calls == ["planner"]
+
+        assert await asyncio.gather(*(cache.get("planner") for _ in range(10))) == [USERS["planner"]] * 10
+        assert await asyncio.gather(*(cache.get("ghost") for _ in range(5))) == [None] * 5
+        assert calls == ["planner", "planner", "ghost"]
+
+        cache.invalidate("planner")
+        await cache.get("planner")
+        assert calls[-1] == "planner" and len(calls) == 4
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def users(monkeypatch):
+    """Authentication against USERS; set state['down'] to fail lookups"""
+    state = {"down": False}
+
+    async def load(username):
+        if state["down"]:
+            raise ConnectionError("database unavailable")
+        return USERS.get(username)
+
+    monkeypatch.setattr(security, "token_cache", worker(LRUCacheBackend()))
+    monkeypatch.setattr(security, "user_cache", UserCache(load, ttl=0))
+    return state
+
+
+def outcome(token: str):
+    """Role granted to token, or the status code it is refused with"""
+    try:
+        return asyncio.run(authenticate(token))["role"]
+    except HTTPException as e:
+        return e.status_code
+
+
+def test_authenticate_takes_role_from_the_users_table(users):
+    # A role claim in the token is never trusted
+    assert outcome(create_access_token({"sub": "planner", "role": "admin"})) == "manager"
+    assert outcome(create_access_token({"sub": DEMO_USERNAME, "role": "admin"})) == DEMO_ROLE
+    assert outcome("not-a-token") == 401
+    assert outcome(create_access_token({"role": "admin"})) == 401
+
+
+def test_authenticate_refuses_missing_and_inactive_users(users):
+    assert outcome(create_access_token({"sub": "ghost"})) == 401
+    assert outcome(create_access_token({"sub": "leaver"})) == 401
+    assert asyncio.run(_authenticate(create_access_token({"sub": "ghost"}))) is False
+    assert asyncio.run(_authenticate(create_access_token({"sub": "planner"}))) is True
+
+
+def test_authenticate_fails_closed_when_lookup_fails(users):
+    users["down"] = True
+    assert outcome(create_access_token({"sub": "planner"})) == 503
+    assert outcome(create_access_token({"sub": "leaver", "role": "admin"})) == 503
+    # The demo login has no user row to look up
+    assert outcome(create_access_token({"sub": DEMO_USERNAME})) == DEMO_ROLE
+    assert asyncio.run(_authenticate(create_access_token({"sub": "planner"}))) is False
@@ -0,0 +1,134 @@
+"""
+ERP extract normalization and upserts against a SQLite stand-in
+"""
+
+import asyncio
+
+import pandas as pd
+from sqlalchemy import func, select
+
+from app.core.cache import LRUCacheBackend, response_cache
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.services.erp_ingestion import (
+    TARGETS, BulkLoader, IngestionReport, _upsert_from_staging_sql, ensure_upsert_index, ingest_file, normalize,
+    upsert_frame
+)
+
+LEVELS = TARGETS["inventory_levels"]
+
+
+def stock_extract(quantities):
+    return pd.DataFrame({
+        "MATNR": [f"MAT{i:06d}" for i in range(len(quantities))],
+        "WERKS": "1000",
+        "LGORT": "0001",
+        "LABST": [str(quantity) for quantity in quantities],
+        "MEINS": "EA",
+    })
+
+
+def normalized_levels(quantities):
+    report = IngestionReport(table=LEVELS.name, source="test", erp_system="SAP")
+    return normalize(stock_extract(quantities), LEVELS, "SAP", report)
+
+
+async def stored_levels(engine):
+    async with engine.connect() as connection:
+        result = await connection.execute(
+            select(InventoryLevel.material_id, InventoryLevel.available_quantity, InventoryLevel.last_updated)
+        )
+        return {row.material_id: row for row in result}
+
+
+def test_upsert_skips_unchanged_rows(sqlite_database):
+    engine = sqlite_database("upsert", {InventoryLevel: []})
+
+    async def upsert(quantities):
+        async with engine.connect() as connection:
+            await ensure_upsert_index(connection, LEVELS)
+            changed = await upsert_frame(connection, LEVELS, normalized_levels(quantities))
+            await connection.commit()
+            return changed
+
+    async def scenario():
+        assert await upsert([10, 20, 30]) == 3
+        first = await stored_levels(engine)
+
+        # Re-reading the same records rewrites nothing
+        assert await upsert([10, 20, 30]) == 0
+        assert await stored_levels(engine) == first
+
+        assert await upsert([10, 25, 30]) == 1
+        second = await stored_levels(engine)
+        assert second["MAT000001"].available_quantity == 25
+        assert second["MAT000001"].last_updated > first["MAT000001"].last_updated
+        assert second["MAT000000"] == first["MAT000000"]
+        assert second["MAT000002"] == first["MAT000002"]
+
+    asyncio.run(scenario())
+
+
+MSEG = """MBLNR,MJAHR,ZEILE,MATNR,WERKS,MENGE,MEINS,SHKZG,BWART,BUDAT
+4900000001,2024,0001,  MAT000001 ,1000,5,EA,H,261,2024-03-01
+4900000001,2024,0002,MAT000002,1000,12.5,EA,S,101,2024-03-01
+4900000002,2024,0001,,1000,3,EA,H,261,2024-03-02
+4900000003,2024,0001,MAT000003,1000,7,EA,X,261,2024-03-02
+4900000004,2024,0001,MAT000001,1000,not a number,EA,H,261,2024-03-03
+"""
+
+
+def test_ingest_extract_normalizes_rejects_and_reloads(sqlite_database, monkeypatch, tmp_path):
+    monkeypatch.setattr(response_cache, "_backend", LRUCacheBackend())
+    engine = sqlite_database("ingest", {InventoryTransaction: []})
+    extract = tmp_path / "mseg.csv"
+    extract.write_text(MSEG)
+
+    async def ingest(text):
+        extract.write_text(text)
+        return await ingest_file(str(extract), "inventory_transactions", "SAP", chunk_rows=2, loader=BulkLoader(engine))
+
+    async def transactions():
+        async with engine.connect() as connection:
+            result = await connection.execute(select(
+                InventoryTransaction.erp_transaction_id, InventoryTransaction.material_id,
+                InventoryTransaction.transaction_type, InventoryTransaction.quantity
+            ).order_by(InventoryTransaction.erp_transaction_id))
+            return [tuple(row) for row in result]
+
+    async def scenario():
+        report = await ingest(MSEG)
+        assert (report.rows_read, report.rows_staged, report.rows_upserted, report.chunks) == (5, 2, 2, 3)
+        assert report.rejected_reasons == {"missing_required": 2, "unknown_transaction_type": 1}
+        assert await transactions() == [
+            ("2024-4900000001-0001", "MAT000001", "OUT", 5.0),
+            ("2024-4900000001-0002", "MAT000002", "IN", 12.5),
+        ]
+
+        # Loading the same extract again changes nothing
+        report = await ingest(MSEG)
+        assert report.rows_upserted == 0
+        async with engine.connect() as connection:
+            assert await connection.scalar(select(func.count()).select_from(InventoryTransaction)) == 2
+
+        # A corrected line updates its row in place
+        report = await ingest(MSEG.replace("12.5,EA,S", "13,EA,S"))
+        assert report.rows_upserted == 1
+        assert (await transactions())[1] == ("2024-4900000001-0002", "MAT000002", "IN", 13.0)
+
+    asyncio.run(scenario())
+
+
+def test_staging_upsert_keeps_latest_row_and_skips_unchanged():
+    # The COPY path needs PostgreSQL; its upsert statement is checked as built
+    sql = _upsert_from_staging_sql(LEVELS, "staging_levels")
+    key = '"erp_system", "plant_id", "material_id", "storage_location", "batch_number"'
+    assert f"SELECT DISTINCT ON ({key})" in sql
+    assert f"ORDER BY {key}, _row DESC" in sql
+    assert f"ON CONFLICT ({key}) DO UPDATE SET" in sql
+    assert '"last_updated" = EXCLUDED."last_updated"' in sql
+    # Only rows whose non-key columns differ are rewritten
+    compared = sql.split(" WHERE ", 1)[1]
+    assert " IS DISTINCT FROM " in compared
+    assert '"inventory_levels"."available_quantity"' in compared
+    assert 'EXCLUDED."available_quantity"' in compared
+    assert '"material_id"' not in compared and '"last_updated"' not in compared
@@ -0,0 +1,151 @@
+"""
+ERP delta sync against the local SAP and Oracle stand-ins
+"""
+
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlalchemy import func, select
+
+from app.core.cache import LRUCacheBackend, response_cache
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.models.plants import Plant
+from app.services.erp_connectors import OracleConnector, SAPConnector
+from app.services.erp_sync import ERPSyncEngine, sync_watermarks
+from benchmarks.erp_standins import ChangeLog, StandInOracleServer, StandInSAPServer
+
+PLANTS = {"SAP": ["1000", "1001"], "Oracle": ["M1", "M2"]}
+HISTORY = 200
+DELTA = 30
+
+
+@pytest.fixture
+def change_log():
+    return ChangeLog(materials_per_plant=50)
+
+
+@pytest.fixture
+def sync_engine(change_log, sqlite_database, monkeypatch):
+    monkeypatch.setattr(response_cache, "_backend", LRUCacheBackend())
+    engine = sqlite_database("erp", {
+        Plant: [
+            {"plant_code": plant_id, "plant_name": plant_id, "erp_system": erp_system, "is_active": True}
+            for erp_system, plants in PLANTS.items()
+            for plant_id in plants
+        ],
+        InventoryLevel: [],
+        InventoryTransaction: [],
+    })
+    sap_server = StandInSAPServer(change_log).start()
+    oracle_server = StandInOracleServer(change_log).start()
+    yield ERPSyncEngine({
+        "SAP": SAPConnector(sap_server.connection_factory(), max_workers=2),
+        "Oracle": OracleConnector(oracle_server.base_url, max_connections=2),
+    }, engine=engine, overlap_seconds=0)
+    sap_server.stop()
+    oracle_server.stop()
+
+
+def erp_entity(erp_system: str, table: str) -> str:
+    connector = SAPConnector if erp_system == "SAP" else OracleConnector
+    return (connector.ENTITIES if erp_system == "SAP" else connector.RESOURCES)[table]
+
+
+def add_activity(change_log: ChangeLog, erp_system: str, plant_id: str, count: int, spread: float = 30.0):
+    if erp_system == "SAP":
+        change_log.add_sap_activity(plant_id, count, count // 10, spread)
+    else:
+        change_log.add_oracle_activity(plant_id, count, count // 10, spread)
+
+
+def applied(stats, expected: int) -> bool:
+    """Transactions are applied one per change; level changes to one row within a page collapse"""
+    if stats.entity == "inventory_transactions":
+        return stats.records == expected
+    return 0 < stats.records <= expected if expected else stats.records == 0
+
+
+def pending(change_log: ChangeLog, erp_system: str, plant_id: str, table: str, since: datetime) -> int:
+    """Changes the ERP returns for a source since a watermark"""
+    records, _ = change_log.changes(plant_id, erp_entity(erp_system, table), since, 0, 10 ** 9)
+    return len(records)
+
+
+async def watermarks(engine):
+    async with engine.connect() as connection:
+        result = await connection.execute(select(sync_watermarks))
+        return {(row.erp_system, row.plant_id, row.entity): row for row in result}
+
+
+async def count(engine, model) -> int:
+    async with engine.connect() as connection:
+        return await connection.scalar(select(func.count()).select_from(model))
+
+
+def test_sync_pulls_history_then_only_deltas(sync_engine, change_log):
+    engine = sync_engine.engine
+    for erp_system, plants in PLANTS.items():
+        for plant_id in plants:
+            add_activity(change_log, erp_system, plant_id, HISTORY)
+
+    async def scenario():
+        try:
+            initial = {(s.erp_system, s.plant_id, s.entity): s for s in await sync_engine.sync_once()}
+            assert len(initial) == 8
+            for (erp_system, plant_id, table), stats in initial.items():
+                assert stats.error is None
+                assert applied(stats, pending(change_log, erp_system, plant_id, table, datetime.min))
+            assert await count(engine, InventoryTransaction) == 4 * HISTORY
+            assert 0 < await count(engine, InventoryLevel) <= 4 * (HISTORY // 10)
+
+            first = await watermarks(engine)
+            assert set(first) == set(initial)
+            assert all(row.watermark is not None for row in first.values())
+
+            # New activity at one plant of each ERP only, stamped after the
+            # watermarks at SAP's one-second resolution
+            await asyncio.sleep(1.5)
+            changed = {("SAP", "1000"), ("Oracle", "M2")}
+            for erp_system, plant_id in changed:
+                add_activity(change_log, erp_system, plant_id, DELTA, spread=0.2)
+
+            delta = {(s.erp_system, s.plant_id, s.entity): s for s in await sync_engine.sync_once()}
+            second = await watermarks(engine)
+            for key, stats in delta.items():
+                erp_system, plant_id, table = key
+                assert stats.error is None
+                # Only what changed since the source's own watermark is
+                # written; records re-read at the watermark are unchanged
+                if (erp_system, plant_id) in changed:
+                    assert applied(stats, DELTA if table == "inventory_transactions" else DELTA // 10)
+                    assert second[key].watermark > first[key].watermark
+                else:
+                    assert stats.records == 0
+                    assert second[key].watermark == first[key].watermark
+            assert await count(engine, InventoryTransaction) == 4 * HISTORY + 2 * DELTA
+        finally:
+            await sync_engine.close()
+
+    asyncio.run(scenario())
+
+
+def test_oracle_filter_quotes_plant_id():
+    queries = []
+
+    def handler(request: httpx.Request):
+        queries.append(request.url.params["q"])
+        return httpx.Response(200, json={"items": [], "hasMore": False})
+
+    connector = OracleConnector(client=httpx.AsyncClient(
+        base_url="http://oracle", transport=httpx.MockTransport(handler)
+    ))
+
+    async def scenario():
+        async for _ in connector.fetch_changes("M1' OR 1=1 OR 'x", "inventory_levels", datetime(2024, 1, 1)):
+            pass
+        await connector.close()
+
+    asyncio.run(scenario())
+    assert queries == ["OrganizationCode='M1'' OR 1=1 OR ''x';LastUpdateDate>='2024-01-01T00:00:00'"]
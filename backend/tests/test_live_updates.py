@@ -0,0 +1,49 @@
+"""
+Change feed polling against a SQLite stand-in
+"""
+
+import asyncio
+from datetime import datetime
+
+import orjson
+from sqlalchemy import insert
+
+from app.models.inventory import InventoryAlert, InventoryLevel
+from app.services.live_updates import ChangeFeed
+
+
+def levels(first: int, count: int, at: datetime):
+    return [
+        {"material_id": f"MAT{i:06d}", "plant_id": "PLANT001", "total_quantity": float(i), "last_updated": at}
+        for i in range(first, first + count)
+    ]
+
+
+def test_overlap_rescan_skips_sent_rows(sqlite_database):
+    engine = sqlite_database("feed", {InventoryLevel: [], InventoryAlert: []})
+    published = []
+
+    async def publish(payload: bytes):
+        published.extend(row["material_id"] for row in orjson.loads(payload)["data"])
+
+    feed = ChangeFeed(publish, engine=engine, overlap_seconds=60, batch_rows=5)
+
+    async def scenario():
+        await feed.follow()
+        # A bulk update wider than a batch, all inside the overlap window
+        async with engine.begin() as connection:
+            await connection.execute(insert(InventoryLevel), levels(0, 12, datetime.utcnow()))
+
+        # At most a batch is published per poll
+        assert [await feed.poll() for _ in range(3)] == [5, 5, 2]
+        assert len(set(published)) == 12
+        # Re-reading the window finds nothing new in a single poll
+        assert await feed.poll() == 0
+
+        async with engine.begin() as connection:
+            await connection.execute(insert(InventoryLevel), levels(12, 1, datetime.utcnow()))
+        assert await feed.poll() == 1
+        assert published[-1] == "MAT000012"
+        assert len(published) == 13
+
+    asyncio.run(scenario())
@@ -0,0 +1,119 @@
+"""
+Vectorized reorder points against the per-series formulas
+"""
+
+import asyncio
+import math
+from datetime import date, datetime, time, timedelta
+from statistics import NormalDist, mean, stdev
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.inventory import InventoryLevel, InventoryTransaction
+from app.services.ai_optimization import OptimizationService, material_lead_times
+from app.services.batch_optimization import abc_classes, demand_moments, optimize_reorder_points, service_level_z
+from app.services.model_store import ModelStore
+
+DAYS = 30
+
+
+def reorder_point(daily, lead_time, lead_time_std, service_level):
+    """The textbook formulas, one series at a time"""
+    d, s = mean(daily), stdev(daily)
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * math.sqrt(lead_time * s * s + d * d * lead_time_std * lead_time_std)
+    return d * lead_time + safety_stock, safety_stock
+
+
+def test_vectorized_policy_matches_per_series_formulas():
+    rng = np.random.default_rng(3)
+    daily = rng.gamma(1.2, 10.0, (200, DAYS)) * (rng.random((200, DAYS)) < 0.4)
+    lead_time = rng.uniform(2, 30, 200)
+    lead_time_std = rng.uniform(0, 5, 200)
+    service_level = rng.choice([0.9, 0.95, 0.99], 200)
+
+    demand_mean, demand_std = demand_moments(daily.sum(axis=1), (daily ** 2).sum(axis=1), DAYS)
+    policy = optimize_reorder_points(demand_mean, demand_std, lead_time, lead_time_std, service_level)
+    for row in range(200):
+        expected, safety_stock = reorder_point(daily[row].tolist(), lead_time[row], lead_time_std[row], service_level[row])
+        assert math.isclose(policy["reorder_point"][row], expected, rel_tol=1e-9, abs_tol=1e-9)
+        assert math.isclose(policy["safety_stock"][row], safety_stock, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_abc_classes_per_group():
+    groups = np.array([0, 0, 0, 0, 1, 1, 2])
+    demand = np.array([10.0, 70.0, 15.0, 5.0, 1.0, 9.0, 0.0])
+    # Group 0: 70 is A, 15 starts at 70% (A), 10 at 85% (B), 5 at 95% (C)
+    np.testing.assert_array_equal(abc_classes(groups, demand), [1, 0, 0, 2, 1, 0, 2])
+
+
+def test_service_levels_are_clipped():
+    z = service_level_z(np.array([0.2, 0.5, 0.95, 1.0]))
+    assert z[0] == z[1] == 0.0
+    assert math.isclose(z[2], NormalDist().inv_cdf(0.95))
+    assert math.isfinite(z[3])
+
+
+def demand(material_id: str, quantities):
+    end = date.today()
+    return [
+        {
+            "material_id": material_id, "plant_id": "PLANT001", "transaction_type": "OUT", "quantity": quantity,
+            "transaction_date": datetime.combine(end - timedelta(days=DAYS - day), time(12))
+        }
+        for day, quantity in enumerate(quantities) if quantity
+    ]
+
+
+def test_run_stores_the_catalog_policy(sqlite_database, tmp_path):
+    daily = {
+        "MATA": [60.0 if day % 2 else 80.0 for day in range(DAYS)],
+        "MATB": [40.0 if day % 2 else 0.0 for day in range(DAYS)],
+        "MATC": [10.0] * DAYS,
+    }
+    engine = sqlite_database("optimize", {
+        InventoryTransaction: [row for material_id, quantities in daily.items() for row in demand(material_id, quantities)],
+        InventoryLevel: [
+            {"material_id": "MATA", "plant_id": "PLANT001", "total_quantity": 100.0},
+            {"material_id": "MATC", "plant_id": "PLANT001", "total_quantity": 10000.0},
+        ],
+    })
+    service = OptimizationService(ModelStore(root=str(tmp_path / "models"), kind="optimization"))
+
+    async def scenario():
+        async with engine.begin() as connection:
+            await connection.run_sync(material_lead_times.create)
+            await connection.execute(insert(material_lead_times), [{
+                "plant_id": "PLANT001", "material_id": "MATB",
+                "lead_time_days": 5.0, "lead_time_std_days": 1.0, "service_level": 0.99,
+            }])
+        async with AsyncSession(engine) as db:
+            result = await service.run_optimization(db, lookback_days=DAYS)
+        assert (result["series"], result["plants"]) == (3, 1)
+        return {material_id: await service.calculate_optimal_reorder_points(material_id, "PLANT001")
+                for material_id in daily}
+
+    policies = asyncio.run(scenario())
+
+    # MATA and MATB make up 90% of demand
+    defaults = (settings.OPTIMIZATION_LEAD_TIME_DAYS, settings.OPTIMIZATION_LEAD_TIME_STD_DAYS)
+    expected = {
+        "MATA": (*defaults, settings.OPTIMIZATION_SERVICE_LEVEL_A, "A"),
+        "MATB": (5.0, 1.0, 0.99, "A"),
+        "MATC": (*defaults, settings.OPTIMIZATION_SERVICE_LEVEL_B, "B"),
+    }
+    for material_id, (lead_time, lead_time_std, service_level, abc_class) in expected.items():
+        policy = policies[material_id]
+        point, safety_stock = reorder_point(daily[material_id], lead_time, lead_time_std, service_level)
+        assert policy["abc_class"] == abc_class
+        assert policy["confidence_level"] == service_level
+        assert (policy["lead_time_days"], policy["lead_time_std_days"]) == (lead_time, lead_time_std)
+        assert math.isclose(policy["optimal_reorder_point"], point, abs_tol=0.01)
+        assert math.isclose(policy["safety_stock"], safety_stock, abs_tol=0.01)
+
+    assert math.isclose(policies["MATA"]["shortfall"], policies["MATA"]["optimal_reorder_point"] - 100.0, abs_tol=0.02)
+    assert policies["MATB"]["current_stock"] == 0.0
+    assert policies["MATC"]["excess"] > 0 and policies["MATC"]["shortfall"] == 0.0
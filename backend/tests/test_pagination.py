@@ -0,0 +1,49 @@
+"""
+Keyset pagination over nullable sort keys
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.api.v1.endpoints.inventory import ALERT_KEYSET
+from app.core.pagination import apply_keyset, decode_cursor, next_cursor
+from app.models.inventory import InventoryAlert
+
+
+def alerts(now: datetime):
+    """Alerts with and without created_at, interleaved by id"""
+    return [
+        {"id": number, "plant_id": "PLANT001", "created_at": None if number % 3 == 0 else now - timedelta(hours=number % 4)}
+        for number in range(1, 12)
+    ]
+
+
+def test_alert_pages_visit_undated_alerts_once(sqlite_database):
+    rows = alerts(datetime(2024, 5, 1, 12))
+    engine = sqlite_database("alerts", {InventoryAlert: rows})
+
+    async def pages(page_size: int):
+        seen, cursor = [], None
+        async with engine.connect() as connection:
+            while True:
+                query = apply_keyset(select(InventoryAlert), ALERT_KEYSET, cursor, descending=True)
+                page = (await connection.execute(query.limit(page_size))).all()
+                seen.extend(row.id for row in page)
+                cursor = next_cursor(page, ALERT_KEYSET, page_size)
+                if cursor is None:
+                    return seen
+
+    # Newest first; undated alerts come last, newest id first
+    expected = [row["id"] for row in sorted(
+        rows, key=lambda row: (row["created_at"] or datetime.min, row["id"]), reverse=True
+    )]
+    for page_size in (1, 2, 3, 11):
+        assert asyncio.run(pages(page_size)) == expected
+
+
+def test_cursor_after_an_undated_alert_decodes():
+    undated = InventoryAlert(id=9, created_at=None)
+    cursor = next_cursor([undated], ALERT_KEYSET, 1)
+    assert decode_cursor(cursor, [datetime, int]) == [datetime(1970, 1, 1), 9]
@@ -0,0 +1,74 @@
+"""
+Bounded password hashing executor
+"""
+
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core.password_hashing import HashingQueueFull, PasswordHasher
+
+
+class GatedContext:
+    """Hash calls block until released, so the queue can be filled"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = 0
+
+    def verify_and_update(self, password, hashed_password):
+        self.started += 1
+        self.release.wait(5)
+        return password == hashed_password, None
+
+
+def test_queue_limit_rejects_excess_checks():
+    context = GatedContext()
+    hasher = PasswordHasher(context, max_workers=2, max_queue=3)
+
+    async def scenario():
+        checks = [asyncio.create_task(hasher.verify_and_update("secret", "secret")) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        assert (hasher.running, hasher.queued) == (2, 3)
+
+        # Beyond workers plus queue, checks are turned away at once
+        with pytest.raises(HashingQueueFull):
+            await hasher.verify_and_update("secret", "secret")
+        assert hasher.rejected == 1
+
+        context.release.set()
+        assert await asyncio.gather(*checks) == [(True, None)] * 5
+        stats = hasher.stats()
+        assert (stats["running"], stats["queued"], stats["max_queued"], stats["completed"]) == (0, 0, 3, 5)
+        assert context.started == 5
+
+        # Room frees up once the backlog drains
+        assert await hasher.verify_and_update("secret", "wrong") == (False, None)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
+
+
+def test_outdated_hashes_are_rehashed():
+    old = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    current = CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5, bcrypt__min_rounds=5, bcrypt__max_rounds=5
+    )
+    hasher = PasswordHasher(current, max_workers=1, max_queue=1)
+
+    async def scenario():
+        verified, new_hash = await hasher.verify_and_update("secret", old.hash("secret"))
+        assert verified and current.verify("secret", new_hash)
+        assert await hasher.verify_and_update("secret", new_hash) == (True, None)
+        assert await hasher.verify_and_update("wrong", new_hash) == (False, None)
+        await hasher.dummy_verify("secret")
+        assert hasher.rehashed == 1
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,209 @@
+"""
+Read/write splitting against SQLite stand-ins for a primary and a replica
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core import database
+from app.core.database import RoutingSession
+from app.core.replicas import ReplicaRoutingMiddleware, ReplicaSet, use_primary
+from app.models.plants import Plant
+
+
+def plant_named(name: str):
+    return {"plant_code": "PLANT001", "plant_name": name, "is_active": True}
+
+
+@pytest.fixture
+def primary(sqlite_database):
+    return sqlite_database("primary", {Plant: [plant_named("primary")]})
+
+
+@pytest.fixture
+def replica(sqlite_database):
+    return sqlite_database("replica", {Plant: [plant_named("replica")]})
+
+
+@pytest.fixture
+def routed(monkeypatch, primary):
+    """Session factory like AsyncSessionLocal, with the given replicas in place"""
+    def configure(replicas):
+        monkeypatch.setattr(database, "replicas", ReplicaSet(primary, replicas))
+        return async_sessionmaker(
+            bind=primary, class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False
+        )
+    return configure
+
+
+async def source(db: AsyncSession) -> str:
+    return await db.scalar(select(Plant.plant_name).where(Plant.plant_code == "PLANT001"))
+
+
+async def handle(read, path: str = "/api/v1/plants", method: str = "GET"):
+    """Run read as the handler of a request passing ReplicaRoutingMiddleware"""
+    result = {}
+
+    async def app(scope, receive, send):
+        result["value"] = await read()
+
+    await ReplicaRoutingMiddleware(app, ["/api/v1/plants"])(
+        {"type": "http", "method": method, "path": path}, None, None
+    )
+    return result["value"]
+
+
+def test_read_route_reads_from_replica(routed, replica):
+    sessions = routed({"replica1": replica})
+
+    async def read():
+        async with sessions() as db:
+            return await source(db)
+
+    async def scenario():
+        assert await handle(read) == "replica"
+        assert await handle(read, "/api/v1/plants/PLANT001/storage-locations") == "replica"
+        assert database.replicas.replicas[0].sessions == 2
+
+    asyncio.run(scenario())
+
+
+def test_other_requests_read_from_primary(routed, replica):
+    sessions = routed({"replica1": replica})
+
+    async def read():
+        async with sessions() as db:
+            return await source(db)
+
+    async def scenario():
+        assert await handle(read, "/api/v1/ai/forecast") == "primary"
+        assert await handle(read, "/api/v1/plantsx") == "primary"
+        assert await handle(read, method="POST") == "primary"
+        # Outside any request, e.g. background jobs
+        assert await read() == "primary"
+
+    asyncio.run(scenario())
+
+
+def test_session_reads_its_writes_on_primary(routed, replica):
+    sessions = routed({"replica1": replica})
+
+    async def write_then_read():
+        async with sessions() as db:
+            await db.execute(update(Plant).where(Plant.plant_code == "PLANT001").values(plant_name="updated"))
+            db.add(Plant(plant_code="PLANT002", plant_name="new", is_active=True))
+            await db.flush()
+            new = await db.scalar(select(func.count()).select_from(Plant).where(Plant.plant_code == "PLANT002"))
+            name = await source(db)
+            await db.rollback()
+            return name, new
+
+    async def read_then_write():
+        async with sessions() as db:
+            before = await source(db)
+            db.add(Plant(plant_code="PLANT003", plant_name="new", is_active=True))
+            await db.flush()
+            after = await db.scalar(select(func.count()).select_from(Plant).where(Plant.plant_code == "PLANT003"))
+            await db.rollback()
+            return before, after
+
+    async def scenario():
+        assert await handle(write_then_read) == ("updated", 1)
+        assert await handle(read_then_write) == ("replica", 1)
+
+    asyncio.run(scenario())
+
+
+def test_use_primary_pins_sessions(routed, replica):
+    sessions = routed({"replica1": replica})
+
+    async def pinned():
+        with use_primary():
+            async with sessions() as db:
+                pinned_source = await source(db)
+        async with sessions() as db:
+            return pinned_source, await source(db)
+
+    assert asyncio.run(handle(pinned)) == ("primary", "replica")
+
+
+def test_locking_read_uses_primary(routed, replica):
+    sessions = routed({"replica1": replica})
+
+    async def locking_read():
+        async with sessions() as db:
+            # SQLite ignores FOR UPDATE; only where it is sent matters
+            return await db.scalar(
+                select(Plant.plant_name).where(Plant.plant_code == "PLANT001").with_for_update()
+            )
+
+    assert asyncio.run(handle(locking_read)) == "primary"
+
+
+def test_unhealthy_replica_falls_back_to_primary(routed, replica, tmp_path):
+    sessions = routed({"replica1": replica})
+    replica_dir = tmp_path / "replica"
+
+    async def read():
+        async with sessions() as db:
+            return await source(db)
+
+    async def scenario():
+        replicas = database.replicas
+        await replicas.check_all()
+        assert replicas.replicas[0].healthy
+        assert await handle(read) == "replica"
+
+        # New connections to the replica fail while its directory is gone
+        replica_dir.rename(tmp_path / "replica.down")
+        await replicas.check_all()
+        assert not replicas.replicas[0].healthy
+        assert replicas.replicas[0].error
+        assert await handle(read) == "primary"
+        assert replicas.read_engine() is replicas.primary
+        assert replicas.primary_fallbacks == 1
+
+        (tmp_path / "replica.down").rename(replica_dir)
+        await replicas.check_all()
+        assert replicas.replicas[0].healthy
+        assert await handle(read) == "replica"
+
+    asyncio.run(scenario())
+
+
+def test_replicas_alternate(routed, replica, sqlite_database):
+    second = sqlite_database("replica2", {Plant: [plant_named("replica2")]})
+    sessions = routed({"replica1": replica, "replica2": second})
+
+    async def read():
+        async with sessions() as db:
+            return await source(db)
+
+    async def scenario():
+        return sorted([await handle(read) for _ in range(4)])
+
+    assert asyncio.run(scenario()) == ["replica", "replica", "replica2", "replica2"]
+
+
+def test_queries_without_replicas(routed):
+    sessions = routed({})
+
+    async def read():
+        async with sessions() as db:
+            return await source(db)
+
+    async def scenario():
+        assert await read() == "primary"
+        assert await handle(read) == "primary"
+        assert database.replicas.primary_fallbacks == 0
+
+    asyncio.run(scenario())
+
+
+def test_wait_for_replay_without_replication(primary, replica):
+    # SQLite stand-ins have no replication to wait for
+    replicas = ReplicaSet(primary, {"replica1": replica})
+    assert asyncio.run(replicas.wait_for_replay()) is True
@@ -0,0 +1,153 @@
+"""
+Monthly partition management, against a recording PostgreSQL stand-in
+
+Partitioning needs PostgreSQL, so the statements the commands send are
+checked on a connection that records them and answers the catalog
+queries; SQLite databases are refused.
+"""
+
+import asyncio
+from datetime import date, datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.inventory import InventoryTransaction
+from app.services import transaction_partitions as partitions
+from app.services.transaction_partitions import add_months, month_start, partition_name
+
+
+class Result:
+    def __init__(self, value=None, rows=(), rowcount=0):
+        self.value, self.rows, self.rowcount = value, list(rows), rowcount
+
+    def scalar(self):
+        return self.value
+
+    def one(self):
+        return (self.value,)
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+class RecordingConnection:
+    """Records statements; to_regclass finds the given relations"""
+
+    dialect = SimpleNamespace(name="postgresql")
+
+    def __init__(self, existing=(), answers=None):
+        self.existing = set(existing)
+        self.answers = answers or {}
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        if sql == "SELECT to_regclass(:name)":
+            return Result(params["name"] if params["name"] in self.existing else None)
+        for prefix, result in self.answers.items():
+            if sql.startswith(prefix):
+                return result
+        return Result()
+
+    def sent(self, prefix: str):
+        return [sql for sql in self.statements if sql.startswith(prefix)]
+
+
+def this_month() -> date:
+    return month_start(datetime.utcnow().date())
+
+
+def test_month_arithmetic():
+    assert add_months(date(2024, 11, 1), 2) == date(2025, 1, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert add_months(date(2024, 3, 1), -36) == date(2021, 3, 1)
+    assert partition_name(date(2024, 3, 1)) == "inventory_transactions_p202403"
+
+
+def test_commands_refuse_sqlite(sqlite_database):
+    engine = sqlite_database("plain", {InventoryTransaction: []})
+
+    async def scenario():
+        async with engine.connect() as connection:
+            for command in (partitions.partition_table, partitions.ensure_partitions, partitions.detach_partitions):
+                with pytest.raises(RuntimeError, match="needs PostgreSQL"):
+                    await command(connection)
+
+    asyncio.run(scenario())
+
+
+def test_ensure_partitions_creates_missing_months():
+    current = this_month()
+    connection = RecordingConnection(existing={partition_name(current), partitions.DEFAULT_PARTITION})
+    created = asyncio.run(partitions.ensure_partitions(connection, months_ahead=2, first_month=add_months(current, -1)))
+
+    expected = [partition_name(add_months(current, months)) for months in (-1, 1, 2)]
+    assert created == expected
+    assert [sql.split()[2] for sql in connection.sent("CREATE TABLE")] == [f'"{name}"' for name in expected]
+    # Rows of each new month already in the default partition move into it
+    assert len(connection.sent('WITH moved AS (DELETE FROM "inventory_transactions_default"')) == 3
+    attached = connection.sent('ALTER TABLE "inventory_transactions" ATTACH PARTITION')
+    lower, upper = add_months(current, -1), current
+    assert attached[0].endswith(f"FOR VALUES FROM ('{lower} 00:00:00') TO ('{upper} 00:00:00')")
+
+
+def test_detach_partitions_past_retention(monkeypatch):
+    current = this_month()
+    months = [add_months(current, offset) for offset in (-40, -37, -36, -1, 0)]
+
+    async def list_partitions(connection):
+        listed = [{"name": partition_name(month), "month": month.isoformat()} for month in months]
+        return listed + [{"name": partitions.DEFAULT_PARTITION, "month": None}]
+
+    monkeypatch.setattr(partitions, "list_partitions", list_partitions)
+
+    kept = RecordingConnection()
+    detached = asyncio.run(partitions.detach_partitions(kept, older_than_months=36))
+    assert detached == [partition_name(months[0]), partition_name(months[1])]
+    assert len(kept.sent('ALTER TABLE "inventory_transactions" DETACH PARTITION')) == 2
+    assert kept.sent("DROP TABLE") == []
+
+    dropped = RecordingConnection()
+    asyncio.run(partitions.detach_partitions(dropped, older_than_months=36, drop=True))
+    assert dropped.sent("DROP TABLE") == [f'DROP TABLE "{name}"' for name in detached]
+
+
+def test_migrate_copies_rows_into_partitioned_table():
+    first = datetime.combine(add_months(this_month(), -2), datetime.min.time())
+    connection = RecordingConnection(answers={
+        "SELECT relkind::text": Result(None),
+        "SELECT pg_get_serial_sequence": Result("public.inventory_transactions_id_seq"),
+        "SELECT indexname": Result(rows=["inventory_transactions_pkey", "uq_inventory_transactions_erp_key"]),
+        "SELECT min(transaction_date)": Result(first),
+        "SELECT column_name": Result(rows=["id", "material_id", "transaction_date", "created_at"]),
+        'INSERT INTO "inventory_transactions" ': Result(rowcount=1200),
+    })
+    summary = asyncio.run(partitions.partition_table(connection, months_ahead=1))
+
+    assert summary == {"migrated": True, "rows": 1200, "partitions": 5, "kept_legacy": False}
+    sent = connection.statements
+    assert sent.index('ALTER TABLE "inventory_transactions" RENAME TO "inventory_transactions_unpartitioned"') < sent.index(
+        'CREATE TABLE "inventory_transactions" (LIKE "inventory_transactions_unpartitioned" INCLUDING DEFAULTS) '
+        "PARTITION BY RANGE (transaction_date)"
+    )
+    assert connection.sent('ALTER INDEX "uq_inventory_transactions_erp_key" RENAME TO')
+    # Undated rows land in the month they were created
+    copy, = connection.sent('INSERT INTO "inventory_transactions" ')
+    assert "COALESCE(transaction_date, created_at, timezone('utc', now()))" in copy
+    assert 'ALTER TABLE "inventory_transactions" ADD PRIMARY KEY (id, transaction_date)' in sent
+    assert connection.sent('CREATE UNIQUE INDEX "uq_inventory_transactions_erp_key" ON "inventory_transactions" '
+                           '("erp_system", "erp_transaction_id", "transaction_date")')
+    assert len(connection.sent("CREATE INDEX IF NOT EXISTS")) == len(partitions.INDEXES)
+    assert sent[-1] == 'DROP TABLE "inventory_transactions_unpartitioned"'
+
+
+def test_migrate_is_a_no_op_once_partitioned(monkeypatch):
+    async def list_partitions(connection):
+        return [{"name": partitions.DEFAULT_PARTITION, "month": None}]
+
+    monkeypatch.setattr(partitions, "list_partitions", list_partitions)
+    connection = RecordingConnection(answers={"SELECT relkind::text": Result("p")})
+    assert asyncio.run(partitions.partition_table(connection)) == {"migrated": False, "partitions": 1}
+    assert connection.sent("ALTER TABLE") == []
@@ -46,8 +46,8 @@ INSERT INTO inventory_alerts (material_id, plant_id, alert_type, severity, messa
 
 -- Create sample users
 INSERT INTO users (username, email, full_name, hashed_password, role, company, department, is_active, is_verified) VALUES
-('admin', 'admin@company.com', 'System Administrator', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj/RK.s5u.Gi', 'admin', 'Company Inc', 'IT', true, true),
-('executive', 'executive@company.com', 'Executive User', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj/RK.s5u.Gi', 'executive', 'Company Inc', 'Executive', true, true),
-('manager', 'manager@company.com', 'Operations Manager', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/LewdBPj/RK.s5u.Gi', 'manager', 'Company Inc', 'Operations', true, true);
+('admin', 'admin@company.com', 'System Administrator', '$2b$12$AXh1bzCTJmRmLeBcEJJsL..LTlVgDFGYF0hLBqpbNFMIoOErJgKAy', 'admin', 'Company Inc', 'IT', true, true),
+('executive', 'executive@company.com', 'Executive User', '$2b$12$AXh1bzCTJmRmLeBcEJJsL..LTlVgDFGYF0hLBqpbNFMIoOErJgKAy', 'executive', 'Company Inc', 'Executive', true, true),
+('manager', 'manager@company.com', 'Operations Manager', '$2b$12$AXh1bzCTJmRmLeBcEJJsL..LTlVgDFGYF0hLBqpbNFMIoOErJgKAy', 'manager', 'Company Inc', 'Operations', true, true);
 
 -- Note: The hashed password above is for 'admin123' - change in production! 
\ No newline at end of file